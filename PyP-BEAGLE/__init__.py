@@ -10,3 +10,6 @@ from .beagle_residual_photometry import ResidualPhotometry
 from .beagle_multinest_catalogue import MultiNestCatalogue
 from .beagle_posterior_predictive_checks import PosteriorPredictiveChecks
 from .beagle_spectral_indices import SpectralIndices
+from .beagle_consolidated import BeagleConsolidatedStore
+from .beagle_reduced_sed import BeagleReducedSED
+from .beagle_plot_output import BeaglePlotOutput
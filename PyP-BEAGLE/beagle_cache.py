@@ -0,0 +1,340 @@
+from __future__ import absolute_import
+import os
+import json
+import logging
+import numpy as np
+from astropy.io import fits
+
+from .beagle_utils import BeagleDirectories, trimFitsSuffix
+from .beagle_result_file import BeagleResultFile, _table_to_array
+from .beagle_mirror import BeagleMirror
+
+CACHE_MANIFEST = "cache.json"
+
+class BeagleCache(object):
+    """
+    Persistent, memory-mappable cache of the Beagle output files.
+
+    Each `<ID>_BEAGLE.fits.gz` file is decompressed only once, and the
+    extensions listed in `extensions` are written as uncompressed `.npy`
+    files in the `pyp-beagle/data/cache/<ID>` folder, from which they are
+    later memory-mapped. A cache entry is invalidated (and rebuilt) when the
+    modification time or the size of the original file change.
+    """
+
+    # The cache is opt-in, and enabled through the `--cache` command line
+    # argument
+    enabled = False
+
+    # Extensions written to the cache
+    extensions = ('POSTERIOR PDF',
+            'MARGINAL PHOTOMETRY',
+            'APPARENT MAGNITUDES',
+            'MARGINAL SED',
+            'MARGINAL SED WL',
+            'MARGINAL SED MASK',
+            'SPECTRAL INDICES',
+            'GALAXY PROPERTIES')
+
+    @staticmethod
+    def get_cache_dir(file_name, results_dir=None):
+        """
+        Folder containing the cache for a given Beagle output file.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of the Beagle output file.
+
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        Returns
+        -------
+        str
+            Full path to the cache folder.
+        """
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        return os.path.join(results_dir, BeagleDirectories.pypbeagle_cache,
+                trimFitsSuffix(os.path.basename(file_name)))
+
+    @staticmethod
+    def _source_stat(file_name):
+
+        stat = os.stat(file_name)
+        return {"mtime": stat.st_mtime, "size": stat.st_size}
+
+    @classmethod
+    def load_manifest(cls, file_name):
+        """
+        Load the manifest of the cache entry of a Beagle output file.
+
+        Parameters
+        ----------
+        file_name : str
+            Full path to the Beagle output file.
+
+        Returns
+        -------
+        dict or None
+            The manifest, or None if the cache entry does not exist or it is
+            out-of-date with respect to the Beagle output file.
+        """
+
+        name = os.path.join(cls.get_cache_dir(file_name), CACHE_MANIFEST)
+        if not os.path.isfile(name):
+            return None
+
+        with open(name) as f:
+            manifest = json.load(f)
+
+        source = cls._source_stat(file_name)
+        if manifest["mtime"] != source["mtime"] or manifest["size"] != source["size"]:
+            logging.info("The cache of the file " + file_name + " is out-of-date")
+            return None
+
+        return manifest
+
+    @classmethod
+    def build(cls, file_name, hdulist=None):
+        """
+        Decompress a Beagle output file and write its extensions to the cache.
+
+        Parameters
+        ----------
+        file_name : str
+            Full path to the Beagle output file.
+
+        hdulist : `astropy.io.fits.HDUList`, optional
+            The already opened Beagle output file.
+
+        Returns
+        -------
+        dict
+            The manifest of the newly created cache entry.
+        """
+
+        directory = cls.get_cache_dir(file_name)
+        if not os.path.exists(directory):
+            logging.info("Creating the directory: " + directory)
+            os.makedirs(directory)
+
+        close = False
+        if hdulist is None:
+            hdulist = fits.open(BeagleMirror.resolve(file_name))
+            close = True
+
+        # Record the source properties before reading it, so that a file
+        # modified while being read invalidates the cache entry
+        manifest = cls._source_stat(file_name)
+        manifest["extensions"] = [hdu.name.upper() for hdu in hdulist[1:]]
+        manifest["cached"] = dict()
+
+        for hdu in hdulist[1:]:
+            extName = hdu.name.upper()
+            if extName not in cls.extensions or hdu.data is None:
+                continue
+
+            # Variable-length columns cannot be stored in a `.npy` file
+            if not hdu.is_image and any(col.format.startswith(('P', 'Q')) for col in hdu.columns):
+                continue
+
+            if hdu.is_image:
+                data = np.asarray(hdu.data)
+            else:
+                data = _table_to_array(hdu.data)
+
+            npy_name = extName.lower().replace(' ', '_') + '.npy'
+            tmp_name = os.path.join(directory, npy_name + '.tmp')
+            with open(tmp_name, 'wb') as f:
+                np.save(f, data)
+            os.replace(tmp_name, os.path.join(directory, npy_name))
+
+            manifest["cached"][extName] = npy_name
+
+        if close:
+            hdulist.close()
+
+        # The manifest is written last, so that an interrupted build does not
+        # leave a valid cache entry
+        name = os.path.join(directory, CACHE_MANIFEST)
+        with open(name + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(name + '.tmp', name)
+
+        return manifest
+
+
+class BeagleResults(object):
+    """
+    Single accessor to the extensions of a Beagle output file.
+
+    Extensions are returned as Numpy arrays (record arrays for binary tables),
+    read from the `BeagleCache` if enabled, and otherwise (or for extensions
+    not stored in the cache) from the original FITS file, through a
+    `BeagleResultFile` which is only opened when needed.
+
+    Parameters
+    ----------
+    file_name : str
+        Full path to the Beagle output file.
+
+    use_cache : bool, optional
+        Whether to read the data from the cache. By default uses
+        ``BeagleCache.enabled``.
+
+    Examples
+    --------
+    >>> with BeagleResults(file_name) as results:
+    >>>     probability = results['posterior pdf']['probability']
+    """
+
+    def __init__(self, file_name, use_cache=None):
+
+        self.file_name = file_name
+
+        if use_cache is None:
+            use_cache = BeagleCache.enabled
+
+        self.result_file = BeagleResultFile(file_name)
+        self.manifest = None
+        self._data = dict()
+
+        if use_cache:
+            self.manifest = BeagleCache.load_manifest(file_name)
+            if self.manifest is None:
+                logging.info("Building the cache for the file: " + file_name)
+                self.manifest = BeagleCache.build(file_name, hdulist=self.result_file.open())
+
+    def get_hdulist(self):
+        """
+        The original FITS file, opened on first use.
+
+        Returns
+        -------
+        `astropy.io.fits.HDUList`
+        """
+
+        return self.result_file.open()
+
+    def _is_cached(self, extName):
+
+        return self.manifest is not None and extName in self.manifest["cached"]
+
+    def __getitem__(self, extName):
+
+        extName = extName.upper()
+
+        if extName in self._data:
+            return self._data[extName]
+
+        if self._is_cached(extName):
+            name = os.path.join(BeagleCache.get_cache_dir(self.file_name),
+                    self.manifest["cached"][extName])
+            data = np.load(name, mmap_mode='r')
+        else:
+            data = self.result_file[extName]
+
+        self._data[extName] = data
+
+        return data
+
+    def get_columns(self, extName):
+        """
+        Names of the columns of a binary table extension, obtained without
+        reading its data.
+
+        Parameters
+        ----------
+        extName : str
+            Name of the extension.
+
+        Returns
+        -------
+        list
+            The column names, or None for image extensions.
+        """
+
+        extName = extName.upper()
+
+        if self._is_cached(extName):
+            # Only the header of the memory-mapped `.npy` file is read
+            names = self[extName].dtype.names
+            return list(names) if names is not None else None
+
+        return self.result_file.get_columns(extName)
+
+    def read(self, extName, columns=None):
+        """
+        Read (some columns of) an extension.
+
+        Parameters
+        ----------
+        extName : str
+            Name of the extension.
+
+        columns : list, optional
+            Names of the columns read from a binary table extension. By
+            default all columns are read.
+
+        Returns
+        -------
+        array
+            A Numpy structured array containing the requested columns, or the
+            image for image extensions.
+        """
+
+        extName = extName.upper()
+
+        if self._is_cached(extName) or extName in self._data:
+            data = self[extName]
+            if data.dtype.names is None:
+                return np.array(data)
+            if columns is None:
+                columns = data.dtype.names
+            return _table_to_array(data, columns=columns)
+
+        return self.result_file.read(extName, columns=columns)
+
+    def __contains__(self, extName):
+
+        if self.manifest is not None:
+            return extName.upper() in self.manifest["extensions"]
+
+        return extName in self.result_file
+
+    def close(self):
+
+        self._data = dict()
+        self.result_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_results(file_name, use_cache=None):
+    """
+    Open a Beagle output file through the `BeagleResults` accessor.
+
+    Parameters
+    ----------
+    file_name : str
+        Full path to the Beagle output file.
+
+    use_cache : bool, optional
+        Whether to read the data from the cache. By default uses
+        ``BeagleCache.enabled``.
+
+    Returns
+    -------
+    `BeagleResults`
+    """
+
+    return BeagleResults(file_name, use_cache=use_cache)
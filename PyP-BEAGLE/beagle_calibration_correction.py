@@ -43,3 +43,64 @@ class CalibrationCorrection:
                 y = y + coeff[i]*special.eval_legendre(i,x)
         return y
 
+    def return_coeff_matrix(self, posterior, n_samples):
+        """
+        Coefficients of the calibration correction of each posterior sample.
+
+        Parameters
+        ----------
+        posterior : `BeagleResults` extension, or structured array
+            The 'POSTERIOR PDF' extension, from which the fitted
+            `continuum_coeff-*` columns are read.
+
+        n_samples : int
+            Number of posterior samples.
+
+        Returns
+        -------
+        array
+            Array of shape (n_samples, degree+1), whose columns contain the
+            (fitted or fixed) coefficients of each degree.
+        """
+
+        columns = list()
+        for d in range(self.degree+1):
+            label = 'continuum_coeff-'+str(d+1)
+            if self.coeff_params[label]['fitted']:
+                columns.append(np.asarray(posterior[label], dtype=np.float64))
+            else:
+                columns.append(np.full(n_samples, self.coeff_params[label]['value'], dtype=np.float64))
+
+        return np.column_stack(columns)
+
+    def return_correction_matrix(self, x, coeff_matrix):
+        """
+        Calibration correction of several posterior samples at once.
+
+        Parameters
+        ----------
+        x : array
+            Points (of size n_x) where the correction is evaluated.
+
+        coeff_matrix : array
+            Coefficients of each posterior sample, of shape (n_samples,
+            degree+1), as returned by `return_coeff_matrix`.
+
+        Returns
+        -------
+        array
+            Array of shape (n_samples, n_x) containing the correction of each
+            posterior sample, i.e. the product of the coefficient matrix with
+            the (polynomial or Legendre) basis evaluated at `x`.
+        """
+
+        x = np.asarray(x, dtype=np.float64)
+
+        if self.type == "polynomial":
+            basis = np.polynomial.polynomial.polyvander(x, self.degree)
+        elif self.type == "legendre":
+            basis = np.polynomial.legendre.legvander(x, self.degree)
+        else:
+            return np.zeros((len(coeff_matrix), len(x)))
+
+        return np.dot(coeff_matrix, basis.T)
@@ -0,0 +1,554 @@
+from __future__ import absolute_import
+import os
+import json
+from collections import OrderedDict
+import numpy as np
+from astropy.io import fits
+import six
+
+from .beagle_utils import BeagleDirectories, trimFitsSuffix
+from .beagle_result_file import _table_to_array
+
+# Optional dependencies, only needed to write and read Parquet and HDF5
+# catalogues
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+# Key of the Parquet schema metadata, and of the HDF5 file attribute,
+# containing the name and columns of each table of the catalogue
+EXTENSIONS_KEY = "pypbeagle_extensions"
+
+def _table_names(tables):
+
+    # Unnamed tables (e.g. the single table of a FITS file without EXTNAME)
+    # are named after their position in the catalogue
+    return [name if name else "TABLE_" + str(i+1) for i, name in enumerate(tables)]
+
+class _ColumnNames(object):
+
+    def __init__(self, names, units=None):
+
+        self.names = list(names)
+        self.units = [None]*len(self.names) if units is None else list(units)
+
+    def __len__(self):
+
+        return len(self.names)
+
+
+class CatalogueColumns(object):
+    """
+    Lazy accessor to the columns of a `CatalogueTable`, mimicking the `data`
+    of a FITS binary table: each column is only read from disk when first
+    accessed, while selecting rows reads all columns.
+    """
+
+    def __init__(self, table):
+
+        self.table = table
+        self.names = table.columns.names
+        self._data = dict()
+
+    def __getitem__(self, name):
+
+        # Rows (selected by an integer, a slice, or an array of indices or of
+        # booleans) are returned, as for FITS tables, from the whole table
+        if not isinstance(name, six.string_types):
+            return self.table.read()[name]
+
+        if name not in self._data:
+            self._data[name] = self.table.read_column(name)
+
+        return self._data[name]
+
+    def __contains__(self, name):
+
+        return name in self.names
+
+    def __len__(self):
+
+        return self.table.n_rows
+
+
+class CatalogueTable(object):
+    """
+    A table of a Parquet or HDF5 catalogue, with the same `name`, `columns`
+    and `data` attributes of a FITS binary table extension.
+    """
+
+    def __init__(self, catalogue, name, columns, units=None, n_rows=0):
+
+        self.catalogue = catalogue
+        self.name = name
+        self.columns = _ColumnNames(columns, units)
+        self.n_rows = n_rows
+        self._data = None
+
+    @property
+    def data(self):
+
+        if not self.columns.names:
+            return None
+
+        if self._data is None:
+            self._data = CatalogueColumns(self)
+
+        return self._data
+
+    def read_column(self, name):
+
+        return self.catalogue.backend.read_column(self.catalogue, self.name, name)
+
+    def read(self, columns=None):
+        """
+        Read (some columns of) the table.
+
+        Parameters
+        ----------
+        columns : list, optional
+            Names of the columns to read. By default all columns are read.
+
+        Returns
+        -------
+        array
+            A Numpy structured array containing the requested columns.
+        """
+
+        if columns is None:
+            columns = self.columns.names
+
+        return _table_to_array(self.data, columns=columns)
+
+
+class CatalogueFile(object):
+    """
+    A Parquet or HDF5 catalogue opened for reading, which can be accessed as
+    an `astropy.io.fits.HDUList`: tables are indexed by their name, or by
+    their position starting from 1 (position 0 holds an empty "primary"
+    table, as in FITS files).
+    """
+
+    def __init__(self, file_name, backend, handle, tables):
+
+        self.file_name = file_name
+        self.backend = backend
+        self.handle = handle
+        self.hdus = [CatalogueTable(self, 'PRIMARY', [])]
+        for name, columns, units, n_rows in tables:
+            self.hdus.append(CatalogueTable(self, name, columns, units=units, n_rows=n_rows))
+
+    def __getitem__(self, key):
+
+        if isinstance(key, six.string_types):
+            for hdu in self.hdus:
+                if hdu.name.upper() == key.upper():
+                    return hdu
+            raise KeyError("Extension '" + key + "' not found.")
+
+        return self.hdus[key]
+
+    def __contains__(self, key):
+
+        return any(hdu.name.upper() == key.upper() for hdu in self.hdus)
+
+    def __iter__(self):
+
+        return iter(self.hdus)
+
+    def __len__(self):
+
+        return len(self.hdus)
+
+    def close(self):
+
+        if self.handle is not None:
+            self.backend.close(self.handle)
+            self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class FITSBackend(object):
+    """
+    Catalogues written as FITS binary tables, one extension per table.
+    """
+
+    suffixes = ('.fits', '.fits.gz')
+
+    @staticmethod
+    def write(file_name, tables, units=None, overwrite=False):
+
+        hdulist = fits.HDUList(fits.PrimaryHDU())
+
+        for hdu_name, table in six.iteritems(tables):
+            new_hdu = fits.BinTableHDU(data=table, name=hdu_name)
+            if units is not None and hdu_name in units:
+                for col_name, unit in six.iteritems(units[hdu_name]):
+                    if unit is not None:
+                        new_hdu.columns[col_name].unit = unit
+            hdulist.append(new_hdu)
+
+        hdulist.writeto(file_name, overwrite=overwrite)
+
+    @staticmethod
+    def open(file_name):
+
+        # Uncompressed files are memory-mapped, so that only the columns
+        # actually accessed are read from disk
+        return fits.open(file_name)
+
+
+class ParquetBackend(object):
+    """
+    Catalogues written as Apache Parquet files.
+
+    Since all tables of a catalogue have the same number of rows, they are
+    stored in a single Parquet table. When the catalogue contains more than
+    one table, each column is named '<table name>/<column name>'. Array
+    columns are stored as fixed-size lists, and units in the column metadata.
+    """
+
+    suffixes = ('.parquet',)
+
+    # Compression codec, and number of rows of each row group
+    compression = 'zstd'
+    chunk_rows = 65536
+
+    @staticmethod
+    def _check():
+
+        if pyarrow is None:
+            raise ImportError("Parquet catalogues require the `pyarrow` package")
+
+    @classmethod
+    def write(cls, file_name, tables, units=None, overwrite=False):
+
+        cls._check()
+
+        if os.path.isfile(file_name) and not overwrite:
+            raise IOError("The file " + file_name + " already exists")
+
+        n_rows = set(len(table) for table in six.itervalues(tables))
+        if len(n_rows) > 1:
+            raise ValueError("All tables of a Parquet catalogue must have the same number of rows")
+
+        names = _table_names(tables)
+        prefix = len(tables) > 1
+
+        arrays, fields, extensions = list(), list(), list()
+        for name, (hdu_name, table) in zip(names, six.iteritems(tables)):
+            _units = units.get(hdu_name, dict()) if units is not None else dict()
+            for col_name in table.dtype.names:
+                data = np.asarray(table[col_name])
+                if data.dtype.kind == 'S':
+                    data = np.char.decode(data, 'utf-8')
+
+                array = pyarrow.array(data.reshape(len(data), -1).ravel() if data.ndim > 1 else data)
+                metadata = dict()
+                if data.ndim > 1:
+                    array = pyarrow.FixedSizeListArray.from_arrays(array, int(np.prod(data.shape[1:])))
+                    metadata['shape'] = json.dumps(data.shape[1:])
+                if _units.get(col_name) is not None:
+                    metadata['unit'] = str(_units[col_name])
+
+                arrays.append(array)
+                fields.append(pyarrow.field(name + '/' + col_name if prefix else col_name,
+                    array.type, metadata=metadata or None))
+
+            extensions.append({'name': name, 'columns': list(table.dtype.names)})
+
+        schema = pyarrow.schema(fields, metadata={EXTENSIONS_KEY: json.dumps(extensions)})
+        table = pyarrow.Table.from_arrays(arrays, schema=schema)
+
+        tmp_name = file_name + '.tmp'
+        try:
+            pq.write_table(table, tmp_name, compression=cls.compression, row_group_size=cls.chunk_rows)
+            os.replace(tmp_name, file_name)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    @classmethod
+    def open(cls, file_name):
+
+        cls._check()
+
+        handle = pq.ParquetFile(file_name)
+        schema = handle.schema_arrow
+        extensions = json.loads(schema.metadata[EXTENSIONS_KEY.encode()])
+        prefix = len(extensions) > 1
+
+        tables = list()
+        for ext in extensions:
+            units = list()
+            for col_name in ext['columns']:
+                metadata = schema.field(ext['name'] + '/' + col_name if prefix else col_name).metadata or dict()
+                unit = metadata.get(b'unit')
+                units.append(unit.decode() if unit is not None else None)
+            tables.append((ext['name'], ext['columns'], units, handle.metadata.num_rows))
+
+        return CatalogueFile(file_name, cls, handle, tables)
+
+    @staticmethod
+    def read_column(catalogue, hdu_name, col_name):
+
+        # Column names are prefixed by the table name for catalogues with
+        # more than one table (besides the empty primary one)
+        name = hdu_name + '/' + col_name if len(catalogue) > 2 else col_name
+        field = catalogue.handle.schema_arrow.field(name)
+        column = catalogue.handle.read(columns=[name]).column(0).combine_chunks()
+
+        if pyarrow.types.is_fixed_size_list(field.type):
+            shape = tuple(json.loads(field.metadata[b'shape']))
+            return column.flatten().to_numpy(zero_copy_only=False).reshape((len(column),)+shape)
+
+        data = column.to_numpy(zero_copy_only=False)
+        if pyarrow.types.is_string(field.type):
+            data = data.astype(str)
+
+        return data
+
+    @staticmethod
+    def close(handle):
+
+        handle.close()
+
+
+class HDF5Backend(object):
+    """
+    Catalogues written as HDF5 files, with a group for each table and a
+    chunked, compressed dataset for each column. Strings are stored as
+    UTF-8 encoded fixed-length byte strings, and units as attributes of the
+    datasets.
+    """
+
+    suffixes = ('.h5', '.hdf5')
+
+    # Compression filter (and its level), and number of rows of each chunk
+    compression = 'gzip'
+    compression_opts = 4
+    chunk_rows = 65536
+
+    @staticmethod
+    def _check():
+
+        if h5py is None:
+            raise ImportError("HDF5 catalogues require the `h5py` package")
+
+    @classmethod
+    def write(cls, file_name, tables, units=None, overwrite=False):
+
+        cls._check()
+
+        if os.path.isfile(file_name) and not overwrite:
+            raise IOError("The file " + file_name + " already exists")
+
+        names = _table_names(tables)
+
+        tmp_name = file_name + '.tmp'
+        try:
+            with h5py.File(tmp_name, 'w') as f:
+                extensions = list()
+                for name, (hdu_name, table) in zip(names, six.iteritems(tables)):
+                    _units = units.get(hdu_name, dict()) if units is not None else dict()
+                    group = f.create_group(name)
+                    for col_name in table.dtype.names:
+                        data = np.asarray(table[col_name])
+                        is_string = data.dtype.kind in ('S', 'U')
+                        if data.dtype.kind == 'U':
+                            data = np.char.encode(data, 'utf-8')
+
+                        chunks = None
+                        if len(data) > 0:
+                            chunks = (min(len(data), cls.chunk_rows),) + data.shape[1:]
+                        dataset = group.create_dataset(col_name, data=data, chunks=chunks,
+                                compression=cls.compression, compression_opts=cls.compression_opts,
+                                shuffle=True)
+                        if is_string:
+                            dataset.attrs['encoding'] = 'utf-8'
+                        if _units.get(col_name) is not None:
+                            dataset.attrs['unit'] = str(_units[col_name])
+
+                    extensions.append({'name': name, 'columns': list(table.dtype.names),
+                        'n_rows': len(table)})
+
+                f.attrs[EXTENSIONS_KEY] = json.dumps(extensions)
+
+            os.replace(tmp_name, file_name)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    @classmethod
+    def open(cls, file_name):
+
+        cls._check()
+
+        handle = h5py.File(file_name, 'r')
+        extensions = json.loads(handle.attrs[EXTENSIONS_KEY])
+
+        tables = list()
+        for ext in extensions:
+            group = handle[ext['name']]
+            units = [group[col_name].attrs.get('unit') for col_name in ext['columns']]
+            tables.append((ext['name'], ext['columns'], units, ext['n_rows']))
+
+        return CatalogueFile(file_name, cls, handle, tables)
+
+    @staticmethod
+    def read_column(catalogue, hdu_name, col_name):
+
+        dataset = catalogue.handle[hdu_name][col_name]
+        data = dataset[...]
+        if 'encoding' in dataset.attrs:
+            data = np.char.decode(data, dataset.attrs['encoding'])
+
+        return data
+
+    @staticmethod
+    def close(handle):
+
+        handle.close()
+
+
+# Output formats of the catalogues, each associated with the backend that
+# writes and reads them. Other formats can be added by registering here a
+# class with the same interface
+catalogue_backends = OrderedDict([
+    ('fits', FITSBackend),
+    ('parquet', ParquetBackend),
+    ('hdf5', HDF5Backend)
+    ])
+
+def get_backend(file_name):
+    """
+    Backend used to write and read a catalogue, based on its file suffix.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the catalogue.
+
+    Returns
+    -------
+    The backend class.
+    """
+
+    name = file_name.lower()
+    for backend in six.itervalues(catalogue_backends):
+        if name.endswith(backend.suffixes):
+            return backend
+
+    raise ValueError("Unknown format of the catalogue " + file_name + ", the suffix must be one of " +
+            ", ".join(s for backend in six.itervalues(catalogue_backends) for s in backend.suffixes))
+
+def is_catalogue_file(file_name):
+    """
+    Whether a file name has the suffix of one of the `catalogue_backends`.
+    """
+
+    name = file_name.lower()
+    return any(name.endswith(backend.suffixes) for backend in six.itervalues(catalogue_backends))
+
+def catalogue_file_name(file_name, catalogue_format=None):
+    """
+    Name of a catalogue written in a given format.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the catalogue, with a FITS suffix (e.g. 'PPC.fits').
+
+    catalogue_format : str, optional
+        One of the formats in `catalogue_backends`. By default uses
+        ``BeagleDirectories.catalogue_format``.
+
+    Returns
+    -------
+    str
+        The name with the FITS suffix replaced by that of the format.
+    """
+
+    if catalogue_format is None:
+        catalogue_format = BeagleDirectories.catalogue_format
+
+    if catalogue_format == 'fits':
+        return file_name
+
+    return trimFitsSuffix(file_name) + catalogue_backends[catalogue_format].suffixes[0]
+
+def write_catalogue(file_name, tables, units=None, overwrite=False):
+    """
+    Write a catalogue, in the format corresponding to its file suffix.
+
+    Parameters
+    ----------
+    file_name : str
+        Full path to the output file.
+
+    tables : OrderedDict
+        Numpy structured arrays containing the tables of the catalogue,
+        indexed by their name (None for an unnamed table).
+
+    units : dict, optional
+        For each table, a dictionary containing the units of its columns.
+
+    overwrite : bool, optional
+        Whether to overwrite an existing file.
+    """
+
+    get_backend(file_name).write(file_name, tables, units=units, overwrite=overwrite)
+
+def open_catalogue(file_name):
+    """
+    Open a catalogue, in the format corresponding to its file suffix.
+
+    The returned object can be accessed as an `astropy.io.fits.HDUList`, and
+    the columns of each table are only read when accessed.
+
+    Parameters
+    ----------
+    file_name : str
+        Full path to the catalogue.
+
+    Returns
+    -------
+    `astropy.io.fits.HDUList` or `CatalogueFile`
+    """
+
+    return get_backend(file_name).open(file_name)
+
+def read_extension(hdu, columns=None):
+    """
+    Read (some columns of) a table of a catalogue opened with `open_catalogue`.
+
+    Parameters
+    ----------
+    hdu : `astropy.io.fits.BinTableHDU` or `CatalogueTable`
+        The table.
+
+    columns : list, optional
+        Names of the columns to read. By default all columns are read.
+
+    Returns
+    -------
+    array
+        A Numpy structured array containing the requested columns.
+    """
+
+    if isinstance(hdu, CatalogueTable):
+        return hdu.read(columns=columns)
+
+    return _table_to_array(hdu.data, columns=columns)
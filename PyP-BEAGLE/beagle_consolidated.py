@@ -0,0 +1,426 @@
+from __future__ import absolute_import
+import os
+import json
+import shutil
+import logging
+from functools import partial
+import numpy as np
+import six
+
+from .beagle_utils import BeagleDirectories
+from .beagle_result_file import BeagleResultFile
+from .beagle_multiprocess import BeaglePool
+
+# Optional dependency, only needed for stores in HDF5 format
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+STORE_MANIFEST = "manifest.json"
+
+# Name of the HDF5 file containing the columns of stores in HDF5 format
+HDF5_COLUMNS = "columns.h5"
+
+def _column_key(extName, colName):
+
+    return extName.lower().replace(' ', '_') + '/' + colName
+
+def _read_object(hdu_col, file_name):
+
+    # Extensions (and columns) of a single Beagle output file to consolidate
+    with BeagleResultFile(file_name) as f:
+        return [f.read(hdu['name'], columns=hdu.get('columns')) for hdu in hdu_col]
+
+class BeagleConsolidatedStore(object):
+    """
+    Posterior samples of all objects, consolidated in a single store.
+
+    For each consolidated extension (by default the 'POSTERIOR PDF' one) and
+    column, the values of all objects are concatenated in a single array,
+    so that a column can be read for all objects in a single sequential
+    read. The rows of each object are found through the `offsets` index:
+    the rows of the i-th object (with ID `IDs[i]`) are
+    `offsets[i]:offsets[i+1]`.
+
+    Columns are stored either as uncompressed `.npy` files, which are
+    memory-mapped ('npy' format), or as chunked, gzip-compressed datasets of
+    an HDF5 file ('hdf5' format, requires the `h5py` package). The store is
+    located in the `pyp-beagle/data/consolidated` folder.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Folder containing the store. By default the
+        `pyp-beagle/data/consolidated` folder of the results directory.
+
+    Examples
+    --------
+    >>> store = BeagleConsolidatedStore()
+    >>> mass = store.read('POSTERIOR PDF', 'mass')
+    >>> mass_per_object = store.split(mass)
+    """
+
+    # Number of rows of each chunk of the datasets in HDF5 format
+    chunk_rows = 65536
+
+    def __init__(self, directory=None):
+
+        if directory is None:
+            directory = self.get_store_dir()
+
+        self.directory = directory
+        self._manifest = None
+        self._hdf5 = None
+
+    @staticmethod
+    def get_store_dir(results_dir=None):
+        """
+        Folder containing the consolidated store.
+
+        Parameters
+        ----------
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        Returns
+        -------
+        str
+            Full path to the store folder.
+        """
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        return os.path.join(results_dir, BeagleDirectories.pypbeagle_consolidated)
+
+    @staticmethod
+    def _source_stat(file_names):
+
+        stat = [os.stat(name) for name in file_names]
+        return [[os.path.basename(name), s.st_mtime, s.st_size] for name, s in zip(file_names, stat)]
+
+    @classmethod
+    def build(cls, file_list, IDs=None, hdu_col=None, store_format='npy', n_proc=1,
+            results_dir=None):
+        """
+        Consolidate the posterior samples of a list of Beagle output files.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files, relative to ``results_dir``.
+
+        IDs : list, optional
+            IDs of the objects. By default they are obtained from the file
+            names.
+
+        hdu_col : list, optional
+            Extensions (and, optionally, columns) to consolidate, in the same
+            format used for the configuration of the summary catalogue, e.g.
+            [{'name': 'POSTERIOR PDF'}, {'name': 'GALAXY PROPERTIES',
+            'columns': ['M_star']}]. The 'POSTERIOR PDF' extension is always
+            consolidated. All extensions must have one row per posterior
+            sample.
+
+        store_format : str, optional
+            Either 'npy' (memory-mappable) or 'hdf5' (compressed).
+
+        n_proc : int, optional
+            Number of processes used to read the Beagle output files.
+
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        Returns
+        -------
+        `BeagleConsolidatedStore`
+        """
+
+        if store_format not in ('npy', 'hdf5'):
+            raise ValueError("Unknown format of the consolidated store: " + str(store_format))
+
+        if store_format == 'hdf5' and h5py is None:
+            raise ImportError("Consolidated stores in HDF5 format require the `h5py` package")
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        if IDs is None:
+            IDs = [os.path.basename(file).split('_' + BeagleDirectories.suffix)[0] for file in file_list]
+
+        if hdu_col is None:
+            hdu_col = list()
+        hdu_col = [{'name': 'POSTERIOR PDF'}] + [hdu for hdu in hdu_col if hdu['name'].upper() != 'POSTERIOR PDF']
+
+        file_names = [os.path.join(results_dir, file) for file in file_list]
+
+        # Record the source properties before reading them, so that files
+        # modified while being read invalidate the store
+        manifest = {"format": store_format, "files": cls._source_stat(file_names)}
+
+        # Number of samples of each object, from the header of the posterior
+        # PDF extension
+        n_rows = np.zeros(len(file_names), dtype=np.int64)
+        for i, name in enumerate(file_names):
+            with BeagleResultFile(name) as f:
+                n_rows[i] = f.open()['POSTERIOR PDF'].header['NAXIS2']
+
+        offsets = np.zeros(len(file_names)+1, dtype=np.int64)
+        np.cumsum(n_rows, out=offsets[1:])
+        n_total = int(offsets[-1])
+
+        directory = cls.get_store_dir(results_dir)
+        tmp_dir = directory + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        hdf5 = None
+        try:
+            np.save(os.path.join(tmp_dir, 'ID.npy'), np.asarray(IDs, dtype=str))
+            np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+
+            if store_format == 'hdf5':
+                hdf5 = h5py.File(os.path.join(tmp_dir, HDF5_COLUMNS), 'w')
+
+            # The objects are read in order, and their columns written at
+            # their offsets as soon as they are available
+            function = partial(_read_object, hdu_col)
+            if n_proc > 1:
+                data = BeaglePool(function, n_proc).map(file_names)
+            else:
+                data = (function(name) for name in file_names)
+
+            columns = dict()
+            manifest["extensions"] = list()
+            for i, tables in enumerate(data):
+                start, stop = offsets[i], offsets[i+1]
+                for hdu, table in zip(hdu_col, tables):
+                    extName = hdu['name'].upper()
+                    if len(table) != stop-start:
+                        raise ValueError("The extension '" + extName + "' of the file " + file_list[i] + \
+                                " does not contain one row per posterior sample")
+
+                    # The output arrays are created from the first object
+                    if i == 0:
+                        names = list(table.dtype.names)
+                        manifest["extensions"].append({"name": extName, "columns": names})
+                        for name in names:
+                            key = _column_key(extName, name)
+                            shape = (n_total,) + table[name].shape[1:]
+                            if hdf5 is not None:
+                                chunks = (min(n_total, cls.chunk_rows),) + shape[1:] if n_total > 0 else None
+                                columns[key] = hdf5.create_dataset(key, shape=shape, dtype=table[name].dtype,
+                                        chunks=chunks, compression='gzip', shuffle=True)
+                            else:
+                                npy_name = os.path.join(tmp_dir, key + '.npy')
+                                if not os.path.isdir(os.path.dirname(npy_name)):
+                                    os.makedirs(os.path.dirname(npy_name))
+                                columns[key] = np.lib.format.open_memmap(npy_name, mode='w+',
+                                        dtype=table[name].dtype, shape=shape)
+
+                    for name in table.dtype.names:
+                        columns[_column_key(extName, name)][start:stop] = table[name]
+
+                if (i+1) % 100 == 0 or i+1 == len(file_names):
+                    logging.info("Consolidated " + str(i+1) + " out of " + str(len(file_names)) + " objects")
+
+            for column in six.itervalues(columns):
+                if hasattr(column, 'flush'):
+                    column.flush()
+
+            if hdf5 is not None:
+                hdf5.close()
+                hdf5 = None
+
+            # The manifest is written last, so that an interrupted build does
+            # not leave a valid store
+            with open(os.path.join(tmp_dir, STORE_MANIFEST), 'w') as f:
+                json.dump(manifest, f)
+
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp_dir, directory)
+
+        finally:
+            if hdf5 is not None:
+                hdf5.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return cls(directory)
+
+    @property
+    def manifest(self):
+
+        if self._manifest is None:
+            with open(os.path.join(self.directory, STORE_MANIFEST)) as f:
+                self._manifest = json.load(f)
+
+        return self._manifest
+
+    def exists(self):
+
+        return os.path.isfile(os.path.join(self.directory, STORE_MANIFEST))
+
+    def is_up_to_date(self, file_list, results_dir=None):
+        """
+        Whether the store contains exactly the given Beagle output files, none
+        of which has been modified since the store was built.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files, relative to ``results_dir``.
+
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        Returns
+        -------
+        bool
+        """
+
+        if not self.exists():
+            return False
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        stat = self._source_stat([os.path.join(results_dir, file) for file in file_list])
+
+        return stat == self.manifest["files"]
+
+    @property
+    def IDs(self):
+
+        return np.load(os.path.join(self.directory, 'ID.npy'))
+
+    @property
+    def offsets(self):
+
+        return np.load(os.path.join(self.directory, 'offsets.npy'))
+
+    def get_extensions(self):
+
+        return [ext["name"] for ext in self.manifest["extensions"]]
+
+    def get_columns(self, extName):
+        """
+        Names of the consolidated columns of an extension.
+
+        Parameters
+        ----------
+        extName : str
+            Name of the extension.
+
+        Returns
+        -------
+        list
+        """
+
+        for ext in self.manifest["extensions"]:
+            if ext["name"] == extName.upper():
+                return ext["columns"]
+
+        raise KeyError("Extension '" + extName + "' not found in the consolidated store.")
+
+    def read(self, extName, colName, rows=None):
+        """
+        Read a column of all objects.
+
+        Parameters
+        ----------
+        extName : str
+            Name of the extension.
+
+        colName : str
+            Name of the column.
+
+        rows : slice, optional
+            Rows to read. By default the column is read for all objects.
+
+        Returns
+        -------
+        array
+            The values of all objects, concatenated in the order of `IDs`
+            (memory-mapped for stores in 'npy' format).
+        """
+
+        if colName not in self.get_columns(extName):
+            raise KeyError("Column '" + colName + "' of the extension '" + extName + \
+                    "' not found in the consolidated store.")
+
+        key = _column_key(extName.upper(), colName)
+
+        if self.manifest["format"] == 'hdf5':
+            if self._hdf5 is None:
+                self._hdf5 = h5py.File(os.path.join(self.directory, HDF5_COLUMNS), 'r')
+            return self._hdf5[key][rows if rows is not None else Ellipsis]
+
+        data = np.load(os.path.join(self.directory, key + '.npy'), mmap_mode='r')
+
+        return data[rows] if rows is not None else data
+
+    def split(self, data):
+        """
+        Split an array returned by `read` into the values of each object.
+
+        Parameters
+        ----------
+        data : array
+            The values of all objects.
+
+        Returns
+        -------
+        list
+            The values of each object, in the order of `IDs`.
+        """
+
+        return np.split(data, self.offsets[1:-1])
+
+    def read_object(self, ID, extName, columns=None):
+        """
+        Read (some columns of) an extension of a single object.
+
+        Parameters
+        ----------
+        ID : str
+            The object ID.
+
+        extName : str
+            Name of the extension.
+
+        columns : list, optional
+            Names of the columns to read. By default all consolidated columns
+            are read.
+
+        Returns
+        -------
+        array
+            A Numpy structured array containing the requested columns.
+        """
+
+        i = np.flatnonzero(self.IDs == str(ID))
+        if len(i) == 0:
+            raise KeyError("Object '" + str(ID) + "' not found in the consolidated store.")
+
+        offsets = self.offsets
+        rows = slice(offsets[i[0]], offsets[i[0]+1])
+
+        if columns is None:
+            columns = self.get_columns(extName)
+
+        arrays = [self.read(extName, name, rows=rows) for name in columns]
+        table = np.empty(rows.stop-rows.start, dtype=[(name, a.dtype, a.shape[1:]) for name, a in zip(columns, arrays)])
+        for name, a in zip(columns, arrays):
+            table[name] = a
+
+        return table
+
+    def close(self):
+
+        if self._hdf5 is not None:
+            self._hdf5.close()
+            self._hdf5 = None
@@ -0,0 +1,303 @@
+from __future__ import absolute_import
+import os
+import gzip
+import shutil
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from astropy.io import fits
+
+from .beagle_utils import BeagleDirectories
+
+# Size of the blocks in which the files are decompressed
+BLOCK_SIZE = 16*1024**2
+
+class BeagleMirror(object):
+    """
+    Uncompressed (or tile-compressed) mirror of the Beagle output files.
+
+    Each gzipped `<ID>_BEAGLE.fits.gz` file is decompressed once into the
+    `pyp-beagle/data/mirror` folder as `<ID>_BEAGLE.fits`, which astropy then
+    memory-maps instead of decompressing the original file each time it is
+    opened. The files are decompressed by a pool of threads, since zlib
+    releases the GIL while inflating the data.
+
+    The modification time of each mirrored file is set equal to that of the
+    original file, so that a mirrored file is only used while the original
+    file has not been modified.
+    """
+
+    # Mirrored files are used, when they exist and are up-to-date, unless the
+    # `--ignore-mirror` command line argument is passed
+    enabled = True
+
+    @staticmethod
+    def get_mirror_dir(results_dir=None):
+        """
+        Folder containing the mirrored files.
+
+        Parameters
+        ----------
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        Returns
+        -------
+        str
+            Full path to the mirror folder.
+        """
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        return os.path.join(results_dir, BeagleDirectories.pypbeagle_mirror)
+
+    @classmethod
+    def get_mirror_name(cls, file_name):
+        """
+        Name of the mirrored copy of a Beagle output file.
+
+        Parameters
+        ----------
+        file_name : str
+            Full path to the Beagle output file.
+
+        Returns
+        -------
+        str or None
+            Full path to the mirrored file, or None if the file is not gzipped
+            (and hence it is not mirrored).
+        """
+
+        if not file_name.endswith('.gz'):
+            return None
+
+        results_dir, name = os.path.split(file_name)
+
+        return os.path.join(cls.get_mirror_dir(results_dir), name[:-len('.gz')])
+
+    @staticmethod
+    def is_valid(file_name, mirror_name):
+        """
+        Whether a mirrored file exists and is up-to-date with respect to the
+        original file.
+        """
+
+        try:
+            return os.stat(mirror_name).st_mtime_ns == os.stat(file_name).st_mtime_ns
+        except OSError:
+            return False
+
+    @classmethod
+    def resolve(cls, file_name):
+        """
+        Name of the file to read in place of a Beagle output file.
+
+        Parameters
+        ----------
+        file_name : str
+            Full path to the Beagle output file.
+
+        Returns
+        -------
+        str
+            The mirrored file, if the mirror is enabled and the mirrored file
+            is up-to-date, and otherwise the input file.
+        """
+
+        if not cls.enabled:
+            return file_name
+
+        mirror_name = cls.get_mirror_name(file_name)
+        if mirror_name is not None and cls.is_valid(file_name, mirror_name):
+            return mirror_name
+
+        return file_name
+
+    @staticmethod
+    def estimate_size(file_name):
+        """
+        Size of a gzipped file once decompressed.
+
+        The size is read from the ISIZE field of the gzip trailer, i.e. the
+        size of the uncompressed data modulo 2^32, which is corrected
+        assuming that the file is not compressed by more than a factor 2^32.
+
+        Parameters
+        ----------
+        file_name : str
+            Full path to the gzipped file.
+
+        Returns
+        -------
+        int
+            The size in bytes of the uncompressed file.
+        """
+
+        size = os.path.getsize(file_name)
+        with open(file_name, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            isize = struct.unpack('<I', f.read(4))[0]
+
+        while isize < size:
+            isize += 2**32
+
+        return isize
+
+    @staticmethod
+    def _expand(file_name, mirror_name, compression=None):
+
+        tmp_name = mirror_name + '.tmp'
+        try:
+            if compression is None:
+                with gzip.open(file_name, 'rb') as f_in, open(tmp_name, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, BLOCK_SIZE)
+            else:
+                # Only image extensions can be tile-compressed, binary tables
+                # are copied as they are
+                with fits.open(file_name) as hdulist:
+                    hdus = list()
+                    for hdu in hdulist:
+                        if hdu.is_image and hdu.data is not None and not isinstance(hdu, fits.PrimaryHDU):
+                            hdu = fits.CompImageHDU(data=hdu.data, header=hdu.header,
+                                    name=hdu.name, compression_type=compression)
+                        hdus.append(hdu)
+                    fits.HDUList(hdus).writeto(tmp_name, overwrite=True)
+
+            stat = os.stat(file_name)
+            os.utime(tmp_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_name, mirror_name)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+        return os.path.getsize(mirror_name)
+
+    @classmethod
+    def build(cls, file_list, results_dir=None, n_threads=1, max_size=None, compression=None):
+        """
+        Decompress a list of Beagle output files into the mirror folder.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files, relative to ``results_dir``.
+
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        n_threads : int, optional
+            Number of files decompressed at the same time.
+
+        max_size : int, optional
+            Maximum size, in bytes, of the mirror folder. Files which would
+            exceed it are not mirrored, and are read from the original file.
+
+        compression : str, optional
+            Tile compression (e.g. 'RICE_1') applied to the image extensions of
+            the mirrored files. By default the files are stored uncompressed,
+            so that they can be memory-mapped. Note that the tile compression
+            of floating-point images is lossy.
+
+        Returns
+        -------
+        list
+            Names of the Beagle output files that are mirrored.
+        """
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        directory = cls.get_mirror_dir(results_dir)
+        if not os.path.exists(directory):
+            logging.info("Creating the directory: " + directory)
+            os.makedirs(directory)
+
+        # Remove the files left over by interrupted builds, and those whose
+        # original file has been modified
+        cls.clean(results_dir=results_dir)
+
+        used_size = 0
+        mirrored = list()
+        to_build = list()
+        for file in file_list:
+            file_name = os.path.join(results_dir, file)
+            mirror_name = cls.get_mirror_name(file_name)
+            if mirror_name is None:
+                continue
+            if cls.is_valid(file_name, mirror_name):
+                used_size += os.path.getsize(mirror_name)
+                mirrored.append(file)
+            else:
+                to_build.append((file, file_name, mirror_name, cls.estimate_size(file_name)))
+
+        # Files are only decompressed if their size fits within the disk
+        # budget, which is reserved before decompressing them
+        jobs = list()
+        for file, file_name, mirror_name, size in to_build:
+            if max_size is not None and used_size + size > max_size:
+                logging.warning("The file " + file + " is not mirrored, since it would exceed " \
+                        "the disk budget of the mirror")
+                continue
+            used_size += size
+            jobs.append((file, file_name, mirror_name))
+
+        logging.info(str(len(jobs)) + " out of " + str(len(file_list)) + \
+                " Beagle output files will be decompressed into " + directory)
+
+        futures = dict()
+        executor = ThreadPoolExecutor(max_workers=max(1, n_threads))
+        try:
+            futures = dict((executor.submit(cls._expand, file_name, mirror_name, compression), file)
+                    for file, file_name, mirror_name in jobs)
+
+            written = 0
+            for i, future in enumerate(as_completed(futures)):
+                written += future.result()
+                mirrored.append(futures[future])
+                logging.info("Decompressed " + str(i+1) + " out of " + str(len(jobs)) + \
+                        " files (" + "{:.1f}".format(written/1024.**2) + " MB written)")
+        finally:
+            # On errors (or interruptions) the files not yet started are
+            # skipped, and the partially written ones are removed by `_expand`
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        return mirrored
+
+    @classmethod
+    def clean(cls, results_dir=None, remove_all=False):
+        """
+        Remove the temporary and out-of-date files from the mirror folder.
+
+        Parameters
+        ----------
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        remove_all : bool, optional
+            Whether to remove the whole mirror folder.
+        """
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        directory = cls.get_mirror_dir(results_dir)
+        if not os.path.isdir(directory):
+            return
+
+        if remove_all:
+            logging.info("Removing the directory: " + directory)
+            shutil.rmtree(directory)
+            return
+
+        for name in os.listdir(directory):
+            mirror_name = os.path.join(directory, name)
+            file_name = os.path.join(results_dir, name + '.gz')
+            if name.endswith('.tmp') or not cls.is_valid(file_name, mirror_name):
+                logging.info("Removing the file: " + mirror_name)
+                os.remove(mirror_name)
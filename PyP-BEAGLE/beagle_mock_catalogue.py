@@ -18,6 +18,9 @@ import bokeh.models as bk_mdl
 from .beagle_utils import prepare_data_saving, prepare_plot_saving, \
         BeagleDirectories, is_FITS_file, data_exists, plot_exists, set_plot_ticks, \
         is_integer, match_ID, ID_COLUMN_LENGTH
+from .beagle_result_file import BeagleResultFile
+from .beagle_catalogue_io import catalogue_file_name, is_catalogue_file, write_catalogue, \
+        open_catalogue, read_extension
 import six
 from six.moves import zip_longest
 
@@ -133,7 +136,7 @@ class BeagleMockCatalogue(object):
         """
 
         if file_name is None:
-            file_name = "BEAGLE_mock_catalogue.fits"
+            file_name = catalogue_file_name("BEAGLE_mock_catalogue.fits")
 
         self.file_name = os.path.basename(file_name)
 
@@ -154,6 +157,14 @@ class BeagleMockCatalogue(object):
             else:
                 self.data = fits.open(name)[1].data
                 self.columns = fits.open(name)[1].columns
+        elif is_catalogue_file(name):
+            hdulist = open_catalogue(name)
+            if len(hdulist) > 2:
+                self.hdulist = hdulist
+            else:
+                self.data = hdulist[1].read()
+                self.columns = hdulist[1].columns
+                hdulist.close()
         else:
             self.data = ascii.read(name, Reader=ascii.basic.CommentedHeader)
 
@@ -199,7 +210,7 @@ class BeagleMockCatalogue(object):
         """ 
 
         if file_name is None:
-            file_name = "BEAGLE_mock_catalogue.fits"
+            file_name = catalogue_file_name("BEAGLE_mock_catalogue.fits")
 
         # Check if the `file_name` already exists
         if data_exists(file_name) and not overwrite:
@@ -229,39 +240,26 @@ class BeagleMockCatalogue(object):
         n_files = len(file_list)
         data['ID'] = np.chararray(n_files, itemsize=20)
         for i, file in enumerate(file_list):
-            hdulist = fits.open(os.path.join(BeagleDirectories.results_dir, file))
-            data['ID'][i] = os.path.basename(file).split('_BEAGLE')[0]
-            for key, value in six.iteritems(params_dict):
-                val = hdulist[value["extName"]].data[value["colName"]]
-                if not key in data:
-                    data[key] = np.zeros(n_files)
-                data[key][i] = val
-            hdulist.close()
-
-        # Initialize a new (empty) primary HDU for your output FITS file
-        hdulist = fits.HDUList(fits.PrimaryHDU())
-    
-        new_columns = list()
+            with BeagleResultFile(os.path.join(BeagleDirectories.results_dir, file)) as f:
+                data['ID'][i] = os.path.basename(file).split('_BEAGLE')[0]
+                for key, value in six.iteritems(params_dict):
+                    val = f.read(value["extName"], columns=[value["colName"]])[value["colName"]]
+                    if not key in data:
+                        data[key] = np.zeros(n_files)
+                    data[key][i] = val
+
+        # The `ID` column contains a string, while all the other columns real data
+        dtype = [(str(key), 'S'+str(ID_COLUMN_LENGTH) if 'ID' in key else np.float32) for key in data]
+        table = np.zeros(n_files, dtype=dtype)
         for key, value in six.iteritems(data):
-
-            # The `ID` column contains a string, while all the other columns real data
-            if 'ID' in key:
-                new_columns.append(fits.Column(name=str(key), format=str(ID_COLUMN_LENGTH)+'A', array=data[key]))
-            else:
-                new_columns.append(fits.Column(name=str(key), format='E', array=data[key]))
-
-        cols_ = fits.ColDefs(new_columns)
-        new_hdu = fits.BinTableHDU.from_columns(cols_)
-
-        # And finally append the newly created binary table to the hdulist
-        # that will be printed to the ouput FITS file
-        hdulist.append(new_hdu)
+            table[str(key)] = value
 
         name = prepare_data_saving(file_name, overwrite=overwrite)
-        hdulist.writeto(name, clobber=overwrite)
+        write_catalogue(name, OrderedDict([(None, table)]), overwrite=overwrite)
 
-        self.columns = new_hdu.columns
-        self.data = new_hdu.data
+        with open_catalogue(name) as hdulist:
+            self.columns = hdulist[1].columns
+            self.data = read_extension(hdulist[1])
 
     def compare_hist(self, summary_catalogue,
             class_indices=None,
@@ -1,6 +1,20 @@
 from __future__ import absolute_import
+import sys
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import dill
+import matplotlib
+import matplotlib.pyplot as plt
+import six
 import six.moves.copyreg
 import types
+from six.moves import range, zip
+
+from .beagle_utils import BeagleDirectories
+from .beagle_cache import BeagleCache
+from .beagle_mirror import BeagleMirror
+from .beagle_plot_output import BeaglePlotOutput
 
 def _pickle_method(method):
 	func_name = method.__func__.__name__
@@ -23,3 +37,176 @@ def _unpickle_method(func_name, obj, cls):
 
 six.moves.copyreg.pickle(types.MethodType, _pickle_method, _unpickle_method)
 
+
+# Function applied by the worker processes of a `BeaglePool`. It is only set
+# inside each worker process, by `_initialize_worker`, and not sent over with
+# each task
+_worker_function = None
+
+# Classes whose (class) attributes hold the global configuration, which must be
+# copied to worker processes that are not forked
+_configuration_classes = (BeagleDirectories, BeagleCache, BeagleMirror, BeaglePlotOutput)
+
+def _get_configuration():
+
+    configuration = list()
+    for cls in _configuration_classes:
+        attributes = dict((key, value) for key, value in six.iteritems(vars(cls)) 
+                if not key.startswith('_') and not callable(value) and not isinstance(value, (staticmethod, classmethod)))
+        configuration.append(attributes)
+
+    return configuration
+
+def _get_matplotlib_configuration():
+
+    # The backend is switched to explicitly, rather than through the "backend"
+    # rc parameter
+    rc = dict((key, value) for key, value in six.iteritems(matplotlib.rcParams) if key != 'backend')
+
+    return matplotlib.get_backend(), rc
+
+def _initialize_worker(function, payload):
+
+    global _worker_function
+    if payload is not None:
+        function, configuration, (backend, rc) = dill.loads(payload)
+        for cls, attributes in zip(_configuration_classes, configuration):
+            for key, value in six.iteritems(attributes):
+                setattr(cls, key, value)
+
+        plt.switch_backend(backend)
+        matplotlib.rcParams.update(rc)
+
+    _worker_function = function
+
+def _run_chunk(chunk):
+
+    return [_worker_function(*args) for args in chunk]
+
+
+class BeaglePool(object):
+    """
+    Pool of worker processes applying the same function to many objects.
+
+    The function (usually the bound method of an object holding large data,
+    such as filter transmissions or an observed catalogue) is sent to each
+    worker process only once, when the worker starts. On platforms where
+    worker processes are forked, it is not pickled at all, but inherited
+    through copy-on-write memory (otherwise, the configuration held in
+    `BeagleDirectories`, `BeagleCache`, `BeagleMirror` and `BeaglePlotOutput`,
+    and the Matplotlib backend and rc parameters, are sent along with the
+    function).
+    Objects are then sent to the workers in
+    chunks, to reduce the inter-process communication overhead.
+
+    Parameters
+    ----------
+    function : callable
+        Function applied to each object.
+
+    n_proc : int
+        Number of worker processes.
+
+    chunk_size : int, optional
+        Number of objects sent to a worker process at once. By default uses
+        ``BeaglePool.chunk_size`` or, if not set, splits the objects in
+        about 4 chunks per worker process.
+
+    max_tasks_per_child : int, optional
+        Number of chunks processed by a worker process before it is replaced
+        by a new one (requires Python >= 3.11). By default uses
+        ``BeaglePool.max_tasks_per_child``.
+
+    ordered : bool, optional
+        Whether to return the results in the same order as the input objects,
+        or as soon as they are available.
+
+    Examples
+    --------
+    >>> pool = BeaglePool(my_spectrum.plot_marginal, n_proc=4)
+    >>> for result in pool.map(IDs, file_names):
+    >>>     pass
+    """
+
+    # Default number of objects sent to a worker process at once
+    chunk_size = None
+
+    # Default number of chunks processed by a worker process before it is
+    # replaced
+    max_tasks_per_child = None
+
+    def __init__(self, function, n_proc, chunk_size=None, max_tasks_per_child=None, ordered=True):
+
+        self.function = function
+        self.n_proc = n_proc
+
+        self.chunk_size = chunk_size
+        if chunk_size is None:
+            self.chunk_size = BeaglePool.chunk_size
+
+        self.max_tasks_per_child = max_tasks_per_child
+        if max_tasks_per_child is None:
+            self.max_tasks_per_child = BeaglePool.max_tasks_per_child
+
+        self.ordered = ordered
+
+    def map(self, *iterables):
+        """
+        Apply the function to each object.
+
+        Parameters
+        ----------
+        *iterables : iterable
+            Arguments of the function, as in the built-in `map`.
+
+        Returns
+        -------
+        generator
+            The results of the function for each object.
+        """
+
+        args = list(zip(*iterables))
+        if len(args) == 0:
+            return
+
+        chunk_size = self.chunk_size
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(args) // (4*self.n_proc)))
+
+        chunks = [args[i:i+chunk_size] for i in range(0, len(args), chunk_size)]
+
+        context = multiprocessing.get_context()
+        kwargs = dict()
+        if self.max_tasks_per_child is not None:
+            if sys.version_info >= (3, 11):
+                # Worker processes cannot be replaced when using "fork"
+                context = multiprocessing.get_context("spawn")
+                kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+            else:
+                logging.warning("`max_tasks_per_child` requires Python >= 3.11, and it will be ignored")
+
+        # The initializer arguments of forked worker processes are inherited
+        # from the parent process, so the function is passed as it is, while
+        # it is serialized (with the configuration) for spawned ones
+        if context.get_start_method() == "fork":
+            initargs = (self.function, None)
+        else:
+            initargs = (None, dill.dumps((self.function, _get_configuration(),
+                _get_matplotlib_configuration()), recurse=True))
+
+        with ProcessPoolExecutor(max_workers=self.n_proc,
+                mp_context=context,
+                initializer=_initialize_worker,
+                initargs=initargs,
+                **kwargs) as executor:
+
+            futures = [executor.submit(_run_chunk, chunk) for chunk in chunks]
+
+            if self.ordered:
+                iterator = futures
+            else:
+                iterator = as_completed(futures)
+
+            for future in iterator:
+                for result in future.result():
+                    yield result
@@ -1,4 +1,5 @@
 from __future__ import absolute_import
+import six
 from astropy.io import ascii
 from astropy.io import fits
 
@@ -24,4 +25,69 @@ class ObservedCatalogue(object):
         else:
             self.data = ascii.read(file_name, Reader=ascii.basic.CommentedHeader)
 
+        # Index of the rows of each object, built once for each column
+        # containing the object IDs
+        self.row_index = dict()
+        if 'ID' in self.data.dtype.names:
+            self.build_row_index('ID')
 
+    def build_row_index(self, key='ID'):
+        """
+        Build the index mapping each object ID to its row(s) in the catalogue.
+
+        Parameters
+        ----------
+        key : str, optional
+            Name of the column containing the object IDs.
+
+        Returns
+        -------
+        dict
+            The row indices corresponding to each ID.
+        """
+
+        index = dict()
+        for i, ID in enumerate(self.data[key]):
+            index.setdefault(ID, list()).append(i)
+
+        self.row_index[key] = index
+
+        return index
+
+    def extract_row(self, ID, key=None):
+        """
+        Extract the row(s) corresponding to an object ID.
+
+        This is equivalent to `beagle_utils.extract_row`, but it uses the
+        index built by `build_row_index` rather than scanning the catalogue.
+
+        Parameters
+        ----------
+        ID : int, str
+            Contains the object ID.
+
+        key : str, optional
+            Name of the column containing the object IDs, by default 'ID'.
+
+        Returns
+        -------
+        The catalogue row(s) corresponding to the input ID.
+        """
+
+        if key is None:
+            key='ID'
+
+        if key in self.row_index:
+            index = self.row_index[key]
+        else:
+            index = self.build_row_index(key)
+
+        if isinstance(self.data[key][0], six.string_types):
+            rows = index.get(str(ID))
+        else:
+            rows = index.get(int(ID))
+
+        if not rows:
+            raise ValueError("Cannot extract the row corresponding to the keyvalue '"+str(ID)+"'")
+
+        return self.data[rows]
@@ -60,6 +60,164 @@ def standard_parser():
         dest="ID_list"
     )
 
+    parser.add_argument(
+        '--cache',
+        help="Decompress each Beagle output file only once, and store its content in an "\
+                "uncompressed, memory-mappable cache in the pyp-beagle/data/cache folder.",
+        action="store_true", 
+        dest="use_cache"
+        )
+
+    parser.add_argument(
+        '--catalogue-format',
+        help="Format of the output catalogues (summary, mock and posterior predictive checks). "\
+                "Parquet and HDF5 catalogues require the pyarrow and h5py packages, respectively.",
+        action="store", 
+        type=str, 
+        choices=['fits', 'parquet', 'hdf5'],
+        dest="catalogue_format",
+        default="fits"
+        )
+
+    parser.add_argument(
+        '--predecompress',
+        help="Decompress the Beagle output files into the pyp-beagle/data/mirror folder "\
+                "(using -np threads), from which they are then read.",
+        action="store_true", 
+        dest="predecompress"
+        )
+
+    parser.add_argument(
+        '--mirror-max-size',
+        help="Maximum size (in GB) of the pyp-beagle/data/mirror folder, files exceeding it are "\
+                "read from the original file.",
+        action="store", 
+        type=float, 
+        dest="mirror_max_size"
+        )
+
+    parser.add_argument(
+        '--mirror-compression',
+        help="Tile compression of the image extensions of the mirrored files (lossy for "\
+                "floating-point images). By default the files are stored uncompressed.",
+        action="store", 
+        type=str, 
+        choices=['RICE_1', 'GZIP_1', 'GZIP_2', 'HCOMPRESS_1'],
+        dest="mirror_compression"
+        )
+
+    parser.add_argument(
+        '--clean-mirror',
+        help="Remove the pyp-beagle/data/mirror folder.",
+        action="store_true", 
+        dest="clean_mirror"
+        )
+
+    parser.add_argument(
+        '--ignore-mirror',
+        help="Read the original Beagle output files, even if a decompressed copy exists in "\
+                "the pyp-beagle/data/mirror folder.",
+        action="store_true", 
+        dest="ignore_mirror"
+        )
+
+    parser.add_argument(
+        '--consolidate',
+        help="Consolidate the posterior samples of all objects in a single store, in the "\
+                "pyp-beagle/data/consolidated folder, from which a column can be read for all objects at once.",
+        action="store_true", 
+        dest="consolidate"
+        )
+
+    parser.add_argument(
+        '--json-consolidate',
+        help="JSON file containing the extensions (and columns) consolidated in addition to the "\
+                "POSTERIOR PDF extension, in the same format as the --json-summary file.",
+        action="store", 
+        type=str, 
+        dest="consolidate_config"
+        )
+
+    parser.add_argument(
+        '--consolidate-format',
+        help="Format of the consolidated store: memory-mappable npy files, or a compressed "\
+                "HDF5 file (requires the h5py package).",
+        action="store", 
+        type=str, 
+        choices=['npy', 'hdf5'],
+        dest="consolidate_format",
+        default="npy"
+        )
+
+    parser.add_argument(
+        '--reduce-sed',
+        help="Reduce, for each object, the marginal SED extension to its weighted percentiles at "\
+                "the --credible-interval levels, its MAP SED and a set of posterior draws, saved in the "\
+                "pyp-beagle/data/reduced_sed folder and used in place of the full extension by the SED plots.",
+        action="store_true", 
+        dest="reduce_sed"
+        )
+
+    parser.add_argument(
+        '--reduce-sed-draws',
+        help="Number of SEDs drawn from the posterior distribution of each object by --reduce-sed.",
+        action="store", 
+        type=int, 
+        dest="reduce_sed_draws",
+        default=100
+        )
+
+    parser.add_argument(
+        '--batch-plots',
+        help="Render the per-object plots in batch mode: each process draws all objects on the same "\
+                "figure, updating its content in place, using the non-interactive Agg backend.",
+        action="store_true", 
+        dest="batch_plots"
+        )
+
+    parser.add_argument(
+        '--plot-format',
+        help="Format of the per-object plots (png is rendered with Agg, and is faster to write than pdf).",
+        action="store", 
+        type=str, 
+        choices=['pdf', 'png'],
+        dest="plot_format",
+        default="pdf"
+        )
+
+    parser.add_argument(
+        '--plot-dpi',
+        help="Resolution (dots per inch) of the per-object plots in png format.",
+        action="store", 
+        type=float, 
+        dest="plot_dpi"
+        )
+
+    parser.add_argument(
+        '--multipage-pdf',
+        help="Save the per-object plots as the pages of a single PDF file per type of plot "\
+                "(and per worker process), e.g. BEAGLE_marginal_SED_phot.pdf.",
+        action="store_true", 
+        dest="multipage_pdf"
+        )
+
+    parser.add_argument(
+        '--triangle-max-samples',
+        help="Maximum number of posterior samples used to draw each triangle plot: objects with more "\
+                "samples are thinned by systematic resampling on the posterior probability.",
+        action="store", 
+        type=int, 
+        dest="triangle_max_samples"
+        )
+
+    parser.add_argument(
+        '--single-pass',
+        help="Visit each Beagle output file only once, computing all the requested "\
+                "products (plots, summary catalogue, MAP solution) from the same loaded data.",
+        action="store_true",
+        dest="single_pass"
+        )
+
     parser.add_argument(
         '--json-triangle',
         help="JSON file used for the triangle plots.",
@@ -265,6 +423,14 @@ def standard_parser():
         dest="compute_summary" 
         )
 
+    parser.add_argument(
+        '--update-summary',
+        help="Update an existing summary catalogue, only computing the summary statistics "\
+                "of new objects, or of objects whose Beagle output file has changed.",
+        action="store_true", 
+        dest="update_summary" 
+        )
+
     parser.add_argument(
         '--credible-interval',
         help="Credible intervals to be plotted or pritned in LaTeX tables (e.g. 68., 95., 99.7)",
@@ -343,6 +509,22 @@ def standard_parser():
         default=1
     )
 
+    parser.add_argument(
+        '--chunk-size',
+        help="Number of objects sent at once to each process (by default about 4 chunks per process)",
+        action="store", 
+        type=int, 
+        dest="chunk_size"
+    )
+
+    parser.add_argument(
+        '--max-tasks-per-child',
+        help="Number of chunks processed by each process before being replaced by a new one (requires Python >= 3.11)",
+        action="store", 
+        type=int, 
+        dest="max_tasks_per_child"
+    )
+
     parser.add_argument(
         '--fontsize',
         help="Fontsize of axes labels, tick marks",
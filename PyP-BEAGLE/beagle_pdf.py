@@ -3,6 +3,8 @@ import logging
 import numpy as np
 import os
 import json
+import time
+import zlib
 from matplotlib import rc
 from matplotlib.colors import colorConverter
 from matplotlib.patches import Rectangle
@@ -12,12 +14,24 @@ from astropy.io import fits
 
 from getdist import plots, MCSamples
 
-from .beagle_utils import BeagleDirectories, prepare_plot_saving, plot_exists
+# Only available on POSIX systems, used to report the peak memory of the
+# process
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .beagle_utils import BeagleDirectories, prepare_plot_saving, plot_exists, \
+        effective_sample_size, systematic_resample
+from .beagle_cache import open_results
 import six
 from six.moves import range
 
 class PDF(object):
 
+    # Seed of the random number generators used to thin the posterior samples
+    resample_seed = 1234
+
     def __init__(self, params_file, **kwargs):
 
         # Names of parameters, used to label the axes, and whether they are log
@@ -39,12 +53,47 @@ class PDF(object):
 
         self.triangle_font_size = kwargs.get('fontsize')
 
+        # Maximum number of posterior samples used to draw the triangle plots
+        self.triangle_max_samples = kwargs.get('triangle_max_samples')
+
+    def thin_samples(self, ID, probability):
+        """
+        Posterior samples used to draw the triangle plot of an object.
+
+        Parameters
+        ----------
+        ID : str
+            The object ID, used (together with `resample_seed`) to initialize
+            the random number generator of the object.
+
+        probability : Numpy ndarray
+            Posterior probability of each sample.
+
+        Returns
+        -------
+        rows : slice or Numpy ndarray
+            Rows of the samples, i.e. all of them if `triangle_max_samples` is
+            not set or the object has fewer samples, and otherwise those drawn
+            by `beagle_utils.systematic_resample`.
+
+        weights : Numpy ndarray
+            Weight of each sample in `rows`.
+        """
+
+        if self.triangle_max_samples is None or probability.size <= self.triangle_max_samples:
+            return slice(None), probability
+
+        rng = np.random.default_rng([self.resample_seed, zlib.crc32(str(ID).encode('utf-8'))])
+
+        return systematic_resample(probability, self.triangle_max_samples, rng=rng)
+
     def plot_triangle(self, ID, 
             params_to_plot=None, 
             suffix=None, 
             replot=False, 
             M_star=False, 
-            show=False):
+            show=False,
+            results=None):
         """ 
         Draw a "triangle plot" with the 1D and 2D posterior probability
 
@@ -59,6 +108,16 @@ class PDF(object):
             instead of the mass of star formed (i.e., the plotted mass will
             accout for the return fraction)
 
+        results : `BeagleResults`, optional
+            The already opened Beagle output file, which is not closed here.
+
+        Notes
+        -----
+        If `triangle_max_samples` is set, and the object has more posterior
+        samples, the triangle plot is drawn from `triangle_max_samples`
+        systematic resampling draws (see `beagle_utils.systematic_resample`),
+        i.e. from the samples drawn at least once, weighted by the number of
+        draws, rather than from all samples.
         """ 
         # NB: you changed the getdist/plot.py _set_locator function
         # replacing line 1172-1176
@@ -93,48 +152,82 @@ class PDF(object):
             logging.warning('The plot "' + plot_name + '" already exists. \n Exiting the function.')
             return
 
+        start_time = time.time()
+
         fits_file = os.path.join(BeagleDirectories.results_dir,
                 str(ID) + '_' + BeagleDirectories.suffix + '.fits.gz')
 
-        hdulist = fits.open(fits_file)
+        hdulist = open_results(fits_file) if results is None else results
 
-        param_values = OrderedDict()
+       # ParamsToPlot = ['mass', 'redshift', 'tauV_eff', 'metallicity', 'specific_sfr', 'tau']
+
+        # By default you plot all parameters
+        if params_to_plot is None:
+            _params_to_plot = list()
+            for key, value in six.iteritems(self.adjust_params):
+                _params_to_plot.append(key)
+        else: 
+            _params_to_plot = params_to_plot
+
+        # Extension and column containing each parameter which is plotted
+        # (the single solutions are overplotted for all parameters)
+        param_columns = OrderedDict()
         for key, value in six.iteritems(self.adjust_params):
+            if key not in _params_to_plot and self.single_solutions is None:
+                continue
+
             extName = "POSTERIOR PDF"
             if "extName" in value:
-                extName = value["extName"]
+                extName = value["extName"].upper()
 
             colName = key
             if "colName" in value:
                 colName = value["colName"]
 
-            param_values[key] = hdulist[extName].data[colName]
+            param_columns[key] = (extName, colName)
 
-        probability = hdulist['posterior pdf'].data['probability']
+        # Only read those columns (and the probability), grouped by extension
+        columns = OrderedDict([("POSTERIOR PDF", ['probability'])])
+        for extName, colName in six.itervalues(param_columns):
+            columns.setdefault(extName, list())
+            if colName not in columns[extName]:
+                columns[extName].append(colName)
 
-        n_rows = probability.size
+        if M_star and 'mass' in _params_to_plot:
+            columns.setdefault("GALAXY PROPERTIES", list())
+            if 'M_star' not in columns["GALAXY PROPERTIES"]:
+                columns["GALAXY PROPERTIES"].append('M_star')
 
-       # ParamsToPlot = ['mass', 'redshift', 'tauV_eff', 'metallicity', 'specific_sfr', 'tau']
+        data = dict()
+        for extName, colNames in six.iteritems(columns):
+            data[extName] = hdulist.read(extName, columns=colNames)
 
-        # By default you plot all parameters
-        if params_to_plot is None:
-            _params_to_plot = list()
-            for key, value in six.iteritems(self.adjust_params):
-                _params_to_plot.append(key)
-        else: 
-            _params_to_plot = params_to_plot
+        # All data have been read, so the Beagle output file can be closed
+        if results is None:
+            hdulist.close()
+
+        param_values = OrderedDict()
+        for key, (extName, colName) in six.iteritems(param_columns):
+            param_values[key] = np.array(data[extName][colName])
+
+        probability = data['POSTERIOR PDF']['probability']
+
+        n_rows = probability.size
+
+        # Rows of the posterior samples used to draw the plot, and their weights
+        rows, weights = self.thin_samples(ID, probability)
 
         # Here you check whether you want to plot the mass currently locked
         # into stars or not (i.e. accounting for the return fraction as well)
         if M_star and 'mass' in _params_to_plot:
-            param_values['mass'][:] = np.log10(hdulist['galaxy properties'].data['M_star'][:])
+            param_values['mass'][:] = np.log10(data['GALAXY PROPERTIES']['M_star'][:])
 
         nParamsToPlot = len(_params_to_plot)
 
         names = list()
         labels = list()
         ranges = dict()
-        samps = np.zeros((n_rows, nParamsToPlot))
+        samps = np.zeros((len(weights), nParamsToPlot))
         keys = list()
 
         j = 0
@@ -146,11 +239,11 @@ class PDF(object):
                     label = par['label'].replace("$","")
                     labels.append(label)
 
-                    samps[:,j] = param_values[key]
+                    samps[:,j] = param_values[key][rows]
                     ranges.update({key:par['range']})
                     if 'log' in par:
                         if par["log"]:
-                            samps[:,j] = np.log10(param_values[key])
+                            samps[:,j] = np.log10(param_values[key][rows])
                             ranges.update({key:np.log10(par['range'])})
                     j += 1
                     break
@@ -167,7 +260,7 @@ class PDF(object):
                     }
 
         samples = MCSamples(samples=samps, names=names, ranges=ranges, \
-                weights=probability, labels=labels, settings=settings )
+                weights=weights, labels=labels, settings=settings )
 
         g = plots.getSubplotPlotter()
         g.settings.num_plot_contours = 3
@@ -281,7 +374,20 @@ class PDF(object):
             g.export(name)
 
         plt.close()
-        hdulist.close()
+
+        message = "Triangle plot of object " + str(ID) + ": " + str(len(weights)) + \
+                " out of " + str(n_rows) + " posterior samples (effective sample size " + \
+                "{:.0f}".format(effective_sample_size(probability)) + " -> " + \
+                "{:.0f}".format(effective_sample_size(weights)) + "), " + \
+                "{:.2f}".format(time.time()-start_time) + " s, " + \
+                "{:.1f}".format((samps.nbytes+np.asarray(weights).nbytes)/1024.**2) + \
+                " MB of samples passed to getdist"
+        if resource is not None:
+            # Peak resident memory (in kB on Linux) of the whole process since
+            # it started, i.e. not of this object only
+            message += ", process peak RSS " + \
+                    "{:.0f}".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.) + " MB"
+        logging.info(message)
 
 
 ##                # Overplot the posterior median point
@@ -18,7 +18,10 @@ import sys
 from pyp_beagle.dependencies.walker_random_sampling import WalkerRandomSampling
 
 from .beagle_utils import BeagleDirectories, prepare_plot_saving, set_plot_ticks, \
-        prepare_violin_plot, plot_exists, pause, extract_row, is_FITS_file
+        prepare_violin_plot, prepare_violin_plots, plot_exists, pause, extract_row, is_FITS_file
+from .beagle_cache import open_results
+from .beagle_mirror import BeagleMirror
+from .beagle_plot_output import BeaglePlotOutput
 from .beagle_filters import PhotometricFilters
 from .beagle_summary_catalogue import BeagleSummaryCatalogue
 from .beagle_residual_photometry import ResidualPhotometry
@@ -68,7 +71,7 @@ class PhotometricCatalogue(ObservedCatalogue):
         flux = np.zeros(filters.n_bands, np.float32)
         flux_err = np.zeros(filters.n_bands, np.float32)
 
-        row = extract_row(self.data, ID, key=key)
+        row = self.extract_row(ID, key=key)
 
         for j in range(filters.n_bands):
 
@@ -92,6 +95,65 @@ class PhotometricCatalogue(ObservedCatalogue):
 
         return flux, flux_err
 
+    def extract_fluxes_all(self, filters, aper_corr=1.):
+        """ 
+        Extract fluxes and error fluxes for all objects in the catalogue (units are Jy).
+
+        Parameters
+        ----------
+        filters : class
+            Contains the photometric filters
+
+        aper_corr : float or array, optional
+            Aperture correction, either the same for all objects, or one value
+            per object.
+
+        Returns    
+        -------
+        flux : array
+            In units of Jy, with shape (n_objects, n_bands)
+
+        flux_error : array 
+            In units of Jy, with shape (n_objects, n_bands)
+
+        Notes
+        -----
+        The rows follow the order of the catalogue. As in `extract_fluxes`,
+        the minimum relative error defined in the filters class is added in
+        quadrature (the resulting errors can differ from those of
+        `extract_fluxes` by one unit in the last place).
+        """
+
+        n_objects = len(self.data)
+
+        flux = np.full((n_objects, filters.n_bands), -99., np.float32)
+        flux_err = np.full((n_objects, filters.n_bands), -99., np.float32)
+
+        # The computation is done in single precision, as in `extract_fluxes`
+        if np.ndim(aper_corr) > 0:
+            aper_corr = np.asarray(aper_corr, dtype=np.float32)
+
+        for j in range(filters.n_bands):
+
+            # observed flux and its error
+            name = filters.data['flux_colName'][j]
+            if not name:
+                continue
+
+            flux[:,j] = self.data[name] * aper_corr * filters.units / Jy
+
+            name = filters.data['flux_errcolName'][j]
+            flux_err[:,j] = self.data[name] * aper_corr * filters.units / Jy
+
+        # if defined, add the minimum error in quadrature
+        min_rel_err = np.array(filters.data['min_rel_err'], dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            flux_err = np.where(flux_err > 0.,
+                    np.sqrt((flux_err/flux)**2 + min_rel_err**2) * np.abs(flux),
+                    flux_err)
+
+        return flux, flux_err
+
 class Photometry:
 
     def __init__(self, filters, **kwargs):
@@ -136,7 +198,7 @@ class Photometry:
 
     def plot_marginal(self, ID, max_interval=99.7, 
             print_text=False, print_title=False, replot=False, show=False, units='nanoJy',
-            SED_prob_log_scale=False, n_SED_to_plot=10):
+            SED_prob_log_scale=False, n_SED_to_plot=10, results=None):
         """ 
         Plot the fluxes predicted by BEAGLE.
 
@@ -163,6 +225,9 @@ class Photometry:
 
         replot: bool, optional
             Whether to redo the plot, even if it already exists
+
+        results : `BeagleResults`, optional
+            The already opened Beagle output file, which is not closed here.
         """
 
         if self.flux_units == 'milliJy':
@@ -181,13 +246,13 @@ class Photometry:
         plot_name = str(ID)+'_BEAGLE_marginal_SED_phot.pdf'
 
         # Check if the plot already exists
-        if plot_exists(plot_name) and not replot and not show:
+        if BeaglePlotOutput.exists(plot_name) and not replot and not show:
             logging.warning('The plot "' + plot_name + '" already exists. \n Exiting the function.')
             return
 
         # From the (previously loaded) observed catalogue select the row
         # corresponding to the input ID
-        observation = extract_row(self.observed_catalogue.data, ID, key=self.key)
+        observation = self.observed_catalogue.extract_row(ID, key=self.key)
 
         # Check if you need to apply an aperture correction to the catalogue fluxes
         if 'aper_corr' in self.observed_catalogue.data.dtype.names:
@@ -200,14 +265,16 @@ class Photometry:
         obs_flux *= flux_factor
         obs_flux_err *= flux_factor
 
-        fig = plt.figure()
-        ax = fig.add_subplot(1, 1, 1)
+        # In batch mode the same figure is reused for all objects, and its
+        # artists updated in place
+        template = BeaglePlotOutput.get_template('marginal_SED_phot')
+        fig, ax = template.fig, template.axs
 
         # Open the file containing BEAGLE results
         fits_file = os.path.join(BeagleDirectories.results_dir,
                 str(ID) + '_' + BeagleDirectories.suffix + '.fits.gz')
 
-        hdulist = fits.open(fits_file)
+        hdulist = open_results(fits_file) if results is None else results
 
         # Consider only the extension containing the predicted model fluxes
         old_API = False
@@ -217,21 +284,9 @@ class Photometry:
         except:
             model_sed = hdulist['apparent magnitudes']
 
-        probability = hdulist['posterior pdf'].data['probability']
+        probability = hdulist['posterior pdf']['probability']
 
         n_bands = len(obs_flux)
-        median_flux = np.zeros(n_bands)
-        pdf_norm = np.zeros(n_bands)
-        _max_y = np.zeros(n_bands)
-        min_flux = np.zeros(n_bands)
-        max_flux = np.zeros(n_bands)
-
-        y_plot = list(range(n_bands))
-        x_plot = list(range(n_bands))
-
-        has_pdf = list(range(n_bands))
-        kde_pdf = list(range(n_bands))
-        nXgrid = 1000
 
         if self.x_log:
             wl_eff = np.log10(self.filters.data['wl_eff'])
@@ -247,77 +302,83 @@ class Photometry:
 
         width = 5*np.min(wl_eff[1:]-wl_eff[0:-1])
 
-        kwargs = {'color':'tomato', 'alpha':0.8, 'edgecolor':'black', 'linewidth':0.2}
+        kwargs = {'facecolor':'tomato', 'alpha':0.8, 'edgecolor':'black', 'linewidth':0.2}
 
+        xdata = np.zeros((n_bands, len(probability)))
         for i in range(n_bands):
 
             if old_API:
                 band_name = self.filters.data['label'][sor[i]]
-                xdata = model_sed.data['_'+band_name+'_'] / Jy * flux_factor
+                xdata[i, :] = model_sed['_'+band_name+'_'] / Jy * flux_factor
             else:
                 band_name = self.filters.data['name'][sor[i]] + "_APP"
-                xdata = 10.**(0.4*(8.9-model_sed.data[band_name])) * flux_factor
+                xdata[i, :] = 10.**(0.4*(8.9-model_sed[band_name])) * flux_factor
 
-            min_x = np.min(xdata)
-            max_x = np.max(xdata)
-
-            min_flux[i] = np.min([min_x, obs_flux[i]-obs_flux_err[i]])
-            max_flux[i] = np.max([max_x, obs_flux[i]+obs_flux_err[i]])
-
-            # if min_x == max_x, then you can not use weighted KDE, since you
-            # just have one value for the x...this usually happens bacause of
-            # IGM absorption, which absorbs the flux blue-ward 1216 AA, making
-            # all flux = 0
-            if min_x == max_x:
-                has_pdf[i] = False
-                median_flux[i] = min_x
-                continue
+        min_x = np.min(xdata, axis=1)
+        max_x = np.max(xdata, axis=1)
 
-            # Compute the marginal PDF through a weighted KDE
-            has_pdf[i] = True
+        min_flux = np.minimum(min_x, obs_flux-obs_flux_err)
+        max_flux = np.maximum(max_x, obs_flux+obs_flux_err)
 
-            # This function provides you with all the necessary info to draw violin plots
-            kde_pdf[i], pdf_norm[i], median_flux[i], x_plot[i], y_plot[i] = prepare_violin_plot(xdata, weights=probability) 
+        # if min_x == max_x, then you can not use weighted KDE, since you
+        # just have one value for the x...this usually happens bacause of
+        # IGM absorption, which absorbs the flux blue-ward 1216 AA, making
+        # all flux = 0
+        has_pdf = min_x != max_x
+        median_flux = np.array(min_x)
 
-            _max_y[i] = np.max(y_plot[i])
+        # Compute the marginal PDFs of all bands through a weighted KDE, and
+        # all the necessary info to draw violin plots
+        x_plot = list(range(n_bands))
+        y_plot = list(range(n_bands))
+        median_pdf = np.zeros(n_bands)
+        if np.any(has_pdf):
+            median_pdf[has_pdf], median_flux[has_pdf], _x_plot, _y_plot = \
+                    prepare_violin_plots(xdata[has_pdf, :], weights=probability)
+            for i, _x, _y in zip(np.flatnonzero(has_pdf), _x_plot, _y_plot):
+                x_plot[i], y_plot[i] = _x, _y
 
         delta_wl = wl_eff[1:]-wl_eff[0:-1]
         delta_wl = np.concatenate(([delta_wl[0]], delta_wl))
         delta_wl /=  2.
 
-        for i in range(n_bands):
+        # The violins of all bands are drawn as a single collection of
+        # polygons, and their medians as a single collection of segments
+        violins = list()
+        median_segments = list()
+        for i in np.flatnonzero(has_pdf):
 
             dwl = delta_wl[i]
             if i > 1:
                 dwl = np.min(delta_wl[i-1:i])
 
-            if has_pdf[i]:
+            w = 0.4 * dwl / np.max(y_plot[i])
 
-                w = 0.4 * dwl / _max_y[i]
+            _lim_y = median_pdf[i] * w
 
-                y_grid = np.full(len(x_plot[i]), wl_eff[i])
-                _lim_y = kde_pdf[i](median_flux[i])/pdf_norm[i] * w
+            violins.append(np.concatenate((
+                np.column_stack((wl_eff[i] - y_plot[i]*w, x_plot[i])),
+                np.column_stack((wl_eff[i] + y_plot[i]*w, x_plot[i]))[::-1])))
 
-                ax.fill_betweenx(x_plot[i],
-                        y_grid - y_plot[i]*w,
-                        y_grid + y_plot[i]*w,
-                        **kwargs
-                        )
+            median_segments.append([[wl_eff[i]-_lim_y, median_flux[i]], [wl_eff[i]+_lim_y, median_flux[i]]])
 
-                ax.plot([wl_eff[i]-_lim_y, wl_eff[i]+_lim_y],
-                        [median_flux[i], median_flux[i]],
-                        color = 'black',
-                        linewidth = 0.2
-                        )
+        template.poly_collection(ax, 'violins', violins, **kwargs)
 
-            ax.plot(wl_eff[i],
-                    median_flux[i],
-                    color = 'black',
-                    marker = "o",
-                    markersize = 5,
-                    zorder=3,
-                    alpha = 0.6
-                    )
+        template.line_collection(ax, 'violin_medians', median_segments,
+                color = 'black',
+                linewidth = 0.2,
+                zorder = 2
+                )
+
+        template.plot(ax, 'medians', wl_eff,
+                median_flux,
+                color = 'black',
+                ls = "",
+                marker = "o",
+                markersize = 5,
+                zorder=3,
+                alpha = 0.6
+                )
 
 
         # Plot the full SED
@@ -332,8 +393,8 @@ class Photometry:
                 if self.plot_MAP_SED:
                     _n_SED_to_plot += 1
 
-                wl = hdulist['full sed wl'].data['wl'][0,:]
-                redshifts = hdulist['galaxy properties'].data['redshift']
+                wl = hdulist['full sed wl']['wl'][0,:]
+                redshifts = hdulist['galaxy properties']['redshift']
 
                 if SED_prob_log_scale:
                     max_prob = np.log10(np.amax(probability))
@@ -360,7 +421,7 @@ class Photometry:
                         lw=0.5
                         max_alpha = 0.4
 
-                    SED = hdulist['full sed'].data[i,:]
+                    SED = hdulist['full sed'][i,:]
 
                     z = 0.
                     if redshifts[i] > 0.:
@@ -386,7 +447,7 @@ class Photometry:
                         wl_obs = np.log10(wl_obs)
 
                     alpha=1.
-                    ax.plot(wl_obs, 
+                    template.plot(ax, ('SED', j), wl_obs, 
                             flux_obs,
                             color=color,
                             ls="-",
@@ -414,7 +475,7 @@ class Photometry:
         ax.set_xlim([x0-0.05*dx, x1+0.05*dx])
 
         x0, x1 = ax.get_xlim()
-        if yMin < 0.: plt.plot( [x0,x1], [0.,0.], color='gray', lw=0.8 )
+        if yMin < 0.: template.plot(ax, 'zero', [x0,x1], [0.,0.], color='gray', lw=0.8 )
 
         # Plot labels of photometric filters
         if self.plot_filter_labels:
@@ -434,7 +495,7 @@ class Photometry:
                 if len(band_name) >= 5:
                     rotation = 45
 
-                ax.text(x, y, 
+                template.text(ax, ('filter_label', i), x, y, 
                         band_name, 
                         fontsize=self.inset_fontsize, 
                         rotation=rotation,
@@ -444,7 +505,7 @@ class Photometry:
 
                 ydots = y-0.025*dy
                 y = max_flux[i]
-                ax.plot([x,x], [y,ydots], 
+                template.plot(ax, ('filter_line', i), [x,x], [y,ydots], 
                         ls=":",
                         color='darkgrey',
                         lw=1.0,
@@ -464,9 +525,9 @@ class Photometry:
 
         kwargs = {'alpha':0.7}
 
-        plt.errorbar(wl_eff[ok], 
+        template.errorbar(ax, 'observations', wl_eff[ok], 
                 obs_flux[ok], 
-                yerr = obs_flux_err[ok],
+                obs_flux_err[ok],
                 color = "dodgerblue",
                 ls = " ",
                 marker = "D",
@@ -480,9 +541,9 @@ class Photometry:
             row =  self.single_solutions['row'][self.single_solutions['ID']==ID]
             solution = np.zeros(n_bands, dtype=np.float32)
             for i, band_name in enumerate((self.filters.data['label'][sor])):
-                solution[i] = model_sed.data['_'+band_name+'_'][row] / nanoJy
+                solution[i] = model_sed['_'+band_name+'_'][row] / nanoJy
 
-            ax.plot(wl_eff,
+            template.plot(ax, 'single_solution', wl_eff,
                     solution,
                     color = 'green',
                     marker = "*",
@@ -496,7 +557,7 @@ class Photometry:
             which = 'x'
 
         # Title of the plot is the object ID
-        if print_title: plt.title(str(ID))
+        if print_title: ax.set_title(str(ID))
 
         # Location of printed text
         x0, x1 = ax.get_xlim()
@@ -508,7 +569,7 @@ class Photometry:
 
             # Print the evidence
             try:
-                ax.text(x, y, "$\\log(Z)=" + "{:.2f}".format(self.logEvidence) + "$", fontsize=10 )
+                template.text(ax, 'log_evidence', x, y, "$\\log(Z)=" + "{:.2f}".format(self.logEvidence) + "$", fontsize=10 )
             except AttributeError:
                 print("ciao")
 
@@ -517,7 +578,7 @@ class Photometry:
                 row = extract_row(self.PPC.data, ID, key=self.key)
                 aver_chi_square = row['aver_chi_square']
                 y = y1 - (y1-y0)*0.15
-                ax.text(x, y, "$\\langle\chi^2\\rangle=" + "{:.2f}".format(aver_chi_square) + "$", fontsize=10 )
+                template.text(ax, 'chi_square', x, y, "$\\langle\chi^2\\rangle=" + "{:.2f}".format(aver_chi_square) + "$", fontsize=10 )
             except AttributeError:
                 print("`PosteriorPredictiveChecks` not computed/loaded, hence " \
                 "<chi^2> for the object `" + str(ID) + "` is not available")
@@ -527,7 +588,7 @@ class Photometry:
                 aver_red_chi_square = row['aver_red_chi_square']
                 n_data = row['n_used_bands']
                 y = y1 - (y1-y0)*0.20
-                ax.text(x, y,
+                template.text(ax, 'red_chi_square', x, y,
                         "$\\langle\chi^2/(\\textnormal{N}_\\textnormal{data}-1)\\rangle=" \
                         + "{:.2f}".format(aver_red_chi_square) + "\; \
                         (\\textnormal{N}_\\textnormal{data}=" + \
@@ -536,20 +597,19 @@ class Photometry:
                 print("`PosteriorPredictiveChecks` not computed/loaded, hence " \
                 "<chi^2_red> for the object `" + str(ID) + "` is not available")
 
-        if y0 < 0.: plt.plot( [x0,x1], [0.,0.], color='gray', lw=1.0 )
+        if y0 < 0.: template.plot(ax, 'zero_symlog', [x0,x1], [0.,0.], color='gray', lw=1.0 )
+
+        template.finish()
 
         if show:
             plt.show()
         else:
-            name = prepare_plot_saving(plot_name)
+            BeaglePlotOutput.save(fig, plot_name, ID=ID)
 
-            fig.savefig(name, dpi=None, facecolor='w', edgecolor='w',
-                    orientation='portrait', papertype='a4', format="pdf",
-                    transparent=False, bbox_inches="tight", pad_inches=0.1)
+        BeaglePlotOutput.release(template)
 
-        plt.close(fig)
-
-        hdulist.close()
+        if results is None:
+            hdulist.close()
 
     def plot_replicated_data(self, ID, max_interval=99.7, n_replic_to_plot=16,
             print_text=False, replot=False):    
@@ -595,7 +655,7 @@ class Photometry:
         plot_name = str(ID)+'_BEAGLE_replic_data_phot.pdf'
 
         # Check if the plot already exists
-        if plot_exists(plot_name) and not replot:
+        if BeaglePlotOutput.exists(plot_name) and not replot:
             logging.warning('The plot "' + plot_name + '" already exists. \n Exiting the function.')
             return
 
@@ -609,7 +669,7 @@ class Photometry:
 
         # From the (previously loaded) observed catalogue select the row
         # corresponding to the input ID
-        observation = extract_row(self.observed_catalogue.data, ID, key=self.key)
+        observation = self.observed_catalogue.extract_row(ID, key=self.key)
 
         # Check if you need to apply an aperture correction to the catalogue fluxes
         if 'aper_corr' in self.observed_catalogue.data.dtype.names:
@@ -636,7 +696,7 @@ class Photometry:
         fits_file = os.path.join(BeagleDirectories.results_dir,
                 str(ID)+'_BEAGLE.fits.gz')
 
-        model_hdu = fits.open(fits_file)
+        model_hdu = fits.open(BeagleMirror.resolve(fits_file))
         model_sed = model_hdu['marginal photometry']
 
         # Open the file containing the replicated data
@@ -937,11 +997,7 @@ class Photometry:
 
         #fig.tight_layout()
 
-        name = prepare_plot_saving(plot_name)
-
-        fig.savefig(name, dpi=None, facecolor='w', edgecolor='w',
-                orientation='portrait', papertype='a4', format="pdf",
-                transparent=False, bbox_inches="tight", pad_inches=0.1)
+        BeaglePlotOutput.save(fig, plot_name, ID=ID)
 
         plt.close(fig)
 
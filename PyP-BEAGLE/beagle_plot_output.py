@@ -0,0 +1,301 @@
+from __future__ import absolute_import
+import os
+import logging
+import multiprocessing
+import multiprocessing.util
+from collections import OrderedDict
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection, LineCollection
+from matplotlib.backends.backend_pdf import PdfPages
+
+from .beagle_utils import prepare_plot_saving, plot_exists
+
+# Figure templates of the current process, which are kept open and reused
+# for all objects when `BeaglePlotOutput.reuse_figures` is set
+_templates = dict()
+
+# Multi-page PDF files open in the current process
+_multipage = dict()
+
+class FigureTemplate(object):
+    """
+    Figure whose artists are created once and then updated in place.
+
+    Artists are identified by a key: the first time a key is drawn the
+    artist is created, while later on only its data are updated (through
+    `set_data`, `set_verts`, `set_segments`, ...). Artists not drawn for
+    the current object are hidden, so that the same template can be used
+    for objects with, e.g., a different number of bands with measurements.
+
+    Parameters
+    ----------
+    fig : `matplotlib.figure.Figure`
+        The figure.
+
+    axs : `matplotlib.axes.Axes` or array of `matplotlib.axes.Axes`
+        The axes of the figure.
+    """
+
+    def __init__(self, fig, axs):
+
+        self.fig = fig
+        self.axs = axs
+        self._artists = OrderedDict()
+        self._drawn = set()
+
+    def new_frame(self):
+        """
+        Start drawing a new object.
+        """
+
+        self._drawn = set()
+
+    def _get(self, key):
+
+        self._drawn.add(key)
+        artist = self._artists.get(key)
+        if artist is not None:
+            for a in artist if isinstance(artist, tuple) else (artist,):
+                a.set_visible(True)
+
+        return artist
+
+    def plot(self, ax, key, x, y, **kwargs):
+
+        line = self._get(key)
+        if line is None:
+            line, = ax.plot(x, y, **kwargs)
+            self._artists[key] = line
+        else:
+            line.set_data(x, y)
+
+        return line
+
+    def fill_betweenx(self, ax, key, y, x1, x2, **kwargs):
+
+        poly = self._get(key)
+        if poly is None:
+            poly = ax.fill_betweenx(y, x1, x2, **kwargs)
+            self._artists[key] = poly
+        else:
+            y = np.asarray(y)
+            verts = np.concatenate((np.column_stack((np.broadcast_to(x1, y.shape), y)),
+                np.column_stack((np.broadcast_to(x2, y.shape), y))[::-1]))
+            poly.set_verts([verts])
+
+        return poly
+
+    def poly_collection(self, ax, key, verts, **kwargs):
+
+        collection = self._get(key)
+        if collection is None:
+            collection = PolyCollection(verts, **kwargs)
+            ax.add_collection(collection)
+            self._artists[key] = collection
+        else:
+            collection.set_verts(verts)
+
+        return collection
+
+    def line_collection(self, ax, key, segments, **kwargs):
+
+        collection = self._get(key)
+        if collection is None:
+            collection = LineCollection(segments, **kwargs)
+            ax.add_collection(collection)
+            self._artists[key] = collection
+        else:
+            collection.set_segments(segments)
+
+        return collection
+
+    def errorbar(self, ax, key, x, y, yerr, **kwargs):
+
+        artist = self._get(key)
+        if artist is None:
+            container = ax.errorbar(x, y, yerr=yerr, **kwargs)
+            data_line, caplines, barlinecols = container.lines
+            artist = (data_line,) + tuple(caplines) + tuple(barlinecols)
+            self._artists[key] = artist
+        else:
+            x, y, yerr = np.atleast_1d(x), np.atleast_1d(y), np.atleast_1d(yerr)
+            data_line, caplines, barlinecol = artist[0], artist[1:-1], artist[-1]
+            data_line.set_data(x, y)
+            if len(caplines) == 2:
+                caplines[0].set_data(x, y-yerr)
+                caplines[1].set_data(x, y+yerr)
+            barlinecol.set_segments(np.stack((np.column_stack((x, y-yerr)),
+                np.column_stack((x, y+yerr))), axis=1))
+
+        return artist
+
+    def text(self, ax, key, x, y, s, **kwargs):
+
+        text = self._get(key)
+        if text is None:
+            text = ax.text(x, y, s, **kwargs)
+            self._artists[key] = text
+        else:
+            text.set_position((x, y))
+            text.set_text(s)
+
+        return text
+
+    def finish(self):
+        """
+        Hide the artists not drawn for the current object.
+        """
+
+        for key, artist in self._artists.items():
+            if key not in self._drawn:
+                for a in artist if isinstance(artist, tuple) else (artist,):
+                    a.set_visible(False)
+
+class BeaglePlotOutput(object):
+    """
+    Output of the per-object plots.
+
+    Plots are saved in the `plot_format` format (e.g. 'pdf', or the faster
+    'png', rendered with Agg), either in one file per object or, if
+    `multipage` is set, as the pages of a single PDF file per type of plot
+    (and per worker process), e.g. `BEAGLE_marginal_SED_phot.pdf`. If
+    `reuse_figures` is set, each process draws all objects on the same
+    `FigureTemplate`, updating its artists in place, rather than building a
+    new figure for each object.
+    """
+
+    plot_format = 'pdf'
+
+    # Resolution of the plots in raster formats
+    dpi = None
+
+    multipage = False
+
+    reuse_figures = False
+
+    @classmethod
+    def get_name(cls, plot_name):
+        """
+        Name of the output file of a plot, with the extension of
+        `plot_format`.
+        """
+
+        return os.path.splitext(plot_name)[0] + '.' + cls.plot_format
+
+    @classmethod
+    def exists(cls, plot_name):
+        """
+        Whether a plot already exists. Plots saved in multi-page files are
+        always produced.
+        """
+
+        if cls.multipage:
+            return False
+
+        return plot_exists(cls.get_name(plot_name))
+
+    @classmethod
+    def get_template(cls, key, *args, **kwargs):
+        """
+        Figure on which a plot is drawn.
+
+        Parameters
+        ----------
+        key : str
+            Identifies the type of plot.
+
+        *args, **kwargs :
+            Passed to `matplotlib.pyplot.subplots` when creating the figure.
+
+        Returns
+        -------
+        `FigureTemplate`
+            The figure template of the current process if `reuse_figures` is
+            set, and otherwise a new one.
+        """
+
+        if cls.reuse_figures and key in _templates:
+            template = _templates[key]
+            template.new_frame()
+            return template
+
+        fig, axs = plt.subplots(*args, **kwargs)
+        template = FigureTemplate(fig, axs)
+
+        if cls.reuse_figures:
+            _templates[key] = template
+
+        return template
+
+    @classmethod
+    def release(cls, template):
+        """
+        Close the figure of a template, unless it is reused.
+        """
+
+        if not cls.reuse_figures:
+            plt.close(template.fig)
+
+    @staticmethod
+    def _get_multipage(name):
+
+        # Worker processes write their own file, which is closed when they exit
+        process = multiprocessing.current_process()
+        if process._identity:
+            root, ext = os.path.splitext(name)
+            name = root + '_' + '_'.join([str(i) for i in process._identity]) + ext
+
+        key = (os.getpid(), name)
+        if key not in _multipage:
+            _multipage[key] = PdfPages(prepare_plot_saving(name))
+            if process._identity:
+                multiprocessing.util.Finalize(None, BeaglePlotOutput.close, exitpriority=10)
+
+        return _multipage[key]
+
+    @classmethod
+    def save(cls, fig, plot_name, ID=None):
+        """
+        Save a plot.
+
+        Parameters
+        ----------
+        fig : `matplotlib.figure.Figure`
+            The figure.
+
+        plot_name : str
+            Name of the output file (without directory tree), e.g.
+            `<ID>_BEAGLE_marginal_SED_phot.pdf`.
+
+        ID : str, optional
+            The object ID. In multi-page files, the pages are named after the
+            plot name, and the file after the plot name without the ID.
+        """
+
+        kwargs = {'facecolor':'w', 'edgecolor':'w', 'transparent':False,
+                'bbox_inches':"tight", 'pad_inches':0.1}
+
+        if cls.multipage:
+            name = os.path.splitext(plot_name)[0] + '.pdf'
+            if ID is not None and name.startswith(str(ID) + '_'):
+                name = name[len(str(ID))+1:]
+            pdf = cls._get_multipage(name)
+            pdf.attach_note(os.path.splitext(plot_name)[0])
+            pdf.savefig(fig, **kwargs)
+            return
+
+        name = prepare_plot_saving(cls.get_name(plot_name))
+
+        fig.savefig(name, dpi=cls.dpi, format=cls.plot_format, **kwargs)
+
+    @staticmethod
+    def close():
+        """
+        Close the multi-page files written by the current process.
+        """
+
+        for key in list(_multipage):
+            if key[0] == os.getpid():
+                logging.info("Closing the multi-page file: " + key[1])
+                _multipage.pop(key).close()
@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 from __future__ import print_function
 import os
+from collections import OrderedDict
+from functools import partial
 from scipy import stats
 import numpy as np
 import matplotlib.pyplot as plt
@@ -11,12 +13,253 @@ import sys
 from pyp_beagle.dependencies.walker_random_sampling import WalkerRandomSampling
 
 from .beagle_utils import prepare_data_saving, prepare_plot_saving, \
-    BeagleDirectories, set_plot_ticks
+    BeagleDirectories, set_plot_ticks, is_FITS_file
+from .beagle_cache import open_results
+from .beagle_catalogue_io import catalogue_file_name, is_catalogue_file, write_catalogue, \
+    open_catalogue, read_extension
+from .beagle_multiprocess import BeaglePool
 from six.moves import range
 
 # 1 jy = 10^-23 erg s^-1 cm^-2 hz^-1
 jy = 1.E-23 
 
+def replicate_fluxes(model_flux, obs_flux_err, replic_data_rows, rng):
+    """ 
+    Draw replicated data, i.e. the model fluxes of a set of posterior samples
+    with the effect of observational noise added.
+
+    Parameters
+    ----------
+    model_flux : array
+        Model fluxes of all posterior samples, with shape (n_bands, n_samples).
+
+    obs_flux_err : array
+        Errors on the observed fluxes, with shape (n_bands,). Bands with
+        errors <= 0 are not replicated.
+
+    replic_data_rows : array
+        Indices of the posterior samples used to draw the replicated data.
+
+    rng : `numpy.random.Generator`
+        Random number generator used to draw the noise.
+
+    Returns
+    -------
+    replic_flux : array
+        Replicated fluxes, with shape (n_bands, len(replic_data_rows)).
+
+    noiseless_flux : array
+        Model fluxes of the samples used to draw the replicated data.
+    """
+
+    noiseless_flux = model_flux[:, replic_data_rows]
+
+    replic_flux = np.full(noiseless_flux.shape, -99.99999, np.float32)
+
+    # The noise is drawn at once for all bands with measurements
+    ok = np.where(obs_flux_err > 0.)[0]
+    replic_flux[ok, :] = noiseless_flux[ok, :] + \
+            rng.normal(scale=obs_flux_err[ok, np.newaxis], size=(len(ok), noiseless_flux.shape[1]))
+
+    return replic_flux, noiseless_flux
+
+def compute_p_value(obs_flux, obs_flux_err, replic_flux, noiseless_flux, discrepancy):
+    """ 
+    Compute the posterior predictive p-value of a set of replicated data.
+
+    Parameters
+    ----------
+    obs_flux : array
+        Observed fluxes, with shape (n_bands,), or (n_objects, n_bands) to
+        compute the p-values of several objects at once.
+
+    obs_flux_err : array
+        Errors on the observed fluxes, with the same shape as `obs_flux`.
+
+    replic_flux : array
+        Replicated fluxes, with shape (n_bands, n_replicated), or
+        (n_objects, n_bands, n_replicated).
+
+    noiseless_flux : array
+        Model fluxes of the samples used to draw the replicated data.
+
+    discrepancy : function
+        The discrepancy function, which must accept observed fluxes and
+        errors of shape (..., n_bands, 1), broadcast against the model fluxes.
+
+    Returns
+    -------
+    float or array
+        The fraction of replicated data whose discrepancy is larger than that
+        of the actual data.
+    """
+
+    # The observations are broadcast against the replicated data, rather
+    # than being repeated n_replicated times
+    _obs_flux = obs_flux[..., np.newaxis]
+    _obs_flux_err = obs_flux_err[..., np.newaxis]
+
+    discrepancy_data = discrepancy(_obs_flux, noiseless_flux, _obs_flux_err)
+    discrepancy_repl_data = discrepancy(replic_flux, noiseless_flux, _obs_flux_err)
+
+    return 1. * np.count_nonzero((discrepancy_repl_data > discrepancy_data), axis=-1) / replic_flux.shape[-1]
+
+def average_chi_square(obs_flux, obs_flux_err, model_flux, probability):
+    """ 
+    Compute the average chi-square of several objects at once.
+
+    Parameters
+    ----------
+    obs_flux : array
+        Observed fluxes, with shape (n_objects, n_bands).
+
+    obs_flux_err : array
+        Errors on the observed fluxes, with shape (n_objects, n_bands).
+
+    model_flux : list
+        Model fluxes of all posterior samples of each object, i.e. arrays
+        with shape (n_bands, n_samples), where `n_samples` can differ among
+        objects.
+
+    probability : list
+        Posterior probability of the samples of each object.
+
+    Returns
+    -------
+    array
+        The average chi-square of each object, i.e. the chi-square of each
+        posterior sample weighted by its probability.
+    """
+
+    n_samples = np.array([len(p) for p in probability])
+    start = np.concatenate(([0], np.cumsum(n_samples)[:-1]))
+
+    # All posterior samples are stacked, and each is compared with the
+    # observations of the corresponding object
+    obj = np.repeat(np.arange(len(n_samples)), n_samples)
+    model_flux = np.concatenate(model_flux, axis=1)
+    probability = np.concatenate(probability).astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chi = np.where(obs_flux_err[obj, :].T > 0.,
+                (obs_flux[obj, :].T-model_flux)**2/obs_flux_err[obj, :].T**2, 0.)
+
+    chi = np.sum(chi, axis=0)
+
+    return np.add.reduceat(probability*chi, start) / np.add.reduceat(probability, start)
+
+def _seed_key(seed):
+    """ 
+    String uniquely identifying the seed of a random number generator.
+    """
+
+    if isinstance(seed, np.random.SeedSequence):
+        return str(seed.entropy) + ':' + ','.join([str(k) for k in seed.spawn_key])
+
+    return str(seed)
+
+def replicated_data_name(ID):
+    """ 
+    Name of the file containing the replicated data of an object.
+
+    Parameters
+    ----------
+    ID : int, str
+        Contains the object ID.
+
+    Returns
+    -------
+    str
+        Full path to the file.
+    """
+
+    return os.path.join(BeagleDirectories.results_dir,
+            BeagleDirectories.pypbeagle_data, str(ID) + "_BEAGLE_replic_data.npz")
+
+def save_replicated_data(file_name, replic_flux, noiseless_flux, replic_data_rows,
+        n_data, n_replicated, seed, aver_chi_square=None, obs_flux=None, obs_flux_err=None):
+    """ 
+    Save the replicated data of an object in a single (uncompressed) NumPy
+    ``.npz`` file.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the output file.
+
+    replic_flux, noiseless_flux : array
+        Replicated and noise-less fluxes, with shape (n_bands, n_replicated).
+
+    replic_data_rows : array
+        Indices of the posterior samples used to draw the replicated data.
+
+    n_data : int
+        Number of bands with measurements.
+
+    n_replicated : int
+        The number of replicated data.
+
+    seed : int or `numpy.random.SeedSequence`
+        Seed of the random number generator used to draw the replicated data.
+
+    aver_chi_square : float, optional
+        The average chi-square of the object, saved together with the
+        observed fluxes and errors `obs_flux` and `obs_flux_err` it has been
+        computed with.
+    """
+
+    arrays = dict()
+    if aver_chi_square is not None:
+        arrays = {'aver_chi_square': aver_chi_square,
+                'obs_flux': np.asarray(obs_flux, dtype=np.float64),
+                'obs_flux_err': np.asarray(obs_flux_err, dtype=np.float64)}
+
+    # The file is written under a temporary name and then renamed, so that
+    # an incomplete file is never read
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        np.savez(f, 
+                replic_flux=np.asarray(replic_flux, dtype=np.float32),
+                noiseless_flux=np.asarray(noiseless_flux, dtype=np.float32),
+                row_index=np.asarray(replic_data_rows, dtype=np.int32),
+                n_data=n_data,
+                n_replicated=n_replicated,
+                seed=_seed_key(seed),
+                **arrays)
+
+    os.replace(tmp_name, file_name)
+
+def load_replicated_data(file_name, n_replicated, seed):
+    """ 
+    Load the replicated data of an object saved by `save_replicated_data`.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the file.
+
+    n_replicated : int
+        The number of replicated data.
+
+    seed : int or `numpy.random.SeedSequence`
+        Seed of the random number generator used to draw the replicated data.
+
+    Returns
+    -------
+    dict or None
+        The arrays saved by `save_replicated_data`, or None if the file does
+        not exist, or if it contains replicated data computed with a
+        different number of replicated data or seed.
+    """
+
+    if not os.path.isfile(file_name):
+        return None
+
+    with np.load(file_name) as f:
+        if int(f['n_replicated']) != n_replicated or str(f['seed']) != _seed_key(seed):
+            return None
+        return dict((key, f[key]) for key in f.files)
+
 class PosteriorPredictiveChecks(object):
 
     def chi_square(self, y, E_y, sig_y):
@@ -41,18 +284,21 @@ class PosteriorPredictiveChecks(object):
         Notes
         -----
         Negative values of sig_y produce a mask, i.e. those values are not
-        considered in the chi-square computation.
+        considered in the chi-square computation. For N-D inputs, the arrays
+        are broadcast against each other, and the sum is computed over the
+        second-to-last axis, e.g. over the bands of arrays with shape
+        (n_bands, n) or (n_objects, n_bands, n).
         For further details on "discrepancy functions" see Gelman, Meng & Stern (1996).
         """
     
         if y.ndim == 1:
             loc = np.where(sig_y > 0.)[0]
             return np.sum((y[loc]-E_y[loc])**2/sig_y[loc]**2)
-        elif y.ndim == 2:
-            my = np.ma.masked_array(y, mask=(sig_y <= 0.))
-            mE_y = np.ma.masked_array(E_y, mask=(sig_y <= 0.))
-            msig_y = np.ma.masked_array(sig_y, mask=(sig_y <= 0.))
-            return np.ma.sum((my-mE_y)**2/msig_y**2, axis=0)
+        else:
+            # The input arrays are broadcast against each other, so that e.g.
+            # the observed values can have shape (n, 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.sum(np.where(sig_y > 0., (y-E_y)**2/sig_y**2, 0.), axis=-2)
 
 
     def load(self, file_name):
@@ -68,142 +314,292 @@ class PosteriorPredictiveChecks(object):
         name = os.path.join(BeagleDirectories.results_dir,
                 BeagleDirectories.pypbeagle_data, file_name)
 
-        my_table = Table.read(name)
-    
+        if is_FITS_file(name) or not is_catalogue_file(name):
+            my_table = Table.read(name)
+        else:
+            with open_catalogue(name) as hdulist:
+                my_table = Table(read_extension(hdulist[1]))
+
         self.data = my_table
 
     def compute_replicated(self, observed_catalogue, filters, ID,
-            n_replicated=2000, seed=1234):
+            n_replicated=2000, seed=1234, obs_flux=None, obs_flux_err=None,
+            model_flux=None):
+            """ 
+            Compute (or read, if they have been previously computed) the
+            replicated data of an object.
+
+            The replicated data are saved in a compact binary file (see
+            `save_replicated_data`), which is reused by later calls with the
+            same `n_replicated` and `seed`, and in a FITS file with the same
+            structure as the "MARGINAL PHOTOMETRY" extension of the Beagle
+            output file.
+
+            Parameters
+            ----------
+            observed_catalogue : `beagle_photometry.PhotometricCatalogue`
+                Class containing an observed photometric catalogue.
+
+            filters : `beagle_filters.PhotometricFilters`
+                Class containing a set of photometric filters.
+
+            ID : int, str
+                Contains the object ID.
+
+            n_replicated: int, optional
+                The number of replicated data to draw.
+
+            seed : int or `numpy.random.SeedSequence`, optional
+                Seed of the random number generator used to draw the
+                replicated data.
+
+            obs_flux, obs_flux_err : array, optional
+                Observed fluxes and errors of the object, by default extracted
+                from `observed_catalogue`.
+
+            model_flux : array, optional
+                Model fluxes of all posterior samples, with shape (n_bands,
+                n_samples), by default read from the Beagle output file when
+                the replicated data are computed.
+
+            Returns
+            -------
+            replic_flux : array
+                Replicated fluxes, with shape (n_bands, n_replicated).
+
+            noiseless_flux : array
+                Model fluxes of the samples used to draw the replicated data.
+
+            model_flux : array
+                Model fluxes of all posterior samples, with shape (n_bands,
+                n_samples). When the replicated data are read from a previous
+                computation, this is the input `model_flux` (i.e. None if not
+                provided).
+
+            n_data : int
+                Number of bands with measurements.
+            """
 
             strID = str(ID)
             file = os.path.join(BeagleDirectories.results_dir,
                     strID + '_' + BeagleDirectories.suffix + '.fits.gz')
-            
-            # Name of the output file containing the replicated data
-            out_name = strID + "_BEAGLE_replic_data.fits.gz"
-            out_name = prepare_data_saving(out_name)
 
-            # Check if the file containing the replicated data already exists, in which case just read it!
-            if os.path.isfile(out_name):
+            # Check if the replicated data have already been computed, with
+            # the same number of replicated data and seed, in which case just
+            # read them! This does not require reading the Beagle output file
+            cache_name = replicated_data_name(ID)
+
+            record = load_replicated_data(cache_name, n_replicated, seed)
+            if record is not None:
+                return record['replic_flux'], record['noiseless_flux'], model_flux, int(record['n_data'])
 
-                # Read the model fluxes from the BEAGLE output file
-                hdulist = fits.open(file)
-                beagle_data = hdulist['MARGINAL PHOTOMETRY'].data
+            # Open the FITS file containing BEAGLE results for the current object
+            hdulist = open_results(file)
+            beagle_data = hdulist['MARGINAL PHOTOMETRY']
 
-                n_samples = len(hdulist['MARGINAL PHOTOMETRY'].data.field(0))
-                cols = hdulist['MARGINAL PHOTOMETRY'].columns
+            # Load the posterior probability and create array of row indices
+            probability = hdulist['POSTERIOR PDF']['probability']
+            n_samples = len(probability)
+            row_indices = np.arange(n_samples)
 
-                model_flux = np.zeros((filters.n_bands, n_samples), np.float32)
+            # Now, draw the weighted samples with replacement. The same
+            # generator is then used to draw the observational noise
+            rng = np.random.default_rng(seed)
+            wrand = WalkerRandomSampling(probability, keys=row_indices, rng=rng)
+            replic_data_rows = wrand.random(n_replicated)
 
-                for j in range(filters.n_bands):
-                    name = '_' + filters.data['label'][j] + '_'
-                    model_flux[j,:] = beagle_data[name] / jy
+            if obs_flux is None or obs_flux_err is None:
+                obs_flux, obs_flux_err = observed_catalogue.extract_fluxes(filters, ID)
+            n_data = np.count_nonzero(obs_flux_err > 0.)
 
-                # Close the BEAGLE output file and open the file containing replicated data
-                hdulist.close()
-                hdulist = fits.open(out_name)
+            # model flux
+            names = ['_' + label + '_' for label in filters.data['label']]
+            if model_flux is None:
+                model_flux = np.array([beagle_data[name] for name in names], dtype=np.float32) / jy
 
-                # Get the row indices, indicating which rows from the output
-                # BEAGLE file were used in the creation of the replicated data
-                replic_data_rows = hdulist[1].data['row_index']
+            # The replicated data are just the fluxes predicted by your
+            # model, drawn from the posterior probability distribution
+            # accordingly to their probability, with the effect of
+            # observatironal noise added
+            replic_flux, noiseless_flux = replicate_fluxes(model_flux, obs_flux_err,
+                    replic_data_rows, rng)
 
-                noiseless_flux = model_flux[:, replic_data_rows]
+            # Write the replicated data to an output FITS file
+            # Create the new FITS file
+            new_hdu = fits.HDUList(fits.PrimaryHDU())
 
-                replic_flux = np.zeros((filters.n_bands, len(replic_data_rows)), np.float32)
-                for col_name in hdulist[1].columns.names:
-                    if col_name in cols.names:
-                        replic_flux[j,:] = hdulist[1].data[col_name]
+            # Add column allowing you to match each row of the replicated
+            # data to the row of noise-less fluxes predicted by your model,
+            # i.e. those in the "MARGINAL PHOTOMETRY" extension of the
+            # BEAGLE output FITS file 
+            # NB: the column indexing start with 1 !!
+            ID_col = fits.Column(name='row_index', format='J')
 
-                return replic_flux, noiseless_flux, model_flux, n_data
+            # Copy the columns defined in the "MARGINAL PHOTOMETRY"
+            # extension to the new FITS file
+            cols = fits.ColDefs(np.asarray(beagle_data))
 
-            if os.path.isfile(file):
+            new_hdu.append(fits.BinTableHDU.from_columns(ID_col + cols, nrows=n_replicated, fill=True))
 
-                # Open the FITS file containing BEAGLE results for the current object
-                hdulist = fits.open(file)
-                beagle_data = hdulist['MARGINAL PHOTOMETRY'].data
+            # Fill with the replicated data fluxes
+            for j, name in enumerate(names):
+                new_hdu[1].data[name] = replic_flux[j,:]
 
-                # Load the posterior probability and create array of row indices
-                probability = hdulist['POSTERIOR PDF'].data['probability']
-                n_samples = len(probability)
-                row_indices = np.arange(n_samples)
+            # Fill with the row indices
+            new_hdu[1].data['row_index'] = replic_data_rows
 
-                # Now, draw the weighted samples with replacement
-                wrand = WalkerRandomSampling(probability, keys=row_indices, rand_seed=seed)
-                replic_data_rows = wrand.random(n_replicated)
+            # Save the files, replacing any replicated data computed with a
+            # different number of replicated data or seed
+            out_name = prepare_data_saving(strID + "_BEAGLE_replic_data.fits.gz", overwrite=True)
+            new_hdu.writeto(out_name, overwrite=True)
 
-                obs_flux = np.zeros(filters.n_bands, np.float32)
-                obs_flux_err = np.zeros(filters.n_bands, np.float32)
-                model_flux = np.zeros((filters.n_bands, n_samples), np.float32)
+            save_replicated_data(cache_name, replic_flux, noiseless_flux, replic_data_rows,
+                    n_data, n_replicated, seed)
 
-                # The replicated data are just the fluxes predicted by your
-                # model, drawn from the posterior probability distribution
-                # accordingly to their probability, with the effect of
-                # observatironal noise added
-                noiseless_flux = np.zeros((filters.n_bands, n_replicated), np.float32)
-                replic_flux = np.zeros((filters.n_bands, n_replicated), np.float32)
+            hdulist.close()
 
-                n_data = 0
+            return replic_flux, noiseless_flux, model_flux, n_data
 
-                obs_flux, obs_flux_err = observed_catalogue.extract_fluxes(filters, ID)
-                n_data = np.count_nonzero(obs_flux_err > 0.)
+    def compute_batch(self, observed_catalogue, filters, IDs, obs_flux, obs_flux_err,
+            seeds, discrepancy=None, n_replicated=2000):
+        """ 
+        Compute the posterior predictive checks quantities of several objects.
 
-                for j in range(filters.n_bands):
+        The replicated data of each object are computed (or read) in turn,
+        while the average chi-square and the p-values are computed at once
+        for all objects. The average chi-square is saved with the replicated
+        data, so that the Beagle output files of the objects whose replicated
+        data and average chi-square have already been computed (with the
+        same observed fluxes and errors) are not read.
 
-                    # model flux
-                    name = '_' + filters.data['label'][j] + '_'
-                    model_flux[j,:] = beagle_data[name] / jy
+        Parameters
+        ----------
+        observed_catalogue : `beagle_photometry.PhotometricCatalogue`
+            Class containing an observed photometric catalogue.
 
-                # You save in this array the noise-less flux predicted by the model        
-                noiseless_flux = model_flux[:, replic_data_rows]
+        filters : `beagle_filters.PhotometricFilters`
+            Class containing a set of photometric filters.
 
-                for j in range(filters.n_bands):
-                    # Here you add the observational noise to the
-                    # noise-less fluxes predicted by the model, obtaining
-                    # the actual replicated data
-                    if obs_flux_err[j] > 0.:
-                        replic_flux[j,:] = noiseless_flux[j, :] +   \
-                        np.random.normal(scale=obs_flux_err[j], size=n_replicated)
-                    else:    
-                        replic_flux[j,:] = -99.99999
+        IDs : list
+            Contains the object IDs.
 
-                # Write the replicated data to an output FITS file
-                # Create the new FITS file
-                new_hdu = fits.HDUList(fits.PrimaryHDU())
+        obs_flux, obs_flux_err : array
+            Observed fluxes and errors of the objects, with shape (n_objects, n_bands).
 
-                # Add column allowing you to match each row of the replicated
-                # data to the row of noise-less fluxes predicted by your model,
-                # i.e. those in the "MARGINAL PHOTOMETRY" extension of the
-                # BEAGLE output FITS file 
-                # NB: the column indexing start with 1 !!
-                ID_col = fits.Column(name='row_index', format='I')
+        seeds : list
+            Seeds (int or `numpy.random.SeedSequence`) of the random number
+            generators used to draw the replicated data of each object.
 
-                # Copy the columns defined in the "MARGINAL PHOTOMETRY"
-                # extension to the new FITS file
-                cols = hdulist['MARGINAL PHOTOMETRY'].columns
+        discrepancy : function, optional
+            The discrepancy function used in the posterior predicitve check.
+            It must accept arrays with shape (n_objects, n_bands, n_replicated).
 
-                new_hdu.append(fits.BinTableHDU.from_columns(ID_col + cols, nrows=n_replicated, fill=True))
+        n_replicated: int, optional
+            The number of replicated data to draw.
 
-                # Fill with the replicated data fluxes
-                j = 0
-                for col_name in new_hdu[1].columns.names:
-                    if col_name in cols.names:
-                        new_hdu[1].data[col_name] = replic_flux[j,:]
-                        j += 1
+        Returns
+        -------
+        found : array
+            Whether the Beagle output file of each object exists (the
+            following quantities are 0 if not).
 
-                # Fill with the row indices
-                new_hdu[1].data['row_index'] = replic_data_rows
+        n_data : array
+            Number of bands with measurements.
 
-                # Save the file
-                new_hdu.writeto(out_name)
+        aver_chi_square : array
+            The average chi-square.
 
-            hdulist.close()
+        p_value : array
+            The p-value.
+        """
 
-            return replic_flux, noiseless_flux, model_flux, n_data
+        if discrepancy is None:
+            discrepancy = self.chi_square
 
-    def compute(self, observed_catalogue, filters, discrepancy=None, 
-            n_replicated=2000, file_name=None):
+        n_obj = len(IDs)
+        obs_flux = np.asarray(obs_flux)
+        obs_flux_err = np.asarray(obs_flux_err)
+
+        found = np.zeros(n_obj, dtype=bool)
+        n_data = np.zeros(n_obj, dtype=np.int32)
+        aver_chi_square = np.zeros(n_obj)
+        p_value = np.zeros(n_obj)
+
+        replic_flux, noiseless_flux, model_flux, probability = list(), list(), list(), list()
+
+        # Objects whose average chi-square must be computed
+        computed = list()
+
+        names = ['_' + label + '_' for label in filters.data['label']]
+
+        for i, ID in enumerate(IDs):
+
+            file = os.path.join(BeagleDirectories.results_dir,
+                    str(ID) + '_' + BeagleDirectories.suffix + '.fits.gz')
+
+            if not os.path.isfile(file):
+                continue
+
+            found[i] = True
+
+            record = load_replicated_data(replicated_data_name(ID), n_replicated, seeds[i])
+            if record is not None and 'aver_chi_square' in record \
+                    and np.array_equal(record['obs_flux'], obs_flux[i,:], equal_nan=True) \
+                    and np.array_equal(record['obs_flux_err'], obs_flux_err[i,:], equal_nan=True):
+                replic_flux.append(record['replic_flux'])
+                noiseless_flux.append(record['noiseless_flux'])
+                n_data[i] = int(record['n_data'])
+                aver_chi_square[i] = float(record['aver_chi_square'])
+                continue
+
+            computed.append(i)
+
+            # The model fluxes of all posterior samples are needed to compute
+            # the average chi-square
+            hdulist = open_results(file)
+            beagle_data = hdulist['MARGINAL PHOTOMETRY']
+            _model_flux = np.array([beagle_data[name] for name in names], dtype=np.float32) / jy
+            probability.append(np.asarray(hdulist['POSTERIOR PDF']['probability']))
+            hdulist.close()
+
+            _replic_flux, _noiseless_flux, _model_flux, n_data[i] = self.compute_replicated(observed_catalogue,
+                    filters, ID, n_replicated=n_replicated, seed=seeds[i],
+                    obs_flux=obs_flux[i,:], obs_flux_err=obs_flux_err[i,:],
+                    model_flux=_model_flux)
+
+            replic_flux.append(_replic_flux)
+            noiseless_flux.append(_noiseless_flux)
+            model_flux.append(_model_flux)
+
+        if not np.any(found):
+            return found, n_data, aver_chi_square, p_value
+
+        # The p-value is just the fraction of objects for which the
+        # discrepancy for the replicated data is larger then that for
+        # the actual data! 
+        p_value[found] = compute_p_value(obs_flux[found,:], obs_flux_err[found,:], 
+                np.array(replic_flux), np.array(noiseless_flux), discrepancy)
+
+        # Here you cosider all samples in the posterior
+        if len(computed) > 0:
+            aver_chi_square[computed] = average_chi_square(obs_flux[computed,:], obs_flux_err[computed,:], 
+                    model_flux, probability)
+
+        # Save the average chi-square together with the replicated data
+        for i in computed:
+            name = replicated_data_name(IDs[i])
+            record = load_replicated_data(name, n_replicated, seeds[i])
+            save_replicated_data(name, record['replic_flux'], record['noiseless_flux'],
+                    record['row_index'], int(record['n_data']), n_replicated, seeds[i],
+                    aver_chi_square=aver_chi_square[i], obs_flux=obs_flux[i,:],
+                    obs_flux_err=obs_flux_err[i,:])
+
+        return found, n_data, aver_chi_square, p_value
+
+    def compute_single(self, observed_catalogue, filters, ID, obs_flux, obs_flux_err,
+            discrepancy=None, n_replicated=2000, seed=1234):
         """ 
-        Compute  posterior predictive checks quantities.
+        Compute the posterior predictive checks quantities of a single object.
 
         Parameters
         ----------
@@ -213,126 +609,154 @@ class PosteriorPredictiveChecks(object):
         filters : `beagle_filters.PhotometricFilters`
             Class containing a set of photometric filters.
 
+        ID : int, str
+            Contains the object ID.
+
+        obs_flux, obs_flux_err : array
+            Observed fluxes and errors of the object.
+
         discrepancy : function, optional
             The discrepancy function used in the posterior predicitve check.
 
         n_replicated: int, optional
             The number of replicated data to draw.
 
-        file_name : str, optional
-            Name of the output catalogue, wuthout including the direcory tree.
-            It will be saved into the RESULTS_DIR/pypbeagle_DATA folder (which
-            will be created if not present).
-        """
-
-        if file_name is None:
-            file_name = "PPC.fits"
-
-        if discrepancy is None:
-            discrepancy = self.chi_square
+        seed : int or `numpy.random.SeedSequence`, optional
+            Seed of the random number generator used to draw the replicated
+            data.
 
-        # Copy from the catalogue the column containing the object IDs
-        objID = Column(data=observed_catalogue.data['ID'], name='ID', dtype=np.int32) 
-
-        n_obj = len(observed_catalogue.data['ID'])
-        
-        # Defines columns containing the number of photometric bands actually
-        # used in the BEAGLE run, for a given object,
-        n_used_bands = Column(name='n_used_bands', dtype=np.int32, length=n_obj)
+        Returns
+        -------
+        tuple or None
+            The number of bands with measurements, the average chi-square and
+            the p-value, or None if the Beagle output file of the object does
+            not exist.
+        """
 
-        deg_of_freedom = Column(name='dof', dtype=np.int32, length=n_obj)
+        found, n_data, aver_chi_square, p_value = self.compute_batch(observed_catalogue, filters,
+                [ID], np.atleast_2d(obs_flux), np.atleast_2d(obs_flux_err), [seed],
+                discrepancy=discrepancy, n_replicated=n_replicated)
 
-        # the average chi-square, and average chi-square/n_used_bands
-        # Compute the "average chi square", a measure of the predicitve accuacy
-        # of the model (e.g. see Section 6.5 of "Bayesian Data Analysis", by
-        # Gelman, Carlin, Stern and Rubin )
-        aver_chi_square = Column(name='aver_chi_square', dtype=np.float32,
-                length=n_obj)
+        if not found[0]:
+            return None
 
-        # Int from 0 to x of chi^2(x) with N-1 degreed of freedom (see Johnson,
-        # V. E. (2004). A Bayesian chi2 Test for Goodness-of-Fit on JSTOR.
-        # Annals of Statistics for an explanation of why the average chi^2 has
-        # N-1 and not N-k-1 degrees of freedom)
+        return n_data[0], aver_chi_square[0], p_value[0]
 
-        left_cumul_probability = Column(name='left_cumul_probability', dtype=np.float32,
-                length=n_obj)
+    def compute(self, observed_catalogue, filters, discrepancy=None, 
+            n_replicated=2000, file_name=None, n_proc=1, seed=1234, batch_size=100):
+        """ 
+        Compute  posterior predictive checks quantities.
 
-        # Int from x to +infty of chi^2(x)
-        right_cumul_probability = Column(name='right_cumul_probability', dtype=np.float32,
-                length=n_obj)
+        Parameters
+        ----------
+        observed_catalogue : `beagle_photometry.PhotometricCatalogue`
+            Class containing an observed photometric catalogue.
 
-        aver_red_chi_square = Column(name='aver_red_chi_square',
-                dtype=np.float32, length=n_obj)
+        filters : `beagle_filters.PhotometricFilters`
+            Class containing a set of photometric filters.
 
-        p_value = Column(name='p_value',
-                dtype=np.float32, length=n_obj)
+        discrepancy : function, optional
+            The discrepancy function used in the posterior predicitve check.
 
-        my_cols = [objID, n_used_bands, deg_of_freedom, aver_chi_square,
-                aver_red_chi_square, left_cumul_probability,
-                right_cumul_probability, p_value]
+        n_replicated: int, optional
+            The number of replicated data to draw.
 
-        my_table = Table(my_cols)
+        file_name : str, optional
+            Name of the output catalogue, wuthout including the direcory tree.
+            It will be saved into the RESULTS_DIR/pypbeagle_DATA folder (which
+            will be created if not present).
 
-        model_flux = np.zeros(filters.n_bands, np.float32)
+        n_proc : int, optional
+            Number of processes used to compute the replicated data of
+            different objects. With `n_proc` > 1, the discrepancy function
+            must be picklable.
+
+        seed : int, optional
+            Seed from which the (independent) seeds of the random number
+            generators of each object are derived (through
+            `numpy.random.SeedSequence.spawn`), so that the results do not
+            depend on `n_proc` or `batch_size`.
+
+        batch_size : int, optional
+            Number of objects processed together by `compute_batch`. The
+            memory required scales with `batch_size` times the number of
+            posterior samples of each object.
+        """
 
+        if file_name is None:
+            file_name = catalogue_file_name("PPC.fits")
 
-        for i in range(n_obj):
+        # Copy from the catalogue the column containing the object IDs
+        objID = np.asarray(observed_catalogue.data['ID'])
 
-            ID = objID[i]
-            strID = str(objID[i])
-            file = os.path.join(BeagleDirectories.results_dir,
-                    strID + '_' + BeagleDirectories.suffix + '.fits.gz')
+        n_obj = len(objID)
 
-            if os.path.isfile(file):
+        # Observed fluxes and errors of all objects, in the same order as the catalogue
+        all_obs_flux, all_obs_flux_err = observed_catalogue.extract_fluxes_all(filters)
 
-                print("")
-                print("HERE")
-                obs_flux, obs_flux_err = observed_catalogue.extract_fluxes(filters, ID)
+        # Independent seeds for each object
+        seeds = np.random.SeedSequence(seed).spawn(n_obj)
 
-                replic_flux, noiseless_flux, model_flux, n_data = self.compute_replicated(observed_catalogue, filters, ID)
+        batches = [slice(i, min(i+batch_size, n_obj)) for i in range(0, n_obj, batch_size)]
+        args = ([objID[b] for b in batches], [all_obs_flux[b] for b in batches], 
+                [all_obs_flux_err[b] for b in batches], [seeds[b] for b in batches],
+                (discrepancy,)*len(batches), (n_replicated,)*len(batches))
 
-                hdulist = fits.open(file)
-                probability = hdulist['POSTERIOR PDF'].data['probability']
+        # Create the output folder before the replicated data of different
+        # objects are written to it
+        name = prepare_data_saving(file_name)
 
-                n_samples = model_flux.shape[1]
-                n_replicated = replic_flux.shape[1]
+        if n_proc > 1:
+            function = partial(self.compute_batch, observed_catalogue, filters)
+            data = BeaglePool(function, n_proc).map(*args)
+        else:
+            data = (self.compute_batch(observed_catalogue, filters, *_args) for _args in zip(*args))
 
-                # Extend the arrays containing the observed flux and its
-                # error to match the shape of the replicated data array
-                ext_obs_flux = obs_flux.reshape(filters.n_bands, 1).repeat(n_replicated, 1)
-                ext_obs_flux_err = obs_flux_err.reshape(filters.n_bands, 1).repeat(n_replicated, 1)
+        found = np.zeros(n_obj, dtype=bool)
+        n_data = np.zeros(n_obj, dtype=np.int32)
+        av_chi_square = np.zeros(n_obj)
+        p_value = np.zeros(n_obj)
 
-                # Compute the "discrepancy" for the actual data, and for the replicated data
-                discrepancy_data = discrepancy(ext_obs_flux, noiseless_flux, ext_obs_flux_err)
-                discrepancy_repl_data = discrepancy(replic_flux, noiseless_flux, ext_obs_flux_err)
+        for b, result in zip(batches, data):
+            found[b], n_data[b], av_chi_square[b], p_value[b] = result
 
-                # The p-value is just the fraction of objects for which the
-                # discrepancy for the replicated data is larger then that for
-                # the actual data! 
-                my_table['p_value'][i] = 1. * np.count_nonzero((discrepancy_repl_data > discrepancy_data)) / n_replicated
+        # Int from 0 to x of chi^2(x) with N-1 degreed of freedom (see Johnson,
+        # V. E. (2004). A Bayesian chi2 Test for Goodness-of-Fit on JSTOR.
+        # Annals of Statistics for an explanation of why the average chi^2 has
+        # N-1 and not N-k-1 degrees of freedom)
+        dof = n_data
+        left_cumul_probability = np.zeros(n_obj)
+        left_cumul_probability[found] = stats.chi2.cdf(av_chi_square[found], dof[found])
 
-                dof = n_data
-                my_table['n_used_bands'][i] = n_data
-                my_table['dof'][i] = dof
+        aver_red_chi_square = np.zeros(n_obj)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aver_red_chi_square[found] = av_chi_square[found] / dof[found]
 
-                # Here you cosider all samples in the posterior
-                ext_obs_flux = obs_flux.reshape(filters.n_bands, 1).repeat(n_samples, 1)
-                ext_obs_flux_err = obs_flux_err.reshape(filters.n_bands, 1).repeat(n_samples, 1)
-                av_chi_square = np.sum(probability*self.chi_square(ext_obs_flux, model_flux, ext_obs_flux_err)) / np.sum(probability)
-                my_table['aver_chi_square'][i] = av_chi_square
-                my_table['aver_red_chi_square'][i] = av_chi_square / dof
+        # Int from x to +infty of chi^2(x)
+        right_cumul_probability = np.zeros(n_obj)
+        right_cumul_probability[found] = 1.-left_cumul_probability[found]
 
-                cdf = stats.chi2.cdf(av_chi_square, dof)
-                my_table['left_cumul_probability'][i] = cdf
-                my_table['right_cumul_probability'][i] = 1.-cdf
+        # Defines columns containing the number of photometric bands actually
+        # used in the BEAGLE run, for a given object, the average chi-square,
+        # and average chi-square/n_used_bands
+        # Compute the "average chi square", a measure of the predicitve accuacy
+        # of the model (e.g. see Section 6.5 of "Bayesian Data Analysis", by
+        # Gelman, Carlin, Stern and Rubin )
+        my_cols = [Column(data=objID, name='ID', dtype=np.int32),
+                Column(data=n_data, name='n_used_bands', dtype=np.int32),
+                Column(data=dof, name='dof', dtype=np.int32),
+                Column(data=av_chi_square, name='aver_chi_square', dtype=np.float32),
+                Column(data=aver_red_chi_square, name='aver_red_chi_square', dtype=np.float32),
+                Column(data=left_cumul_probability, name='left_cumul_probability', dtype=np.float32),
+                Column(data=right_cumul_probability, name='right_cumul_probability', dtype=np.float32),
+                Column(data=p_value, name='p_value', dtype=np.float32)]
 
-                hdulist.close()
+        my_table = Table(my_cols)
 
         self.columns = my_cols
         self.data = my_table
 
-        name = prepare_data_saving(file_name)
-        my_table.write(name)
+        write_catalogue(name, OrderedDict([(None, my_table.as_array())]))
 
     def plot_chi2(self, 
             plot_name="BEAGLE_average_chi_square.pdf"):
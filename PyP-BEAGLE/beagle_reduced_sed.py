@@ -0,0 +1,301 @@
+from __future__ import absolute_import
+import os
+import zlib
+import logging
+from functools import partial
+import numpy as np
+
+from .beagle_utils import BeagleDirectories, weighted_quantiles
+from .beagle_cache import open_results
+from .beagle_multiprocess import BeaglePool
+
+def credible_quantiles(credible_intervals):
+    """
+    Cumulative probabilities of the median and of the lower and upper limits
+    of a set of credible intervals.
+
+    Parameters
+    ----------
+    credible_intervals : iterable float
+        Credible intervals, in percent, e.g. [68., 95.].
+
+    Returns
+    -------
+    list
+        The cumulative probabilities, i.e. 0.5 followed by the lower and upper
+        limit of each credible interval.
+    """
+
+    quantiles = [0.5]
+    for interval in credible_intervals:
+        lev = (1.-interval/100.)/2.
+        quantiles += [lev, 1.-lev]
+
+    return quantiles
+
+def _object_seed(ID, seed):
+
+    # Each object has its own random number generator, so that its draws do
+    # not depend on the other objects being reduced
+    return [seed, zlib.crc32(str(ID).encode('utf-8'))]
+
+def reduce_marginal_SED(results, credible_intervals=(68., 95.), n_draws=100, seed=1234, ID=None):
+    """
+    Reduce the `marginal sed` extension of a Beagle output file to its
+    weighted percentiles, its maximum-a-posteriori SED and a set of posterior
+    draws.
+
+    Parameters
+    ----------
+    results : `BeagleResults`
+        The opened Beagle output file.
+
+    credible_intervals : iterable float, optional
+        Credible intervals, in percent, whose lower and upper limits are
+        computed in addition to the median.
+
+    n_draws : int, optional
+        Number of SEDs randomly drawn from the posterior distribution.
+
+    seed : int, optional
+        Seed of the random number generator used to draw the SEDs.
+
+    ID : str, optional
+        The object ID, used (together with `seed`) to initialize the random
+        number generator of the object.
+
+    Returns
+    -------
+    dict
+        The arrays saved by `BeagleReducedSED.save`.
+    """
+
+    model_wl = np.array(results['marginal sed wl']['wl'][0,:], dtype=np.float64)
+    model_fluxes = results['marginal sed']
+
+    probability = np.array(results['posterior pdf']['probability'], np.float64)
+    probability = probability/probability.sum()
+
+    quantiles = credible_quantiles(credible_intervals)
+
+    reduced = {
+            'wl': model_wl,
+            'quantile_levels': np.array(quantiles),
+            'quantiles': weighted_quantiles(model_fluxes, probability, quantiles).astype(np.float32),
+            'MAP_flux': np.array(model_fluxes[np.argmax(probability),:], dtype=np.float32)
+            }
+
+    # The draws are taken from the image already read to compute the
+    # percentiles, with the rows sorted
+    rng = np.random.default_rng(_object_seed(ID, seed))
+    rows = np.sort(rng.choice(len(probability), size=n_draws, p=probability))
+    reduced['draw_rows'] = rows.astype(np.int32)
+    reduced['draw_flux'] = np.array(model_fluxes[rows,:], dtype=np.float32)
+
+    # The membership is checked through `BeagleResults`, so that the FITS
+    # file is not opened when the extensions are read from the cache
+    if 'MARGINAL SED MASK' in results:
+        reduced['mask'] = np.array(results['marginal sed mask']['mask'][0], dtype=bool)
+
+    _redshifts = np.unique(results.read('galaxy properties', columns=['redshift'])['redshift'])
+    reduced['redshift'] = _redshifts[0] if len(_redshifts) == 1 else np.nan
+
+    return reduced
+
+def _reduce_file(credible_intervals, n_draws, seed, item):
+
+    file, ID = item
+
+    # The reduced SED refers to the original Beagle output file, also when
+    # its mirrored copy is read
+    file_name = os.path.join(BeagleDirectories.results_dir, file)
+
+    with open_results(file_name) as results:
+        reduced = reduce_marginal_SED(results, credible_intervals=credible_intervals,
+                n_draws=n_draws, seed=seed, ID=ID)
+
+    BeagleReducedSED.save(BeagleReducedSED.get_file_name(ID), reduced, file_name)
+
+class BeagleReducedSED(object):
+    """
+    Pre-reduced `marginal sed` extension of the Beagle output files.
+
+    For each object, the weighted percentiles of the (n_samples x n_wl)
+    `marginal sed` image at a set of credible intervals, its
+    maximum-a-posteriori SED and a fixed set of posterior draws are saved in
+    a small `<ID>_BEAGLE_reduced_SED.npz` file of the `pyp-beagle/data/reduced_sed`
+    folder, which is read, in place of the full image, by
+    `Spectrum.plot_marginal` (and can be read by stacking tools).
+
+    A reduced SED is only used while the Beagle output file it has been
+    computed from has not been modified. The original (gzipped) file is
+    always used as reference, also when its copy in the `BeagleMirror` is
+    read.
+    """
+
+    @staticmethod
+    def get_file_name(ID, results_dir=None):
+        """
+        Name of the file containing the reduced SED of an object.
+
+        Parameters
+        ----------
+        ID : str
+            The object ID.
+
+        results_dir : str, optional
+            Directory containing the BEAGLE output files. By default uses
+            ``BeagleDirectories.results_dir``.
+
+        Returns
+        -------
+        str
+            Full path to the file.
+        """
+
+        if results_dir is None:
+            results_dir = BeagleDirectories.results_dir
+
+        return os.path.join(results_dir, BeagleDirectories.pypbeagle_reduced_sed,
+                str(ID) + '_BEAGLE_reduced_SED.npz')
+
+    @staticmethod
+    def save(file_name, reduced, source_name):
+        """
+        Save the reduced SED of an object in a single (uncompressed) NumPy
+        ``.npz`` file.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of the output file.
+
+        reduced : dict
+            The arrays returned by `reduce_marginal_SED`.
+
+        source_name : str
+            Full path to the (original) Beagle output file the reduced SED is
+            computed from.
+        """
+
+        directory = os.path.dirname(file_name)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        stat = os.stat(source_name)
+
+        # The file is written under a temporary name and then renamed, so that
+        # an incomplete file is never read
+        tmp_name = file_name + '.tmp'
+        with open(tmp_name, 'wb') as f:
+            np.savez(f,
+                    source_mtime=stat.st_mtime,
+                    source_size=stat.st_size,
+                    **reduced)
+
+        os.replace(tmp_name, file_name)
+
+    @staticmethod
+    def load(file_name, source_name, quantiles=None):
+        """
+        Load the reduced SED of an object saved by `save`.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of the file.
+
+        source_name : str
+            Full path to the (original) Beagle output file the reduced SED
+            has been computed from.
+
+        quantiles : iterable float, optional
+            Cumulative probabilities of the requested quantiles, e.g. as
+            returned by `credible_quantiles`.
+
+        Returns
+        -------
+        dict or None
+            The arrays saved by `save`, where `quantiles` only contains the
+            requested quantiles, or None if the file does not exist, if the
+            Beagle output file has been modified after the reduced SED has
+            been computed, or if the requested quantiles have not been
+            computed.
+        """
+
+        if not os.path.isfile(file_name):
+            return None
+
+        stat = os.stat(source_name)
+
+        with np.load(file_name) as f:
+            if float(f['source_mtime']) != stat.st_mtime or int(f['source_size']) != stat.st_size:
+                return None
+
+            reduced = dict((key, f[key]) for key in f.files)
+
+        if quantiles is not None:
+            rows = list()
+            for q in quantiles:
+                i = np.flatnonzero(np.isclose(reduced['quantile_levels'], q))
+                if len(i) == 0:
+                    return None
+                rows.append(i[0])
+            reduced['quantile_levels'] = reduced['quantile_levels'][rows]
+            reduced['quantiles'] = reduced['quantiles'][rows,:]
+
+        return reduced
+
+    @classmethod
+    def build(cls, file_list, IDs, credible_intervals=(68., 95.), n_draws=100, seed=1234,
+            n_proc=1, replace=False):
+        """
+        Reduce the `marginal sed` extension of a list of Beagle output files.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files, relative to
+            ``BeagleDirectories.results_dir``.
+
+        IDs : list
+            IDs of the objects.
+
+        credible_intervals : iterable float, optional
+            Credible intervals, in percent, whose lower and upper limits are
+            computed in addition to the median.
+
+        n_draws : int, optional
+            Number of SEDs randomly drawn from the posterior distribution of
+            each object.
+
+        seed : int, optional
+            Seed of the random number generators used to draw the SEDs.
+
+        n_proc : int, optional
+            Number of objects reduced at the same time.
+
+        replace : bool, optional
+            Whether to recompute the reduced SEDs which are up-to-date.
+        """
+
+        quantiles = credible_quantiles(credible_intervals)
+
+        items = list()
+        for file, ID in zip(file_list, IDs):
+            if not replace:
+                source_name = os.path.join(BeagleDirectories.results_dir, file)
+                reduced = cls.load(cls.get_file_name(ID), source_name, quantiles=quantiles)
+                if reduced is not None and len(reduced['draw_rows']) == n_draws:
+                    continue
+            items.append((file, ID))
+
+        logging.info("Reducing the marginal SED of " + str(len(items)) + " out of " + \
+                str(len(file_list)) + " objects")
+
+        function = partial(_reduce_file, credible_intervals, n_draws, seed)
+        if n_proc > 1:
+            list(BeaglePool(function, n_proc, ordered=False).map(items))
+        else:
+            for item in items:
+                function(item)
@@ -0,0 +1,146 @@
+from __future__ import absolute_import
+import numpy as np
+from astropy.io import fits
+
+from .beagle_mirror import BeagleMirror
+
+def _table_to_array(data, columns=None):
+    """
+    Convert (some columns of) a FITS binary table into a plain Numpy
+    structured array.
+
+    Columns are accessed one by one, so that scaled and logical columns are
+    stored with their actual values, and not with their FITS representation.
+    """
+
+    if columns is None:
+        columns = data.names
+
+    arrays = [np.asarray(data[name]) for name in columns]
+    dtype = [(name, a.dtype, a.shape[1:]) for name, a in zip(columns, arrays)]
+
+    table = np.empty(len(data), dtype=dtype)
+    for name, a in zip(columns, arrays):
+        table[name] = a
+
+    return table
+
+class BeagleResultFile(object):
+    """
+    Lazy, column-selective reader of a Beagle output FITS file.
+
+    The file is only opened when data (or headers) are first requested (from
+    its decompressed copy in the `BeagleMirror`, if available), and
+    the headers and data of each extension are only read when that extension
+    is accessed, so that e.g. for gzipped files the extensions that are not
+    needed are never decoded. The column names of an extension are obtained
+    from its header, without reading its data.
+
+    Parameters
+    ----------
+    file_name : str
+        Full path to the Beagle output file.
+
+    Examples
+    --------
+    >>> with BeagleResultFile(file_name) as f:
+    >>>     if 'mass' in f.get_columns('posterior pdf'):
+    >>>         data = f.read('posterior pdf', columns=['probability', 'mass'])
+    """
+
+    def __init__(self, file_name):
+
+        self.file_name = file_name
+        self.hdulist = None
+
+    def open(self):
+        """
+        The FITS file, opened on first use.
+
+        Returns
+        -------
+        `astropy.io.fits.HDUList`
+        """
+
+        if self.hdulist is None:
+            self.hdulist = fits.open(BeagleMirror.resolve(self.file_name), lazy_load_hdus=True)
+
+        return self.hdulist
+
+    def get_extensions(self):
+        """
+        Names of the extensions of the file (from the headers only).
+
+        Returns
+        -------
+        list
+        """
+
+        return [hdu.name.upper() for hdu in self.open()[1:]]
+
+    def get_columns(self, extName):
+        """
+        Names of the columns of a binary table extension (from the header only).
+
+        Parameters
+        ----------
+        extName : str
+            Name of the extension.
+
+        Returns
+        -------
+        list
+            The column names, or None for image extensions.
+        """
+
+        hdu = self.open()[extName]
+        if hdu.is_image:
+            return None
+
+        return list(hdu.columns.names)
+
+    def read(self, extName, columns=None):
+        """
+        Read the data of an extension.
+
+        Parameters
+        ----------
+        extName : str
+            Name of the extension.
+
+        columns : list, optional
+            Names of the columns read from a binary table extension. By
+            default all columns are read.
+
+        Returns
+        -------
+        array
+            A Numpy structured array containing the requested columns, or the
+            image for image extensions.
+        """
+
+        hdu = self.open()[extName]
+        if hdu.is_image:
+            return hdu.data
+
+        return _table_to_array(hdu.data, columns=columns)
+
+    def __getitem__(self, extName):
+
+        return self.open()[extName].data
+
+    def __contains__(self, extName):
+
+        return extName in self.open()
+
+    def close(self):
+
+        if self.hdulist is not None:
+            self.hdulist.close()
+            self.hdulist = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
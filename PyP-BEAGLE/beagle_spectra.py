@@ -26,7 +26,8 @@ import pyp_beagle.dependencies.autoscale as autoscale
 from pyp_beagle.dependencies import FillBetweenStep
 import pyp_beagle.dependencies.set_shared_labels  as shLab
 
-from .beagle_utils import BeagleDirectories, prepare_plot_saving, set_plot_ticks, plot_exists
+from .beagle_utils import BeagleDirectories, prepare_plot_saving, set_plot_ticks, plot_exists, \
+        weighted_quantiles
 from .beagle_filters import PhotometricFilters
 from .beagle_summary_catalogue import BeagleSummaryCatalogue
 #from beagle_residual_photometry import ResidualPhotometry
@@ -34,6 +35,9 @@ from .beagle_multinest_catalogue import MultiNestCatalogue
 from .beagle_posterior_predictive_checks import PosteriorPredictiveChecks
 from .beagle_mock_catalogue import BeagleMockCatalogue
 from .beagle_calibration_correction import CalibrationCorrection
+from .beagle_cache import open_results
+from .beagle_plot_output import BeaglePlotOutput
+from .beagle_reduced_sed import BeagleReducedSED, credible_quantiles
 
 # See here
 # http://peak.telecommunity.com/DevCenter/PythonEggs#accessing-package-resources
@@ -232,7 +236,8 @@ class Spectrum(object):
             observation_name=None,
             max_interval=95.0,
             print_text=False, 
-            replot=False):    
+            replot=False,
+            results=None):    
         """ 
         Plot the fluxes predicted by BEAGLE.
 
@@ -256,6 +261,9 @@ class Spectrum(object):
 
         print_text : bool, optional
             Whether to print the object ID on the top of the plot.
+
+        results : `BeagleResults`, optional
+            The already opened Beagle output file, which is not closed here.
         """
 
         # Factor to convert angstrom to input units
@@ -284,7 +292,7 @@ class Spectrum(object):
             plot_name = str(ID) + '_BEAGLE_marginal_SED_spec' + plot_suffix + '.pdf'
 
         # Check if the plot already exists
-        if plot_exists(plot_name) and not replot:
+        if BeaglePlotOutput.exists(plot_name) and not replot:
             logging.warning('The plot "' + plot_name + '" already exists. \n Exiting the function.')
             return
 
@@ -309,28 +317,31 @@ class Spectrum(object):
         fits_file = os.path.join(BeagleDirectories.results_dir,
                 str(ID) + '_' + BeagleDirectories.suffix + '.fits.gz')
 
-        hdulist = fits.open(fits_file)
+        hdulist = open_results(fits_file) if results is None else results
 
-        # Read the template wl array, and the 2D flux array
-        model_wl = hdulist['marginal sed wl'].data['wl'][0,:]
-        model_fluxes = hdulist['marginal sed'].data
-        
+        # Cumulative probabilities corresponding to the median and to the
+        # lower and upper limits of the credible region
+        quantiles = credible_quantiles([max_interval])
 
-            
+        # The median and percentiles of the fluxes are read from the reduced
+        # SED of the object, if available, rather than computed from the full
+        # (n_samples x n_wl) `marginal sed` extension
+        reduced = BeagleReducedSED.load(BeagleReducedSED.get_file_name(ID), fits_file, quantiles=quantiles)
+
+        if reduced is not None:
+            model_wl = np.array(reduced['wl'])
+            median_flux, lower_flux, upper_flux = np.array(reduced['quantiles'], dtype=np.float64)
+        else:
+            # Read the template wl array, and the 2D flux array
+            model_wl = np.array(hdulist['marginal sed wl']['wl'][0,:])
+            model_fluxes = hdulist['marginal sed']
 
         # Read the posterior probability
         # to use random.choice you need the probabilities to very high precision and to
         # sum to 1
-        probability = np.array(hdulist['posterior pdf'].data['probability'], np.float64)
-        probability = probability/probability.sum().astype(np.float64)
-
-        # Now compute for each wl bin the sorted fluxes, you will need this to
-        # calculate the median and percentiles for each wl bin
-        sort_indices = np.argsort(model_fluxes, axis=0)
-
-        # Now it's time to compute the median (observed-frame) SED and its percentiles
-        n_wl = model_fluxes.shape[1]
-        
+        if reduced is None or self.show_calibration_correction or self.plot_full_SED:
+            probability = np.array(hdulist['posterior pdf']['probability'], np.float64)
+            probability = probability/probability.sum().astype(np.float64)
 
         # If plotting the calibration correction, create calibration_correction fluxes
         if self.show_calibration_correction:
@@ -338,67 +349,24 @@ class Spectrum(object):
 #            nSamp = 100
 #            idx = np.random.choice(np.fromiter((x for x in range(model_fluxes.shape[0])),np.int),\
 #                                               size=nSamp,p=probability)
-            calibration_correction_arr = np.zeros([model_fluxes.shape[0],n_wl])
+            # Evaluate the correction of all posterior samples at once
             w0 = 0.5*(model_wl[0]+model_wl[-1])
-            for i in range(model_fluxes.shape[0]):
-                tmp_coeff = []
-                for d in range(self.calibration_correction.degree+1):
-                    label = 'continuum_coeff-'+str(d+1)
-                    if self.calibration_correction.coeff_params[label]['fitted']:
-                        tmp_coeff.append(hdulist['posterior pdf'].data[label][i])
-                    else:
-                        tmp_coeff.append(self.calibration_correction.coeff_params[label]['value'])
-              
-                calibration_correction_arr[i,:] = self.calibration_correction.return_correction((model_wl-w0)/1E4, tmp_coeff)
-                
-            median_calibration = np.zeros(n_wl)
-            lower_calibration = np.zeros(n_wl)
-            upper_calibration = np.zeros(n_wl)
-
-        median_flux = np.zeros(n_wl)
-        lower_flux = np.zeros(n_wl)
-        upper_flux = np.zeros(n_wl)
-
-        for i in range(n_wl):
-
-            # Compute the cumulative probability
-            # ******************************************************************
-            # Here you must simply use `cumsum`, and not `cumtrapz` as in
-            # beagle_utils.prepare_violin_plot, since the output of MultiNest are a set
-            # of weights (which sum up to 1) associated to each set of parameters (the
-            # `p_j` of equation 9 of Feroz+2009), and not a probability density (as the
-            # MultiNest README would suggest).
-            # ******************************************************************
-            sort_ = sort_indices[:,i]
-            cumul_pdf = np.cumsum(probability[sort_])
-            cumul_pdf /= cumul_pdf[len(cumul_pdf)-1]
-            
-            # Get the interpolant of the cumulative probability
-            f_interp = interp1d(cumul_pdf, model_fluxes[sort_,i])
-
-            # The median corresponds to a cumulative probability = 0.5
-            median_flux[i] = f_interp(0.5)
-
-            # Compute the percentiles for the different credible regions
-            lev = (1.-max_interval/100.)/2.
-            lower_flux[i] = f_interp(lev)
-
-            lev = 1.-(1.-max_interval/100.)/2.
-            upper_flux[i] = f_interp(lev)
-            
-            if self.show_calibration_correction:
-                f_interp = interp1d(cumul_pdf, calibration_correction_arr[sort_,i])
-                median_calibration[i] = f_interp(0.5)
-                
-                lev = (1.-max_interval/100.)/2.
-                lower_calibration[i] = f_interp(lev)
-
-                lev = 1.-(1.-max_interval/100.)/2.
-                upper_calibration[i] = f_interp(lev)
-#        pylab.figure()
-#        pylab.plot(model_wl, lower_calibration)
-#        pylab.plot(model_wl, upper_calibration)
-#        pylab.show()
+            coeff_matrix = self.calibration_correction.return_coeff_matrix(hdulist['posterior pdf'], 
+                    len(probability))
+            calibration_correction_arr = self.calibration_correction.return_correction_matrix((model_wl-w0)/1E4,
+                    coeff_matrix)
+
+            # NB: these are the weighted quantiles of the correction itself.
+            # Earlier versions interpolated the corrections sorted by the
+            # value of the model flux (and not of the correction) at each
+            # wavelength, which gives a different envelope
+            median_calibration, lower_calibration, upper_calibration = \
+                    weighted_quantiles(calibration_correction_arr, probability, quantiles)
+
+        # Compute, for all wl bins at once, the median and percentiles of the
+        # fluxes, weighting each row by its posterior probability
+        if reduced is None:
+            median_flux, lower_flux, upper_flux = weighted_quantiles(model_fluxes, probability, quantiles)
                 
     
         # Set the plot limits from the minimum and maximum wl_eff
@@ -406,8 +374,10 @@ class Spectrum(object):
         residual_axs = list()
         if observation.data['redshift'] is not None:
             redshift = observation.data['redshift']
+        elif reduced is not None and np.isfinite(reduced['redshift']):
+            redshift = float(reduced['redshift'])
         else:
-            _redshifts =  hdulist['galaxy properties'].data['redshift']
+            _redshifts =  hdulist['galaxy properties']['redshift']
             _, _counts = np.unique(_redshifts, return_counts=True)
             if len(_counts) > 1:
                 raise ValueError("The `redshift` of the object is not unique!")
@@ -452,8 +422,11 @@ class Spectrum(object):
         slices.append(np.ma.clump_masked(masked_array))
 
         model_mask = np.ones(len(model_wl), dtype=bool)
-        if "marginal sed mask" in hdulist:
-            model_mask = np.array(hdulist['marginal sed mask'].data['mask'][0], dtype=bool)
+        if reduced is not None:
+            if 'mask' in reduced:
+                model_mask = np.array(reduced['mask'], dtype=bool)
+        elif "marginal sed mask" in hdulist:
+            model_mask = np.array(hdulist['marginal sed mask']['mask'][0], dtype=bool)
 
         # Create masked versions of arrays
         slices_model = list()
@@ -479,10 +452,6 @@ class Spectrum(object):
             else:
                 n_ranges = int(1.*len(self.wl_range)/2.)
 
-        figsize = [12,8]
-        if self.show_calibration_correction and self.show_residual:
-            figsize = [12,12]
-        fig = plt.figure(figsize=figsize)
         if self.show_residual or self.show_calibration_correction:
             fig, axs_ = plt.subplots(n_outer, n_ranges, gridspec_kw = {'height_ratios':height_ratios})
         else:
@@ -783,15 +752,15 @@ class Spectrum(object):
                 rand_indices = wrand.random(self.n_SED_to_plot)
 
                 if self.wl_rest:
-                    wl_obs = hdulist['full sed wl'].data['wl'][0,:]
+                    wl_obs = hdulist['full sed wl']['wl'][0,:]
 
                     for i in rand_indices:
-                        SED = hdulist['full sed'].data[i,:]
+                        SED = hdulist['full sed'][i,:]
                 else:
-                    wl_obs = hdulist['full sed wl'].data['wl'][0,:] * z1
+                    wl_obs = hdulist['full sed wl']['wl'][0,:] * z1
 
                     for i in rand_indices:
-                        SED = hdulist['full sed'].data[i,:] / z1
+                        SED = hdulist['full sed'][i,:] / z1
 
                     ax.plot(wl_obs, 
                             flux_obs,
@@ -985,11 +954,8 @@ class Spectrum(object):
 
         #plt.tight_layout()
 
-        name = prepare_plot_saving(plot_name)
-
-        fig.savefig(name, dpi=None, facecolor='w', edgecolor='w',
-                orientation='portrait', papertype='a4', format="pdf",
-                transparent=False, bbox_inches="tight", pad_inches=0.1)
+        BeaglePlotOutput.save(fig, plot_name, ID=ID)
         plt.close(fig)
 
-        hdulist.close()
+        if results is None:
+            hdulist.close()
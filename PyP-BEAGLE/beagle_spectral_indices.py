@@ -30,9 +30,11 @@ import pyp_beagle.dependencies.set_shared_labels  as shLab
 from .significant_digits import to_precision
 
 from .beagle_utils import BeagleDirectories, prepare_plot_saving, set_plot_ticks, plot_exists, \
-        prepare_violin_plot, extract_row
+        prepare_violin_plot
 
 from .beagle_observed_catalogue import ObservedCatalogue
+from .beagle_cache import open_results
+from .beagle_plot_output import BeaglePlotOutput
 
 # See here
 # http://peak.telecommunity.com/DevCenter/PythonEggs#accessing-package-resources
@@ -105,7 +107,7 @@ class SpectralIndices(object):
 
     def plot_line_fluxes(self, 
             ID, replot=False, 
-            title=False, letter=None, signif_digits=1):
+            title=False, letter=None, signif_digits=1, results=None):
 
         suffix = ""
         #if self.print_values:
@@ -114,29 +116,31 @@ class SpectralIndices(object):
         plot_name = str(ID) + '_BEAGLE_spectral_indices' + suffix + ".pdf"
 
         # Check if the plot already exists
-        if plot_exists(plot_name) and not replot:
+        if BeaglePlotOutput.exists(plot_name) and not replot:
             logging.warning('The plot "' + plot_name + '" already exists. \n Exiting the function.')
             return
 
         # From the (previously loaded) observed catalogue select the row
         # corresponding to the input ID
-        observation = extract_row(self.observed_catalogue.data, ID, key=self.key)
+        observation = self.observed_catalogue.extract_row(ID, key=self.key)
 
-        fig = plt.figure(figsize=(12, 3))
-        ax = fig.add_subplot(1, 1, 1)
+        # In batch mode the same figure is reused for all objects, and its
+        # artists updated in place
+        template = BeaglePlotOutput.get_template('spectral_indices', figsize=(12, 3))
+        fig, ax = template.fig, template.axs
 
         # Open the file containing BEAGLE results
         fits_file = os.path.join(BeagleDirectories.results_dir,
                 str(ID) + '_' + BeagleDirectories.suffix + '.fits.gz')
 
-        hdulist = fits.open(fits_file)
+        hdulist = open_results(fits_file) if results is None else results
 
         # Read model fluxes
-        model_fluxes = hdulist['spectral indices'].data
+        model_fluxes = hdulist['spectral indices']
         n_lines = len(self.line_list)
 
         # Read the posterior probability
-        probability = hdulist['posterior pdf'].data['probability']
+        probability = hdulist['posterior pdf']['probability']
 
         width = 0.5
 
@@ -175,16 +179,16 @@ class SpectralIndices(object):
 
             kwargs = {'alpha':0.8}
             if _observed_flux_err > 0.:
-                ax.errorbar(X,
+                template.errorbar(ax, ('observation_error', i), X,
                         _observed_flux, 
-                        yerr=_observed_flux_err,
+                        _observed_flux_err,
                         color="dodgerblue",
                         ls=" ",
                         marker=" ",
                         zorder=5,
                         **kwargs)
 
-                ax.plot(X,
+                template.plot(ax, ('observation', i), X,
                         _observed_flux, 
                         color="dodgerblue",
                         ls=" ",
@@ -195,21 +199,21 @@ class SpectralIndices(object):
                         **kwargs)
 
             kwargs = {'color':'tomato', 'alpha':0.7, 'edgecolor':'black', 'linewidth':0.2}
-            ax.fill_betweenx(x_plot,
+            template.fill_betweenx(ax, ('violin', i), x_plot,
                     y_grid - y_plot*w,
                     y_grid + y_plot*w,
                     zorder=2,
                     **kwargs
                     )
 
-            ax.plot([X-_lim_y, X+_lim_y],
+            template.plot(ax, ('violin_median', i), [X-_lim_y, X+_lim_y],
                     [median_flux, median_flux],
                     color = 'black',
                     zorder=2,
                     linewidth = 0.2
                     )
 
-            ax.plot(X,
+            template.plot(ax, ('median', i), X,
                     median_flux,
                     color = 'black',
                     marker = "o",
@@ -256,7 +260,7 @@ class SpectralIndices(object):
                 \\textnormal{s}^{-1} \, \\textnormal{cm}^{-2}$")
 
 
-        plt.tick_params(
+        ax.tick_params(
             axis='x',          # changes apply to the x-axis
             which='both',      # both major and minor ticks are affected
             top='off',      # ticks along the bottom edge are off
@@ -285,7 +289,7 @@ class SpectralIndices(object):
                 Y_t0 = maxY - _variab_fact*dY
                 Y_t1 = maxY - _variab_fact*dY - 1.4*_init_fact*dY
 
-            ax.plot([X,X], [minY, Y],
+            template.plot(ax, ('line_tick', i), [X,X], [minY, Y],
                     color="black",
                     ls=":",
                     zorder=2,
@@ -300,7 +304,7 @@ class SpectralIndices(object):
                 _norm = 10.**_n
                 #_text = '$' + to_precision(_val/_norm, signif_digits+1) + '\\pm' + to_precision(_val_err/_norm, signif_digits) + '\\; 10^{' + str(_n) + '}$'
                 _text = '$' + to_precision(_val/_norm, signif_digits+2) + '\\pm' + to_precision(_val_err/_norm, signif_digits) + '$'
-                ax.text(X, Y_t0,
+                template.text(ax, ('observed_value', i), X, Y_t0,
                         _text,
                         horizontalalignment='center',
                         verticalalignment='center',
@@ -309,7 +313,7 @@ class SpectralIndices(object):
 
                 _val = _model_fluxes[i]
                 _text = '$' + to_precision(_val/_norm, signif_digits+2) + '$'
-                ax.text(X, Y_t1,
+                template.text(ax, ('model_value', i), X, Y_t1,
                         _text,
                         horizontalalignment='center',
                         verticalalignment='center',
@@ -327,22 +331,21 @@ class SpectralIndices(object):
             ax.set_yscale('log')
 
         if title:
-            plt.title(title)
+            ax.set_title(title)
 
         if letter is not None:
-            ax.text(0.010, 0.940, '('+letter+')',
+            template.text(ax, 'letter', 0.010, 0.940, '('+letter+')',
                     horizontalalignment='left',
                     verticalalignment='center',
                     color="black", 
                     transform=ax.transAxes)
 
-        name = prepare_plot_saving(plot_name)
+        template.finish()
 
-        fig.savefig(name, dpi=None, facecolor='w', edgecolor='w',
-                orientation='portrait', papertype='a4', format="pdf",
-                transparent=False, bbox_inches="tight", pad_inches=0.1)
+        BeaglePlotOutput.save(fig, plot_name, ID=ID)
 
-        plt.close(fig)
-        hdulist.close()
+        BeaglePlotOutput.release(template)
+        if results is None:
+            hdulist.close()
 
 
@@ -9,11 +9,14 @@ import json
 import numpy as np
 from scipy.interpolate import interp1d
 from astropy.io import fits
-from pathos.multiprocessing import ProcessingPool 
 from natsort import index_natsorted, order_by_index
 
 from .beagle_utils import prepare_data_saving, BeagleDirectories, getPathForData, data_exists,\
-    ID_COLUMN_LENGTH
+    ID_COLUMN_LENGTH, weighted_quantiles
+from .beagle_cache import open_results
+from .beagle_mirror import BeagleMirror
+from .beagle_catalogue_io import catalogue_file_name, write_catalogue, open_catalogue, read_extension
+from .beagle_multiprocess import BeaglePool
 from .significant_digits import to_precision
 import six
 from six.moves import range
@@ -79,6 +82,93 @@ def get1DInterval(param_values, probability, levels):
 
     return mean, median, interval
 
+def get1DIntervals(param_values, probability, levels):
+
+    """
+    Compute several quantities from a set of 1D probability density
+    functions sharing the same weights, in a single vectorized pass.
+
+    Parameters
+    ----------
+    param_values : 2D numpy array
+        Contains the values of the parameters, with shape (n_samples,
+        n_columns), i.e. one parameter per column.
+
+    probability : numpy array
+        Contains the probability associated with each row of
+        'param_values', hence must have size n_samples.
+
+    levels : numpy array or list containing float
+        Contains the (percentage) levels used to compute the credible
+        regions, e.g. levels=[68.,95.] will compute 68 % and 95 % (central)
+        credible regions
+
+    Returns
+    -------
+    mean : numpy array
+        Mean of each parameter, with size n_columns.
+
+    median : numpy array
+        Median of each parameter, with size n_columns.
+
+    interval : numpy array
+        Array of shape (n_columns, n_levels, 2) containing the lower and upper
+        value of each parameter corresponding to the different `levels`
+
+    Notes
+    -----
+    The results are the same as those obtained by calling `get1DInterval`
+    on each column separately, but the cumulative probability is computed
+    for all columns at once by `beagle_utils.weighted_quantiles`, instead of
+    building an `interp1d` interpolant per column.
+    """
+
+    param_values = np.asarray(param_values)
+    if param_values.ndim == 1:
+        param_values = param_values[:, None]
+
+    n_columns = param_values.shape[1]
+
+    mean = np.sum(probability[:, None] * param_values, axis=0) / np.sum(probability)
+
+    # Cumulative probabilities at which the interpolant is evaluated: the
+    # median, followed by the lower and upper limit of each level
+    quantiles = [0.5]
+    for lev in levels:
+        quantiles.extend([0.5*(1.-lev/100.), 1.-0.5*(1.-lev/100.)])
+
+    values = weighted_quantiles(param_values, probability, quantiles)
+
+    median = values[0, :]
+    interval = values[1:, :].reshape(len(levels), 2, n_columns).transpose(2, 0, 1)
+
+    return mean, median, interval
+
+
+# Extension of the summary catalogue recording the modification time and size
+# of the Beagle output file from which each row has been computed
+SOURCE_FILES_EXTENSION = 'SOURCE FILES'
+
+def get_ID(file):
+    """ 
+    Extract the object ID from the name of a Beagle output file.
+
+    Parameters
+    ----------
+    file : str
+        Name of the Beagle output file.
+
+    Returns
+    -------
+    str
+        The object ID.
+    """ 
+
+    end = file.find('_' + BeagleDirectories.suffix)
+    #ID = np.int(np.float(os.path.basename(file[0:end])))
+
+    return os.path.basename(file[0:end])
+
 
 class BeagleSummaryCatalogue(object):
 
@@ -92,7 +182,7 @@ class BeagleSummaryCatalogue(object):
         if file_name is not None:
             self.file_name  = file_name
         else:
-            self.file_name = "BEAGLE_summary_catalogue.fits" 
+            self.file_name = catalogue_file_name("BEAGLE_summary_catalogue.fits")
 
         self.hdu_col = hdu_col
 
@@ -130,69 +220,188 @@ class BeagleSummaryCatalogue(object):
         """ 
         Load a 'BEAGLE summary catalogue'
 
-        Parameters
-        ----------
-        file_name : str
-            Name of the file containing the catalogue.
+        The catalogue is opened through `beagle_catalogue_io.open_catalogue`,
+        so that (for uncompressed FITS, Parquet and HDF5 files) each column
+        is only read when first accessed.
         """
 
         logging.info("Loading the `BeagleSummaryCatalogue` file: " + self.file_name)
 
         name = getPathForData(self.file_name)
-        self.hdulist = fits.open(name)
+        self.hdulist = open_catalogue(name)
+
+    def __getstate__(self):
+
+        # The (large) output tables are not needed by the worker processes
+        # computing the summary statistics of each object, so you do not
+        # send them over when pickling
+        state = self.__dict__.copy()
+        for key in ('hdulist', 'tables', 'row_index'):
+            state.pop(key, None)
+
+        return state
 
-    def compute_single(self, file, hdu_col):
+    def compute_single(self, file, hdu_col, results=None):
         """ 
+        Compute the summary statistics of a single Beagle output file.
+
+        Parameters
+        ----------
+        file : str
+            Name of the Beagle output file.
+
+        hdu_col : list
+            Extensions (and, optionally, columns) to be summarised.
+
+        results : `BeagleResults`, optional
+            The already opened Beagle output file, which is not closed here.
+
+        Returns
+        -------
+        ID : str
+            The object ID.
+
+        rows : OrderedDict
+            For each extension, a Numpy record containing the object ID and
+            the summary statistics of each column, to be passed to `write_row`.
+
+        Notes
+        -----
+        `initialize` must be called before this function.
         """ 
 
         # Compute the required quantities
-        hdulist = fits.open(os.path.join(BeagleDirectories.results_dir, file))
-        end = file.find('_' + BeagleDirectories.suffix)
+        if results is None:
+            hdulist = open_results(os.path.join(BeagleDirectories.results_dir, file))
+        else:
+            hdulist = results
 
         # Extract the object ID from the file_name
-        #ID = np.int(np.float(os.path.basename(file[0:end])))
-        ID = os.path.basename(file[0:end])
+        ID = get_ID(file)
 
-        probability = hdulist['posterior pdf'].data['probability']
-        data = OrderedDict()
+        probability = hdulist['posterior pdf']['probability']
+        rows = OrderedDict()
 
         for hdu in hdu_col:
             hdu_name = hdu['name']
-            if 'columns' in hdu:
-                columnNames = hdu['columns']
-            else:
-                columnNames = hdulist[hdu_name].columns.names
+            columnNames = self.column_names[hdu_name]
 
-            for col_name in columnNames:
-                data['ID'] = ID
-                par_values = hdulist[hdu_name].data[col_name]
+            # Compute the summary statistics of all columns of the current
+            # extension in one go
+            par_values = np.column_stack([hdulist[hdu_name][col_name] for col_name in columnNames])
 
-                mean, median, interval = get1DInterval(par_values, probability, self.credible_intervals)
+            mean, median, interval = get1DIntervals(par_values, probability, self.credible_intervals)
 
-                data[col_name+'_mean'] = mean
-                data[col_name+'_median'] = median
+            row = np.zeros((), dtype=self.row_dtypes[hdu_name])
+            row['ID'] = ID
+
+            for i, col_name in enumerate(columnNames):
+                row[col_name+'_mean'] = mean[i]
+                row[col_name+'_median'] = median[i]
 
                 for j, lev in enumerate(self.credible_intervals):
                     levName = col_name + '_' + "{:.2f}".format(lev)
-                    data[levName] = interval[j]
+                    row[levName] = interval[i][j]
 
-        hdulist.close()
+            rows[hdu_name] = row
+
+        # Record the properties of the Beagle output file, so that the row can
+        # be recomputed if the file changes
+        stat = os.stat(os.path.join(BeagleDirectories.results_dir, file))
+        row = np.zeros((), dtype=self.row_dtypes[SOURCE_FILES_EXTENSION])
+        row['ID'] = ID
+        row['mtime'] = stat.st_mtime
+        row['size'] = stat.st_size
+        rows[SOURCE_FILES_EXTENSION] = row
+
+        if results is None:
+            hdulist.close()
 
-        return data
+        return ID, rows
 
-    def compute(self, file_list, overwrite=False):
+    def compute(self, file_list, overwrite=False, update=False):
         """ 
+        Compute the summary catalogue.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files.
+
+        overwrite : bool, optional
+            Whether to overwrite an existing summary catalogue.
+
+        update : bool, optional
+            Whether to update an existing summary catalogue, only computing the
+            summary statistics of new objects, or of objects whose Beagle
+            output file has changed.
+        """ 
+
+        file_list = self.initialize(file_list, update=update)
+
+        if update:
+            overwrite = True
+
+        #start_time = time.time()
+        # Now you can go through each file, and compute the required
+        # quantities. The results are written in the output tables as soon as
+        # they are available, so you never hold the results of all objects
+        if self.n_proc > 1:
+            pool = BeaglePool(self.compute_single, self.n_proc, ordered=False)
+            data = pool.map(file_list, (self.hdu_col,)*len(file_list))
+        else:
+            data = (self.compute_single(file, self.hdu_col) for file in file_list)
+
+        for ID, rows in data:
+            self.write_row(ID, rows)
+
+        #print("--- %s seconds ---" % (time.time() - start_time))
+
+        self.write(overwrite=overwrite)
+
+    def initialize(self, file_list, update=False):
+        """ 
+        Create the (empty) output tables of the summary catalogue.
+
+        The tables are pre-sized to contain all objects, which are sorted in
+        natural order of their IDs.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files that will be summarised. The first
+            file is used as a "mold" for the binary tables and their columns.
+
+        update : bool, optional
+            Whether to fill the tables with the rows of an existing summary
+            catalogue which are still up-to-date.
+
+        Returns
+        -------
+        file_list : list
+            Names of the Beagle output files whose summary statistics must be
+            computed.
         """ 
 
         # You consider the first file in the list and use as a "mold" to create
         # the structure (binary tables and their columns) of the output FITS file
         firstfile = os.path.join(BeagleDirectories.results_dir, file_list[0])
-        hdulist = fits.open(firstfile)
+        hdulist = fits.open(BeagleMirror.resolve(firstfile))
 
         n_objects = len(file_list)
 
-        # Initialize a new (empty) primary HDU for your output FITS file
-        self.hdulist = fits.HDUList(fits.PrimaryHDU())
+        # Natural sort IDs, and row of each object in the output tables
+        IDs = [get_ID(file) for file in file_list]
+        self.row_index = dict()
+        for i, idx in enumerate(index_natsorted(IDs)):
+            self.row_index[IDs[idx]] = i
+
+        # Columns summarised in each extension, their definitions, the Numpy
+        # data type of a single row, and the output tables
+        self.column_names = OrderedDict()
+        self.column_defs = OrderedDict()
+        self.row_dtypes = OrderedDict()
+        self.tables = OrderedDict()
     
         # Now you cycle over all extension and columns that you want to put in
         # the summary catalogue
@@ -213,6 +422,8 @@ class BeagleSummaryCatalogue(object):
             else:
                 columnNames = [name for name in hdulist[hdu_name].columns.names if name not in self.exclude_columns]
 
+            self.column_names[hdu_name] = columnNames
+
             # For each column, you add a '_mean', '_median' and confidence
             # intervals columns, taking the appropriate units from the FITS
             # file that you are using as a mold
@@ -236,57 +447,136 @@ class BeagleSummaryCatalogue(object):
 
             # Create the "column definition"
             cols_ = fits.ColDefs(new_columns)
+            self.column_defs[hdu_name] = cols_
 
-            # Create the actual binary table, with the correct number of rows
-            # to accomodate all objects
-            nrows = len(file_list)
-            new_hdu = fits.BinTableHDU.from_columns(cols_, nrows=nrows)
-            new_hdu.name = hdu_name
+            # Numpy data type corresponding to the column definition
+            self.row_dtypes[hdu_name] = np.asarray(fits.BinTableHDU.from_columns(cols_, nrows=0).data).dtype
 
-            # And finally append the newly created bunary table to the hdulist
-            # that will be printed to the ouput FITS file
-            self.hdulist.append(new_hdu)
+            # Create the actual table, with the correct number of rows to
+            # accomodate all objects
+            self.tables[hdu_name] = np.zeros(n_objects, dtype=self.row_dtypes[hdu_name])
 
         hdulist.close()
 
-        #start_time = time.time()
-        # Now you can go through each file, and compute the required quantities
-        if self.n_proc > 1:
-            pool = ProcessingPool(nodes=self.n_proc)
-            data = pool.map(self.compute_single, 
-                    file_list,
-                    (self.hdu_col,)*len(file_list))
-        else:
-            data = list()
-            for i, file in enumerate(file_list):
-                d = self.compute_single(file, self.hdu_col)
-                data.append(d)
+        # Extension containing the modification time and size of each Beagle
+        # output file
+        cols_ = fits.ColDefs([
+            fits.Column(name='ID', format=str(ID_COLUMN_LENGTH)+'A'),
+            fits.Column(name='mtime', format='D', unit='s'),
+            fits.Column(name='size', format='K', unit='byte')
+            ])
 
-        #print("--- %s seconds ---" % (time.time() - start_time))
+        self.column_defs[SOURCE_FILES_EXTENSION] = cols_
+        self.row_dtypes[SOURCE_FILES_EXTENSION] = np.asarray(fits.BinTableHDU.from_columns(cols_, nrows=0).data).dtype
+        self.tables[SOURCE_FILES_EXTENSION] = np.zeros(n_objects, dtype=self.row_dtypes[SOURCE_FILES_EXTENSION])
 
-        # Natural sort IDs
-        IDs = [data[i]['ID'] for i in range(len(data))]
-        index = index_natsorted(IDs)
+        if update:
+            return self._fill_from_existing(file_list, IDs)
 
-        for i, file in enumerate(file_list):
-            idx = index[i]
-            for hdu in self.hdu_col:
-                hdu_name = hdu['name']
-                if 'columns' in hdu:
-                    columnNames = hdu['columns']
-                else:
-                    columnNames = [name for name in hdulist[hdu_name].columns.names if name not in self.exclude_columns]
+        return file_list
+
+    def _fill_from_existing(self, file_list, IDs):
+        """ 
+        Copy the up-to-date rows of the existing summary catalogue in the
+        output tables.
+
+        Parameters
+        ----------
+        file_list : list
+            Names of the Beagle output files.
+
+        IDs : list
+            IDs of the objects, in the same order as `file_list`.
+
+        Returns
+        -------
+        file_list : list
+            Names of the Beagle output files which are not in the existing
+            summary catalogue, or which have changed since their row has been
+            computed.
+        """ 
+
+        if not self.exists():
+            logging.info("The `BeagleSummaryCatalogue` file: " + self.file_name + \
+                    " does not exist, all rows will be computed")
+            return file_list
+
+        name = getPathForData(self.file_name)
+        with open_catalogue(name) as hdulist:
+
+            # The existing catalogue must have the same structure as the new one
+            for hdu_name, dtype in six.iteritems(self.row_dtypes):
+                if hdu_name not in hdulist or list(hdulist[hdu_name].columns.names) != list(dtype.names):
+                    logging.warning("The structure of the `BeagleSummaryCatalogue` file: " + \
+                            self.file_name + " has changed, all rows will be recomputed")
+                    return file_list
+
+            # Modification time and size of the Beagle output files at the
+            # time each row has been computed
+            sources = read_extension(hdulist[SOURCE_FILES_EXTENSION])
+            old_stat = dict(zip(sources['ID'], zip(sources['mtime'], sources['size'])))
 
-                for col_name in columnNames:
-                    self.hdulist[hdu_name].data['ID'][i] = data[idx]['ID']
-                    self.hdulist[hdu_name].data[col_name+'_mean'][i] = data[idx][col_name+'_mean']
-                    self.hdulist[hdu_name].data[col_name+'_median'][i] = data[idx][col_name+'_median']
-                    for j, lev in enumerate(self.credible_intervals):
-                        levName = col_name + '_' + "{:.2f}".format(lev)
-                        self.hdulist[hdu_name].data[levName][i] = data[idx][levName]
+            # Objects that must be (re)computed
+            to_compute = list()
+            for file, ID in zip(file_list, IDs):
+                stat = os.stat(os.path.join(BeagleDirectories.results_dir, file))
+                if old_stat.get(ID) != (stat.st_mtime, stat.st_size):
+                    to_compute.append(file)
 
-        name = prepare_data_saving(self.file_name)
-        self.hdulist.writeto(name, clobber=overwrite)
+            # Copy the rows of the remaining objects in their new position
+            old_rows = [i for i, ID in enumerate(sources['ID']) if ID in self.row_index]
+            new_rows = [self.row_index[sources['ID'][i]] for i in old_rows]
+
+            for hdu_name, table in six.iteritems(self.tables):
+                table[new_rows] = read_extension(hdulist[hdu_name])[old_rows]
+
+        logging.info(str(len(to_compute)) + " out of " + str(len(file_list)) + \
+                " rows of the `BeagleSummaryCatalogue` will be computed")
+
+        return to_compute
+
+    def write_row(self, ID, rows):
+        """ 
+        Write the summary statistics of an object in its row of the output tables.
+
+        Parameters
+        ----------
+        ID : str
+            The object ID.
+
+        rows : OrderedDict
+            For each extension, the summary statistics of the object, as
+            returned by `compute_single`.
+        """ 
+
+        i = self.row_index[ID]
+        for hdu_name, row in six.iteritems(rows):
+            self.tables[hdu_name][i] = row
+
+    def write(self, overwrite=False):
+        """ 
+        Write the summary catalogue to disk.
+
+        Parameters
+        ----------
+        overwrite : bool, optional
+            Whether to overwrite an existing summary catalogue.
+        """ 
+
+        # Units of the columns, from the column definitions
+        units = dict()
+        for hdu_name, cols_ in six.iteritems(self.column_defs):
+            units[hdu_name] = dict((col_.name, col_.unit) for col_ in cols_)
+
+        # A previously loaded catalogue may be memory-mapped from the file
+        # that is now overwritten
+        if getattr(self, 'hdulist', None) is not None:
+            self.hdulist.close()
+
+        name = prepare_data_saving(self.file_name, overwrite=overwrite)
+        write_catalogue(name, self.tables, units=units, overwrite=overwrite)
+
+        self.hdulist = open_catalogue(name)
 
     def extract_MAP_solution(self, file_list, overwrite=False):
         """ 
@@ -294,48 +584,68 @@ class BeagleSummaryCatalogue(object):
 
         # Now you can go through each file, and extract the MAP solution
         for i, file in enumerate(file_list):
+            self.extract_MAP_single(file, overwrite=overwrite)
+
+    def extract_MAP_single(self, file, overwrite=False, results=None):
+        """ 
+        Write the maximum-a-posteriori (MAP) solution of a single Beagle output file.
+
+        Parameters
+        ----------
+        file : str
+            Name of the Beagle output file.
 
-            # Open the original BEAGLE FITS file
-            hdulist = fits.open(os.path.join(BeagleDirectories.results_dir, file))
+        overwrite : bool, optional
+            Whether to overwrite an existing MAP file.
 
-            # Get the posterior probability
-            post = hdulist['posterior pdf'].data['probability']
+        results : `BeagleResults`, optional
+            The already opened Beagle output file, which is not closed here.
+        """ 
 
-            # Maximum of the posterior PDF, i.e. you select the template
-            # corresponding to the mode of the posterior distributions
-            MAP_indx = np.argmax(post)
+        # Open the original BEAGLE FITS file
+        if results is None:
+            hdulist = fits.open(BeagleMirror.resolve(os.path.join(BeagleDirectories.results_dir, file)))
+        else:
+            hdulist = results.get_hdulist()
 
-            # Now write in a separate FITS file the pararmeters corresponding to the MAP row
-            new_hdulist = fits.HDUList(fits.PrimaryHDU())
+        # Get the posterior probability
+        post = hdulist['posterior pdf'].data['probability']
 
-            for hdu in hdulist:
+        # Maximum of the posterior PDF, i.e. you select the template
+        # corresponding to the mode of the posterior distributions
+        MAP_indx = np.argmax(post)
 
-                if hdu.data is None:
-                    continue
+        # Now write in a separate FITS file the pararmeters corresponding to the MAP row
+        new_hdulist = fits.HDUList(fits.PrimaryHDU())
 
-                if hdu.is_image:
-                    new_hdu = fits.PrimaryHDU()
-                    new_hdu.name = hdu.name
-                    new_hdu.data = hdu.data[MAP_indx,:]
+        for hdu in hdulist:
+
+            if hdu.data is None:
+                continue
+
+            if hdu.is_image:
+                new_hdu = fits.PrimaryHDU()
+                new_hdu.name = hdu.name
+                new_hdu.data = hdu.data[MAP_indx,:]
+            else:
+                new_hdu = fits.BinTableHDU.from_columns(hdu.columns, nrows=1)
+                new_hdu.name = hdu.name
+                if 'sed wl' in hdu.name.lower() or 'sed mask' in hdu.name.lower():
+                    new_hdu.data = hdu.data
                 else:
-                    new_hdu = fits.BinTableHDU.from_columns(hdu.columns, nrows=1)
-                    new_hdu.name = hdu.name
-                    if 'sed wl' in hdu.name.lower() or 'sed mask' in hdu.name.lower():
-                        new_hdu.data = hdu.data
-                    else:
-                        new_hdu.data[0] = hdu.data[MAP_indx]
+                    new_hdu.data[0] = hdu.data[MAP_indx]
 
-                new_hdulist.append(new_hdu)
+            new_hdulist.append(new_hdu)
 
-            # Extract the object ID from the file_name
-            end = file.find('_' + BeagleDirectories.suffix)
-            ID = os.path.basename(file[0:end])
+        # Extract the object ID from the file_name
+        ID = get_ID(file)
 
-            file_name = ID + '_BEAGLE_MAP.fits.gz'
-            name = prepare_data_saving(file_name)
-            new_hdulist.writeto(name, clobber=overwrite)
+        file_name = ID + '_BEAGLE_MAP.fits.gz'
+        name = prepare_data_saving(file_name)
+        new_hdulist.writeto(name, overwrite=overwrite)
 
-            new_hdulist.close()
+        new_hdulist.close()
+        if results is None:
             hdulist.close()
 
     def make_latex_table(self, param_names, 
@@ -355,14 +665,16 @@ class BeagleSummaryCatalogue(object):
 
         n = significant_digits
         
-        n_rows = len(self.hdulist[1].data['ID'])
+        # Only the ID column, and the columns of the parameters in the table,
+        # are read from the catalogue
+        catalogue_IDs = np.asarray(self.hdulist[1].data['ID'])
 
         if IDs is None:
-            IDs = self.hdulist[1].data['ID']
+            IDs = catalogue_IDs
 
         for ID in IDs:
             print("\n " + ID, end='') 
-            row = np.arange(n_rows)[self.hdulist[1].data['ID'] == ID][0]
+            row = np.flatnonzero(catalogue_IDs == ID)[0]
             for param, value in six.iteritems(param_config):
                 is_log = False
                 if "log" in value:
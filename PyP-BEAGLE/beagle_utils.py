@@ -20,6 +20,8 @@ from six.moves import input
 
 from scipy.stats import gaussian_kde
 
+from .dependencies.WeightedKDE import binned_gaussian_kde, batched_binned_gaussian_kde
+
 ID_COLUMN_LENGTH = 100
 
 def is_integer(s):
@@ -166,6 +168,10 @@ class BeagleDirectories(object):
     beagle_input_files = "BEAGLE-input-files"
     pypbeagle_data = os.path.join("pyp-beagle", "data")
     pypbeagle_plot = os.path.join("pyp-beagle", "plot")
+    pypbeagle_cache = os.path.join("pyp-beagle", "data", "cache")
+    pypbeagle_mirror = os.path.join("pyp-beagle", "data", "mirror")
+    pypbeagle_consolidated = os.path.join("pyp-beagle", "data", "consolidated")
+    pypbeagle_reduced_sed = os.path.join("pyp-beagle", "data", "reduced_sed")
 
     results_dir = ''
 
@@ -173,6 +179,9 @@ class BeagleDirectories(object):
 
     MN_suffix = '_BEAGLE_MNstats.dat'
 
+    # Format of the output catalogues (see `beagle_catalogue_io`)
+    catalogue_format = 'fits'
+
     param_file = ''
 
     fontsize = 16
@@ -182,6 +191,10 @@ def get_files_list(results_dir=None, suffix=None):
     """ 
     Get all files ending with suffix.
 
+    The names of the original files are listed, also when they have a
+    decompressed copy in the mirror folder (see `beagle_mirror.BeagleMirror`),
+    which is only resolved when the files are opened.
+
     Parameters
     ----------
     results_dir : str, optional
@@ -438,6 +451,16 @@ def set_plot_ticks(ax, which='both', n_x=4, n_y=4, prune_x=None, prune_y=None):
         ax.yaxis.minor_locations = plticker.AutoMinorLocator(2)
         ax.yaxis.set_minor_locator(ax.yaxis.minor_locations)
 
+def _normalise_IDs(IDs, ignore_string=None):
+
+    if ignore_string is None:
+        return list(IDs)
+
+    if isinstance(ignore_string, re.compile('').__class__):
+        return [ignore_string.sub('', ID) for ID in IDs]
+
+    return [ID.replace(ignore_string, '') for ID in IDs]
+
 def match_ID(ID_list_1, ID_list_2, sorted=False, ignore_string=None):
     """ 
     Match the ID in two catalogues.
@@ -454,6 +477,10 @@ def match_ID(ID_list_1, ID_list_2, sorted=False, ignore_string=None):
         If True then the ID arrays are assumed to be already sorted, otherwise
         they are sorted in the routine 
 
+    ignore_string : str or compiled regular expression, optional
+        String (or pattern) removed from the (string) IDs before matching
+        them.
+
     Returns
     -------
     indices_1 : numpy array int
@@ -492,39 +519,36 @@ def match_ID(ID_list_1, ID_list_2, sorted=False, ignore_string=None):
         ID_long = np.array(ID_long, dtype=str)
         ID_short = np.array(ID_short, dtype=str)
 
-    match_indx_long = np.full(n_long, -1, dtype=np.int)
-    match_indx_short = np.full(n_short, -1, dtype=np.int)
-    mask_long = np.zeros(n_long, dtype=bool)
-
-    for i in range(n_short):
+    match_indx_long = np.full(n_long, -1, dtype=int)
+    match_indx_short = np.full(n_short, -1, dtype=int)
 
-        if is_int:
-            i1 = bisect_left(ID_long[sort_long], ID_short[sort_short[i]])
+    if is_int:
+        # The sorted array is only built once
+        sorted_long = ID_long[sort_long]
+        for i in range(n_short):
+            i1 = bisect_left(sorted_long, ID_short[sort_short[i]])
 
             if i1 < n_long:
-                if ID_long[sort_long[i1]] == ID_short[sort_short[i]]:
+                if sorted_long[i1] == ID_short[sort_short[i]]:
                     match_indx_long[i1] = sort_long[i1]
                     match_indx_short[i] = sort_short[i]
-        else:
-            for j in range(n_long):
-                if mask_long[j]:
-                    continue
-
-                if ignore_string is not None:
-                    if isinstance(ignore_string, re.compile('').__class__):
-                        ID_l = ignore_string.sub('', ID_long[j])
-                        ID_s = ignore_string.sub('', ID_short[i])
-                    else:
-                        ID_l = ID_long[j].replace(ignore_string, '')
-                        ID_s = ID_short[i].replace(ignore_string, '')
-                else:
-                    ID_l = ID_long[j]
-                    ID_s = ID_short[i]
-
-                if ID_l == ID_s:
-                    match_indx_long[i] = j
-                    match_indx_short[i] = i
-                    mask_long[j] = True
+    else:
+        # Each ID is normalised (i.e. the `ignore_string` is removed) only
+        # once, and the IDs are then matched through a dictionary. When an ID
+        # appears more than once, the first occurrence in the shortest list is
+        # matched to the last occurrence in the longest list
+        keys_long = _normalise_IDs(ID_long, ignore_string)
+        keys_short = _normalise_IDs(ID_short, ignore_string)
+
+        rows_long = dict()
+        for j, key in enumerate(keys_long):
+            rows_long[key] = j
+
+        for i, key in enumerate(keys_short):
+            j = rows_long.pop(key, None)
+            if j is not None:
+                match_indx_long[i] = j
+                match_indx_short[i] = i
 
     if n1 >= n2:
         indices_1 = match_indx_long[match_indx_long >= 0]
@@ -563,12 +587,206 @@ def weighted_avg_and_std(values, weights):
     return (average, np.sqrt(variance))
 
 
+def effective_sample_size(weights):
+    """
+    Return the (Kish) effective sample size of a set of weighted samples.
+
+    Parameters
+    ----------
+    weights : Numpy ndarray
+        Contains the weights (e.g. the posterior probability) of each sample.
+
+    Returns
+    -------
+    float
+        The effective sample size, (sum w)^2 / sum w^2.
+    """
+
+    weights = np.asarray(weights, dtype=np.float64)
+
+    return np.sum(weights)**2 / np.sum(weights**2)
+
+
+def systematic_resample(weights, n_samples, rng=None):
+    """
+    Thin a set of weighted samples by systematic resampling.
+
+    Parameters
+    ----------
+    weights : Numpy ndarray
+        Contains the weights (e.g. the posterior probability) of each sample.
+
+    n_samples : int
+        Number of draws.
+
+    rng : `numpy.random.Generator`, optional
+        Random number generator providing the (single) random offset of the
+        draws.
+
+    Returns
+    -------
+    rows : Numpy ndarray
+        Sorted indices of the samples drawn at least once.
+
+    counts : Numpy ndarray
+        Number of times each sample in `rows` has been drawn, to be used as
+        the weight of the sample.
+
+    Notes
+    -----
+    The `n_samples` draws are equally spaced in the cumulative distribution
+    of the weights, with a single random offset, so that each sample is
+    drawn either floor(n_samples*w) or ceil(n_samples*w) times (for
+    normalized weights w). Compared to independent (multinomial) draws,
+    this adds the least possible noise to the distribution of the samples.
+    """
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    cumul = np.cumsum(np.asarray(weights, dtype=np.float64))
+    cumul /= cumul[-1]
+
+    positions = (rng.random() + np.arange(n_samples)) / n_samples
+    indices = np.minimum(np.searchsorted(cumul, positions, side='right'), len(cumul)-1)
+
+    return np.unique(indices, return_counts=True)
+
+
+def weighted_quantiles(data, weights, quantiles, chunk_size=1024):
+    """
+    Compute weighted quantiles along the first axis of a 2D array.
+
+    Parameters
+    ----------
+    data : Numpy ndarray
+        Array of shape (n_samples, n_columns), e.g. the fluxes of the
+        `marginal sed` extension, with one row per posterior sample and one
+        column per wavelength bin.
+
+    weights : Numpy ndarray
+        Contains the weights (e.g. the posterior probability) of each row
+        of `data`.
+
+    quantiles : iterable float
+        Cumulative probabilities (between 0 and 1) at which the quantiles are
+        computed, e.g. [0.5, 0.16, 0.84].
+
+    chunk_size : int, optional
+        Number of columns processed at once, to limit the memory used by
+        the temporary (sorted and cumulative) arrays.
+
+    Returns
+    -------
+    values : Numpy ndarray
+        Array of shape (n_quantiles, n_columns) containing the quantiles of
+        each column.
+
+    Notes
+    -----
+    The quantiles are obtained, for each column, by linear interpolation of
+    the cumulative sum of the (sorted) weights, as done with `interp1d` in
+    `beagle_summary_catalogue.get1DInterval`, but all columns are sorted and
+    interpolated together.
+    """
+
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, None]
+
+    weights = np.asarray(weights)
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=np.float64))
+
+    n_samples, n_columns = data.shape
+    values = np.zeros((len(quantiles), n_columns))
+
+    for i0 in range(0, n_columns, chunk_size):
+        i1 = min(i0+chunk_size, n_columns)
+        block = data[:, i0:i1]
+
+        sort_ = np.argsort(block, axis=0)
+        sorted_block = np.take_along_axis(block, sort_, axis=0)
+
+        # ******************************************************************
+        # Here you must simply use `cumsum`, and not `cumtrapz`, see
+        # `beagle_summary_catalogue.get1DInterval`
+        # ******************************************************************
+        cumul_pdf = np.cumsum(weights[sort_], axis=0)
+        cumul_pdf /= cumul_pdf[n_samples-1, :]
+
+        # Same bounds check performed by `interp1d`
+        if np.any(quantiles[:, None] < cumul_pdf[0, :]):
+            raise ValueError("A value in x_new is below the interpolation range.")
+
+        columns = np.arange(i1-i0)
+        for k, q in enumerate(quantiles):
+
+            # Each column of `cumul_pdf` is sorted, so the number of entries
+            # smaller than `q` is equivalent to a `searchsorted` with
+            # side='left' performed on each column
+            hi = np.count_nonzero(cumul_pdf < q, axis=0)
+            hi = np.clip(hi, 1, n_samples-1)
+            lo = hi - 1
+
+            x_lo, x_hi = cumul_pdf[lo, columns], cumul_pdf[hi, columns]
+            y_lo, y_hi = sorted_block[lo, columns], sorted_block[hi, columns]
+
+            slope = (y_hi - y_lo) / (x_hi - x_lo)
+            values[k, i0:i1] = slope * (q - x_lo) + y_lo
+
+    return values
+
+
 def prepare_violin_plot(data, 
         weights=None, 
         min_x=None,
         max_x=None,
         nXgrid=100,
-        max_interval=99.7):
+        max_interval=99.7,
+        binned=True):
+    """ 
+    Compute the marginal PDF of a set of (weighted) samples, and the outline
+    of the corresponding "violin" plot.
+
+    Parameters
+    ----------
+    data : array
+        1-D array of samples.
+
+    weights : array, optional
+        Weight of each sample.
+
+    min_x, max_x : float, optional
+        Range over which the PDF is computed, by default the minimum and
+        maximum of `data`.
+
+    nXgrid : int, optional
+        Number of points of the grid over which the PDF is computed.
+
+    max_interval : float, optional
+        Credible interval (in %) covered by the violin.
+
+    binned : bool, optional
+        Whether to compute the KDE by binning the samples onto a fine grid
+        and convolving with the Gaussian kernel via FFT (see
+        `dependencies.WeightedKDE.binned_gaussian_kde`), rather than by
+        evaluating the kernel of each sample at each grid point.
+
+    Returns
+    -------
+    pdf : callable
+        The KDE of the PDF (not normalized).
+
+    pdf_norm : float
+        Normalization of the PDF over the range [min_x, max_x].
+
+    median : float
+        Median of the PDF.
+
+    x_violin, y_violin : array
+        Outline of the violin, i.e. the normalized PDF within the credible
+        interval `max_interval`.
+    """
 
     if min_x is None:
         min_x = np.min(data) 
@@ -577,7 +795,9 @@ def prepare_violin_plot(data,
         max_x = np.max(data) 
 
     # Compute the marginal PDF through a weighted KDE
-    if weights is not None:
+    if binned:
+        pdf = binned_gaussian_kde(data, weights=weights)
+    elif weights is not None:
         pdf = gaussian_kde(data, weights=weights)
     else:
         pdf = gaussian_kde(data)
@@ -625,3 +845,83 @@ def prepare_violin_plot(data,
 
 
     return pdf, pdf_norm, median, x_violin, y_violin
+
+def prepare_violin_plots(data, 
+        weights=None, 
+        nXgrid=100,
+        max_interval=99.7):
+    """ 
+    Compute the marginal PDFs of several sets of samples sharing the same
+    weights (e.g. the fluxes in different bands of the same posterior
+    samples), and the outlines of the corresponding "violin" plots.
+
+    The KDEs of all sets of samples are computed at once (see
+    `dependencies.WeightedKDE.batched_binned_gaussian_kde`), and then
+    processed as in `prepare_violin_plot`.
+
+    Parameters
+    ----------
+    data : array
+        2-D array of shape (n_sets, n_samples).
+
+    weights : array, optional
+        Weight of each sample, shared by all sets.
+
+    nXgrid : int, optional
+        Number of points of the grid over which each PDF is computed.
+
+    max_interval : float, optional
+        Credible interval (in %) covered by the violins.
+
+    Returns
+    -------
+    median_pdf : array
+        Normalized PDF of each set at its median.
+
+    median : array
+        Median of each PDF.
+
+    x_violin, y_violin : list
+        Outline of each violin, i.e. the normalized PDF within the credible
+        interval `max_interval`.
+    """
+
+    data = np.atleast_2d(data)
+
+    pdf = batched_binned_gaussian_kde(data, weights=weights)
+
+    # Grid of values over which computing each PDF, from the minimum to the
+    # maximum of each set of samples
+    min_x = np.min(data, axis=1)
+    max_x = np.max(data, axis=1)
+    x_grid = min_x[:, None] + (max_x-min_x)[:, None] * np.linspace(0., 1., nXgrid)
+
+    # Normalize each PDF so that its integral is exactly 1 (see `prepare_violin_plot`)
+    pdf_grid = pdf(x_grid)
+    pdf_norm = simps(pdf_grid, x_grid, axis=1)
+    pdf_grid /= pdf_norm[:, None]
+
+    cumul_pdf = cumtrapz(pdf_grid, x_grid, axis=1, initial=0.)
+    cumul_pdf /= cumul_pdf[:, -1:]
+
+    intv = 0.5*(100.-max_interval)/100.
+
+    median = np.zeros(len(data))
+    lims = np.zeros((len(data), 2))
+    x_violin = list()
+    y_violin = list()
+    for i in range(len(data)):
+        median[i] = np.interp(0.5, cumul_pdf[i, :], x_grid[i, :])
+        lims[i, :] = np.interp([intv, 1.-intv], cumul_pdf[i, :], x_grid[i, :])
+        i1 = bisect_left(x_grid[i, :], lims[i, 0])
+        i2 = bisect_left(x_grid[i, :], lims[i, 1])
+        x_violin.append(np.concatenate(([lims[i, 0]], x_grid[i, i1+1:i2], [lims[i, 1]])))
+        y_violin.append(pdf_grid[i, i1+1:i2])
+
+    # The PDF at the median and at the limits of the violins are evaluated
+    # for all sets at once
+    prob = pdf(np.column_stack((median, lims))) / pdf_norm[:, None]
+    median_pdf = prob[:, 0]
+    y_violin = [np.concatenate(([p[1]], y, [p[2]])) for p, y in zip(prob, y_violin)]
+
+    return median_pdf, median, x_violin, y_violin
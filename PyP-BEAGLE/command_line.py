@@ -4,13 +4,15 @@ import sys
 import os
 import argparse
 import re
+import json
+from collections import OrderedDict
 import numpy as np
 import six.moves.configparser
 import logging
+import matplotlib.pyplot as plt
 from matplotlib import rc
 from astropy.io import ascii
 from astropy.io import fits
-from pathos.multiprocessing import ProcessingPool 
 
 from .beagle_parsers import standard_parser
 from .beagle_utils import BeagleDirectories, get_files_list, configure_matplotlib, trimFitsSuffix
@@ -21,6 +23,12 @@ from .beagle_filters import PhotometricFilters
 from .beagle_spectral_indices import SpectralIndices
 from .beagle_spectra import Spectrum
 from .beagle_pdf import PDF
+from .beagle_cache import BeagleCache, open_results
+from .beagle_mirror import BeagleMirror
+from .beagle_consolidated import BeagleConsolidatedStore
+from .beagle_reduced_sed import BeagleReducedSED
+from .beagle_plot_output import BeaglePlotOutput
+from .beagle_multiprocess import BeaglePool
 
 from ._version import __version__
 from six.moves import zip
@@ -49,9 +57,30 @@ def main():
     # Set directory containing BEAGLE results files
     BeagleDirectories.results_dir = args.results_dir
 
+    # Format of the output catalogues
+    BeagleDirectories.catalogue_format = args.catalogue_format
+
+    # Read the Beagle output files through the persistent cache
+    BeagleCache.enabled = args.use_cache
+
+    # Read the decompressed copies of the Beagle output files, if available
+    BeagleMirror.enabled = not args.ignore_mirror
+
+    # Configure the pool of worker processes
+    BeaglePool.chunk_size = args.chunk_size
+    BeaglePool.max_tasks_per_child = args.max_tasks_per_child
+
     # Configure matplotlib
     configure_matplotlib()
 
+    # Output of the per-object plots
+    BeaglePlotOutput.plot_format = args.plot_format
+    BeaglePlotOutput.dpi = args.plot_dpi
+    BeaglePlotOutput.multipage = args.multipage_pdf
+    BeaglePlotOutput.reuse_figures = args.batch_plots
+    if args.batch_plots or args.plot_format == 'png':
+        plt.switch_backend('Agg')
+
     # Read parameter file
     config = six.moves.configparser.SafeConfigParser(strict=False)
 
@@ -97,6 +126,18 @@ def main():
     # Check if the parameter file contains a SPECTRAL INDICES CATALOGUE
     has_spec_indices = config.has_option('main', 'SPECTRAL INDICES CATALOGUE')
 
+    # Remove, and/or build, the mirror of decompressed Beagle output files
+    if args.clean_mirror:
+        BeagleMirror.clean(remove_all=True)
+
+    if args.predecompress:
+        file_list, IDs = get_files_list(suffix=args.suffix)
+        max_size = None
+        if args.mirror_max_size is not None:
+            max_size = int(args.mirror_max_size*1024**3)
+        BeagleMirror.build(file_list, n_threads=args.n_proc, max_size=max_size, 
+                compression=args.mirror_compression)
+
     # Get list of results files and object IDs from the results directory
     file_list, IDs = get_files_list(suffix=args.suffix)
     if len(file_list) == 0:
@@ -117,6 +158,26 @@ def main():
             _ID = regex.sub('', ID)
             IDs[i] = _ID
 
+    # Consolidate the posterior samples of all objects in a single store
+    if args.consolidate:
+        hdu_col = None
+        if args.consolidate_config is not None:
+            with open(os.path.join(BeagleDirectories.results_dir, args.consolidate_config)) as f:
+                hdu_col = json.load(f, object_pairs_hook=OrderedDict)
+
+        store = BeagleConsolidatedStore()
+        if store.is_up_to_date(file_list):
+            logging.info("The consolidated store is up-to-date")
+        else:
+            BeagleConsolidatedStore.build(file_list, IDs=IDs, hdu_col=hdu_col, 
+                    store_format=args.consolidate_format, n_proc=args.n_proc)
+
+    # Reduce the marginal SED extension of each object to its percentiles,
+    # MAP SED and a set of posterior draws
+    if args.reduce_sed:
+        BeagleReducedSED.build(file_list, IDs, credible_intervals=args.credible_interval, 
+                n_draws=args.reduce_sed_draws, n_proc=args.n_proc)
+
     # Load mock catalogue
     mock_catalogue = None
     if args.mock_file_name is not None:
@@ -131,28 +192,21 @@ def main():
 
     # Compute the summary catalogue
     summary_catalogue = BeagleSummaryCatalogue(credible_intervals=args.credible_interval, n_proc=args.n_proc)
-    if args.compute_summary:
-        if not summary_catalogue.exists():
-            summary_catalogue.compute(file_list)
 
-    if args.latex_table_params is not None:
-        if not summary_catalogue.exists():
-            summary_catalogue.compute(file_list)
-        summary_catalogue.load()
-        summary_catalogue.make_latex_table(args.latex_table_params, IDs=args.ID_list)
+    # The summary catalogue is also needed by the LaTeX table and by the
+    # comparison with the mock catalogue
+    compute_summary = args.compute_summary or args.latex_table_params is not None \
+            or args.mock_file_name is not None
 
-    if args.extract_MAP:
-        summary_catalogue.extract_MAP_solution(file_list)
+    if not args.single_pass:
+        if args.update_summary:
+            summary_catalogue.compute(file_list, update=True)
+        elif compute_summary:
+            if not summary_catalogue.exists():
+                summary_catalogue.compute(file_list)
 
-    # Comparison plots of true vs retrieved values 
-    if args.mock_file_name is not None:
-        if not summary_catalogue.exists():
-            summary_catalogue.compute(file_list)
-        summary_catalogue.load()
-
-        #mock_catalogue.plot_input_param_distribution()
-        mock_catalogue.compare_hist(summary_catalogue, overwrite=True)
-        mock_catalogue.compare(summary_catalogue, overwrite=True)
+        if args.extract_MAP:
+            summary_catalogue.extract_MAP_solution(file_list)
 
     # ---------------------------------------------------------
     # --------- Post-processing of photometric data -----------
@@ -235,42 +289,113 @@ def main():
                     file_names.append(line)
                     break
 
-    # Create "pool" of processes
-    if args.n_proc > 1:
-        pool = ProcessingPool(nodes=args.n_proc)
+    # Set parameter names and labels
+    if args.plot_triangle:
+        my_PDF = PDF(params_file, 
+                mock_catalogue=mock_catalogue,
+                **args_dict)
 
-    # Plot the marginal SED
-    if args.plot_marginal:
-        if args.n_proc > 1:
-            if has_spectra:
-                pool.map(my_spectrum.plot_marginal, IDs, file_names)
+    if args.single_pass:
+
+        if compute_summary:
+            compute_summary = not summary_catalogue.exists()
+
+        # Beagle output files whose summary statistics must be computed
+        summary_files = set()
+        if args.update_summary or compute_summary:
+            summary_files = set(summary_catalogue.initialize(file_list, update=args.update_summary))
+
+        # Each Beagle output file is opened once, and the loaded data are
+        # passed to all the requested products
+        def process_object(i):
+
+            data = None
+            name = os.path.join(BeagleDirectories.results_dir, file_list[i])
+
+            with open_results(name) as results:
 
-            if has_photometry:
-                pool.map(my_photometry.plot_marginal, IDs)
+                if file_list[i] in summary_files:
+                    data = summary_catalogue.compute_single(file_list[i],
+                            summary_catalogue.hdu_col, results=results)
 
-            if has_spec_indices and args.line_labels_json:
-                pool.map(my_spec_indices.plot_line_fluxes, IDs)
+                if args.extract_MAP:
+                    summary_catalogue.extract_MAP_single(file_list[i], results=results)
+
+                if args.plot_marginal:
+                    if has_spectra:
+                        my_spectrum.plot_marginal(IDs[i], file_names[i], results=results)
+
+                    if has_photometry:
+                        my_photometry.plot_marginal(IDs[i], results=results)
+
+                    if has_spec_indices and args.line_labels_json:
+                        my_spec_indices.plot_line_fluxes(IDs[i], results=results)
+
+                if args.plot_triangle:
+                    my_PDF.plot_triangle(IDs[i], results=results)
+
+            return data
+
+        if args.n_proc > 1:
+            pool = BeaglePool(process_object, args.n_proc, ordered=False)
+            data = pool.map(list(range(len(IDs))))
         else:
-            for i, ID in enumerate(IDs):
+            data = (process_object(i) for i in range(len(IDs)))
+
+        # The summary statistics of each object are written in the summary
+        # catalogue as soon as they are available
+        for d in data:
+            if d is not None:
+                summary_catalogue.write_row(*d)
+
+        if args.update_summary:
+            summary_catalogue.write(overwrite=True)
+        elif compute_summary:
+            summary_catalogue.write()
+
+    else:
+
+        # Plot the marginal SED
+        if args.plot_marginal:
+            if args.n_proc > 1:
                 if has_spectra:
-                    my_spectrum.plot_marginal(ID, file_names[i])
+                    list(BeaglePool(my_spectrum.plot_marginal, args.n_proc, ordered=False).map(IDs, file_names))
 
                 if has_photometry:
-                    my_photometry.plot_marginal(ID)
+                    list(BeaglePool(my_photometry.plot_marginal, args.n_proc, ordered=False).map(IDs))
 
                 if has_spec_indices and args.line_labels_json:
-                    my_spec_indices.plot_line_fluxes(ID)
+                    list(BeaglePool(my_spec_indices.plot_line_fluxes, args.n_proc, ordered=False).map(IDs))
+            else:
+                for i, ID in enumerate(IDs):
+                    if has_spectra:
+                        my_spectrum.plot_marginal(ID, file_names[i])
 
-    # Plot the triangle plot
-    if args.plot_triangle:
+                    if has_photometry:
+                        my_photometry.plot_marginal(ID)
 
-        # Set parameter names and labels
-        my_PDF = PDF(params_file, 
-                mock_catalogue=mock_catalogue,
-                **args_dict)
+                    if has_spec_indices and args.line_labels_json:
+                        my_spec_indices.plot_line_fluxes(ID)
 
-        if args.n_proc > 1:
-            pool.map(my_PDF.plot_triangle, IDs)
-        else:
-            for ID in IDs:
-                my_PDF.plot_triangle(ID)
+        # Plot the triangle plot
+        if args.plot_triangle:
+            if args.n_proc > 1:
+                list(BeaglePool(my_PDF.plot_triangle, args.n_proc, ordered=False).map(IDs))
+            else:
+                for ID in IDs:
+                    my_PDF.plot_triangle(ID)
+
+    # Close the multi-page files of the plots drawn by this process
+    BeaglePlotOutput.close()
+
+    if args.latex_table_params is not None:
+        summary_catalogue.load()
+        summary_catalogue.make_latex_table(args.latex_table_params, IDs=args.ID_list)
+
+    # Comparison plots of true vs retrieved values 
+    if args.mock_file_name is not None:
+        summary_catalogue.load()
+
+        #mock_catalogue.plot_input_param_distribution()
+        mock_catalogue.compare_hist(summary_catalogue, overwrite=True)
+        mock_catalogue.compare(summary_catalogue, overwrite=True)
@@ -2,7 +2,10 @@
 
 from __future__ import absolute_import
 import numpy as np
+from six import string_types
+from scipy.spatial import cKDTree
 from scipy.spatial.distance import cdist
+from scipy.signal import fftconvolve
 
 class gaussian_kde(object):
     """Representation of a kernel-density estimate using Gaussian kernels.
@@ -29,6 +32,20 @@ class gaussian_kde(object):
         An array of weights, of the same shape as `x`.  Each value in `x`
         only contributes its associated weight towards the bin count
         (instead of 1).
+    max_memory : int, optional
+        Maximum size (in bytes) of the arrays computed by `kde.evaluate` for
+        each chunk of points, i.e. the (# of points, # of data) distances,
+        which are turned in place into the kernel values, or, with
+        `tolerance`, the pairs of points and datapoints found by the KD-tree
+        and their kernel values (assuming that, in the worst case, all
+        datapoints are within the cutoff radius). The points are evaluated
+        in chunks satisfying this limit. By default `gaussian_kde.max_memory`.
+    tolerance : float, optional
+        If set, `kde.evaluate` uses a KD-tree to only sum the kernels whose
+        value, relative to the kernel peak, is larger than `tolerance`,
+        i.e. the datapoints closer than ``sqrt(-2 ln(tolerance))``
+        bandwidths from each point. The result is then an approximation of
+        the exact KDE. If None (default), all kernels are summed.
 
     Attributes
     ----------
@@ -48,6 +65,9 @@ class gaussian_kde(object):
         (`kde.factor`).
     inv_cov : ndarray
         The inverse of `covariance`.
+    whitened_dataset : ndarray
+        The dataset transformed so that the Mahalanobis distance defined by
+        `inv_cov` becomes an Euclidean distance.
 
     Methods
     -------
@@ -140,7 +160,15 @@ class gaussian_kde(object):
     >>> plt.show()
 
     """
-    def __init__(self, dataset, bw_method=None, weights=None):
+    # Default maximum size (in bytes) of the arrays computed by `evaluate`
+    # for each chunk of points
+    max_memory = 128 * 1024**2
+
+    def __init__(self, dataset, bw_method=None, weights=None, max_memory=None, tolerance=None):
+        if max_memory is not None:
+            self.max_memory = max_memory
+        self.tolerance = tolerance
+
         self.dataset = np.atleast_2d(dataset)
         if not self.dataset.size > 1:
             raise ValueError("`dataset` input should have multiple elements.")
@@ -190,12 +218,56 @@ class gaussian_kde(object):
                     self.d)
                 raise ValueError(msg)
 
+        points = np.dot(self._whitening, points)
+
+        # Number of points evaluated together, so that the arrays of each
+        # block do not exceed `max_memory`. Each (point, datapoint) pair
+        # requires 8 bytes for the distance, turned in place into the
+        # kernel, while each pair found by the KD-tree requires 24 bytes for
+        # its record (i, j, distance), 8 bytes for its kernel and 8 bytes for
+        # the weight of its datapoint
+        bytes_per_pair = 8 if self.tolerance is None else 40
+        chunk_size = max(1, int(self.max_memory // (bytes_per_pair * self.n)))
+
+        result = np.zeros(m)
+        for i0 in range(0, m, chunk_size):
+            i1 = min(i0+chunk_size, m)
+            if self.tolerance is None:
+                result[i0:i1] = self._evaluate_block(points[:, i0:i1])
+            else:
+                result[i0:i1] = self._evaluate_block_tree(points[:, i0:i1])
+
+        return result
+
+    def _evaluate_block(self, points):
+        """Evaluate the exact pdf on a block of (whitened) points."""
         # compute the normalised residuals
-        chi2 = cdist(points.T, self.dataset.T, 'mahalanobis', VI=self.inv_cov) ** 2
+        chi2 = cdist(points.T, self.whitened_dataset.T, 'sqeuclidean')
+        # compute the kernels in place, so that no other (# of points, # of
+        # data) array is allocated
+        chi2 *= -.5
+        np.exp(chi2, out=chi2)
         # compute the pdf
-        result = np.sum(np.exp(-.5 * chi2) * self.weights, axis=1) / self._norm_factor
+        return np.dot(chi2, self.weights) / self._norm_factor
 
-        return result
+    def _evaluate_block_tree(self, points):
+        """Evaluate the approximate pdf on a block of (whitened) points,
+        summing only the kernels of the datapoints within the cutoff radius."""
+        if not hasattr(self, '_tree'):
+            self._tree = cKDTree(self.whitened_dataset.T)
+
+        radius = np.sqrt(-2. * np.log(self.tolerance))
+        pairs = cKDTree(points.T).sparse_distance_matrix(self._tree, radius,
+                output_type='ndarray')
+
+        kernel = pairs['v']**2
+        kernel *= -.5
+        np.exp(kernel, out=kernel)
+        kernel *= self.weights[pairs['j']]
+
+        result = np.bincount(pairs['i'], weights=kernel, minlength=points.shape[1])
+
+        return result / self._norm_factor
 
     __call__ = evaluate
 
@@ -288,3 +360,213 @@ class gaussian_kde(object):
         self.covariance = self._data_covariance * self.factor**2
         self.inv_cov = self._data_inv_cov / self.factor**2
         self._norm_factor = np.sqrt(np.linalg.det(2*np.pi*self.covariance)) #* self.n
+
+        # The Mahalanobis distance between x and y is the Euclidean distance
+        # between W x and W y, with inv_cov = W^T W
+        self._whitening = np.linalg.cholesky(self.inv_cov).T
+        self.whitened_dataset = np.dot(self._whitening, self.dataset)
+        if hasattr(self, '_tree'):
+            del self._tree
+
+
+class binned_gaussian_kde(gaussian_kde):
+    """Fast approximation of a uni-variate `gaussian_kde`.
+
+    The weighted samples are linearly binned onto a fine regular grid, which
+    is then convolved (via FFT) with the Gaussian kernel. The estimated pdf
+    is evaluated by linear interpolation on this grid, so that its cost does
+    not depend on the number of samples. The bandwidth is computed with the
+    same rules ('scott', 'silverman', a scalar or a callable) of
+    `gaussian_kde`.
+
+    Parameters
+    ----------
+    dataset : array_like
+        1-D array of datapoints to estimate from.
+    bw_method : str, scalar or callable, optional
+        The method used to calculate the estimator bandwidth, see
+        `gaussian_kde`.
+    weights : array_like, shape (n, ), optional, default: None
+        An array of weights, of the same shape as `dataset`.
+    n_bins : int, optional
+        Number of points of the grid onto which the samples are binned.
+    cut : float, optional
+        The grid extends by `cut` times the kernel standard deviation beyond
+        the minimum and maximum of `dataset`, the estimated pdf being zero
+        outside the grid.
+
+    Attributes
+    ----------
+    grid : ndarray
+        The points of the regular grid.
+    density : ndarray
+        The estimated pdf at each point of `grid`.
+    """
+    def __init__(self, dataset, bw_method=None, weights=None, n_bins=2048, cut=4.):
+        self.n_bins = n_bins
+        self.cut = cut
+
+        super(binned_gaussian_kde, self).__init__(dataset, bw_method=bw_method, weights=weights)
+
+        if self.d != 1:
+            raise ValueError("`binned_gaussian_kde` only works with uni-variate data.")
+
+    def _compute_covariance(self):
+        """Computes the kernel covariance, and the pdf on the regular grid.
+        """
+        super(binned_gaussian_kde, self)._compute_covariance()
+        self._compute_density()
+
+    def _compute_density(self):
+
+        data = self.dataset[0, :]
+        sigma = np.sqrt(self.covariance[0, 0])
+
+        x_min = np.min(data) - self.cut*sigma
+        x_max = np.max(data) + self.cut*sigma
+        self.grid = np.linspace(x_min, x_max, self.n_bins)
+        dx = self.grid[1] - self.grid[0]
+
+        # Linear binning: each sample contributes to the two closest grid
+        # points, in proportion to its distance from each of them
+        pos = (data - x_min) / dx
+        indx = np.clip(np.floor(pos).astype(int), 0, self.n_bins-2)
+        frac = pos - indx
+        binned = np.bincount(indx, weights=self.weights*(1.-frac), minlength=self.n_bins) + \
+            np.bincount(indx+1, weights=self.weights*frac, minlength=self.n_bins)
+
+        # Gaussian kernel sampled on the grid, truncated at `cut` standard deviations
+        n_kernel = min(int(np.ceil(self.cut*sigma/dx)), self.n_bins-1)
+        x_kernel = np.arange(-n_kernel, n_kernel+1) * dx
+        kernel = np.exp(-0.5 * (x_kernel/sigma)**2) / np.sqrt(2.*np.pi) / sigma
+
+        self.density = np.clip(fftconvolve(binned, kernel, mode='same'), 0., None)
+
+    def evaluate(self, points):
+        """Evaluate the estimated pdf on a set of points.
+
+        Parameters
+        ----------
+        points : array_like
+            The points (a scalar or a 1-D array) where the pdf is evaluated.
+
+        Returns
+        -------
+        values : (# of points,)-array
+            The values at each point.
+        """
+        points = np.atleast_1d(np.asarray(points, dtype=np.float64))
+        if points.ndim > 1:
+            points = points.ravel()
+
+        return np.interp(points, self.grid, self.density, left=0., right=0.)
+
+    __call__ = evaluate
+
+
+class batched_binned_gaussian_kde(object):
+    """Binned approximation of the `gaussian_kde` of several uni-variate
+    datasets sharing the same weights.
+
+    All datasets are binned, and convolved with their Gaussian kernel, at
+    once, as done for a single dataset by `binned_gaussian_kde`, the
+    bandwidth of each dataset being computed with Scott's rule.
+
+    Parameters
+    ----------
+    datasets : array_like
+        2-D array of shape (# of datasets, # of datapoints).
+    weights : array_like, shape (# of datapoints, ), optional, default: None
+        An array of weights, shared by all datasets.
+    n_bins : int, optional
+        Number of points of the grid onto which each dataset is binned.
+    cut : float, optional
+        The grid extends by `cut` times the kernel standard deviation beyond
+        the minimum and maximum of each dataset.
+
+    Attributes
+    ----------
+    grid : ndarray
+        The points of the regular grid of each dataset, with shape
+        (# of datasets, n_bins).
+    density : ndarray
+        The estimated pdf at each point of `grid`.
+    """
+    def __init__(self, datasets, weights=None, n_bins=2048, cut=4.):
+        self.datasets = np.atleast_2d(np.asarray(datasets, dtype=np.float64))
+        self.d, self.n = self.datasets.shape
+        self.n_bins = n_bins
+        self.cut = cut
+
+        if weights is not None:
+            self.weights = weights / np.sum(weights)
+        else:
+            self.weights = np.ones(self.n) / self.n
+
+        # The effective number of datapoints, and hence the bandwidth factor,
+        # only depend on the (shared) weights
+        self.neff = 1.0 / np.sum(self.weights ** 2)
+        self.factor = np.power(self.neff, -1./5)
+
+        _mean = np.dot(self.datasets, self.weights)
+        _variance = np.dot((self.datasets - _mean[:, None])**2, self.weights) / (1 - np.sum(self.weights ** 2))
+        self.sigma = np.sqrt(_variance) * self.factor
+
+        self._compute_density()
+
+    def _compute_density(self):
+
+        rows = np.arange(self.d)[:, None]
+
+        x_min = np.min(self.datasets, axis=1) - self.cut*self.sigma
+        x_max = np.max(self.datasets, axis=1) + self.cut*self.sigma
+        self.grid = x_min[:, None] + (x_max-x_min)[:, None] * np.linspace(0., 1., self.n_bins)
+        self.dx = (x_max-x_min) / (self.n_bins-1)
+
+        # Linear binning of all datasets with a single `bincount`, each
+        # dataset being offset by `n_bins`
+        pos = (self.datasets - x_min[:, None]) / self.dx[:, None]
+        indx = np.clip(np.floor(pos).astype(int), 0, self.n_bins-2)
+        frac = pos - indx
+        indx += rows * self.n_bins
+        binned = np.bincount(indx.ravel(), weights=(self.weights*(1.-frac)).ravel(), minlength=self.d*self.n_bins) + \
+            np.bincount((indx+1).ravel(), weights=(self.weights*frac).ravel(), minlength=self.d*self.n_bins)
+        binned = binned.reshape(self.d, self.n_bins)
+
+        # Gaussian kernels sampled on the grid of each dataset, truncated at
+        # `cut` standard deviations and padded to the same length
+        n_kernel = np.minimum(np.ceil(self.cut*self.sigma/self.dx).astype(int), self.n_bins-1)
+        n_max = np.max(n_kernel)
+        x_kernel = np.arange(-n_max, n_max+1)[None, :] * self.dx[:, None]
+        kernel = np.exp(-0.5 * (x_kernel/self.sigma[:, None])**2) / np.sqrt(2.*np.pi) / self.sigma[:, None]
+        kernel[np.abs(np.arange(-n_max, n_max+1))[None, :] > n_kernel[:, None]] = 0.
+
+        self.density = np.clip(fftconvolve(binned, kernel, mode='same', axes=1), 0., None)
+
+    def evaluate(self, points):
+        """Evaluate the estimated pdf of each dataset on a set of points.
+
+        Parameters
+        ----------
+        points : array_like
+            2-D array of shape (# of datasets, # of points), containing the
+            points where the pdf of each dataset is evaluated.
+
+        Returns
+        -------
+        values : (# of datasets, # of points)-array
+            The values at each point.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(self.d, -1)
+        rows = np.arange(self.d)[:, None]
+
+        pos = (points - self.grid[:, :1]) / self.dx[:, None]
+        indx = np.clip(np.floor(pos).astype(int), 0, self.n_bins-2)
+        frac = pos - indx
+
+        values = self.density[rows, indx]*(1.-frac) + self.density[rows, indx+1]*frac
+        values[(pos < 0.) | (pos > self.n_bins-1)] = 0.
+
+        return values
+
+    __call__ = evaluate
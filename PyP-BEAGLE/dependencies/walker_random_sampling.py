@@ -2,8 +2,10 @@
 
 from __future__ import absolute_import
 from __future__ import print_function
-from numpy import arange, array, bincount, ndarray, ones, where
-from numpy.random import seed, random, randint
+from collections import defaultdict
+from numpy import arange, array, bincount, concatenate, cumsum, ndarray, ones, \
+        searchsorted, where
+from numpy.random import seed, random, randint, default_rng
 import six
 
 __author__ = "Tamas Nepusz, Denis Bzowy"
@@ -16,19 +18,19 @@ class WalkerRandomSampling(object):
     http://code.activestate.com/recipes/576564-walkers-alias-method-for-random-objects-with-diffe/
     """
     
-    def __init__(self, weights, keys=None, rand_seed=None):
+    def __init__(self, weights, keys=None, rand_seed=None, rng=None):
         """Builds the Walker tables ``prob`` and ``inx`` for calls to `random()`.
         The weights (a list or tuple or iterable) can be in any order and they
-        do not even have to sum to 1."""
-        n = self.n = len(weights)
-        if keys is None:
-            self.keys = keys
-        else:
-            self.keys = array(keys)
+        do not even have to sum to 1.
 
-        if rand_seed is not None:
-            seed(rand_seed)
+        A 2-D array of weights is interpreted as a set of independent
+        distributions, one per row, which are then sampled together by
+        `random()`.
 
+        If `rng` (a `numpy.random.Generator`, or anything accepted by
+        `numpy.random.default_rng`, e.g. a seed or a `SeedSequence`) is
+        provided, the random numbers are drawn from it, otherwise from the
+        global NumPy random state, seeded with `rand_seed` if provided."""
         if isinstance(weights, (list, tuple)):
             weights = array(weights, dtype=float)
         elif isinstance(weights, ndarray):
@@ -37,45 +39,128 @@ class WalkerRandomSampling(object):
         else:
             weights = array(list(weights), dtype=float)
 
-        if weights.ndim != 1:
-            raise ValueError("weights must be a vector")
+        if weights.ndim not in (1, 2):
+            raise ValueError("weights must be a vector, or a 2-D array")
+
+        n = self.n = weights.shape[-1]
+        if keys is None:
+            self.keys = keys
+        else:
+            self.keys = array(keys)
+
+        if rng is not None:
+            self.rng = default_rng(rng)
+        else:
+            self.rng = None
+            if rand_seed is not None:
+                seed(rand_seed)
 
+        if weights.ndim == 1:
+            self.prob, self.inx = self._build_tables(weights)
+        else:
+            self.prob = ones(weights.shape)
+            self.inx = ones(weights.shape, dtype=int)
+            for i in range(weights.shape[0]):
+                self.prob[i,:], self.inx[i,:] = self._build_tables(weights[i,:])
+
+    @staticmethod
+    def _build_tables(weights):
+        """Builds the tables ``prob`` and ``inx`` of a single distribution.
+
+        The "short" entries (with a weight, normalised to a mean of 1, < 1)
+        are filled, in order, with the "long" ones (weight > 1). A long entry
+        fills short entries until its weight drops below 1; it then becomes a
+        short entry itself, which is filled by the next long entry. The
+        cumulative deficit of the short entries and the cumulative excess of
+        the long ones determine when this happens, so that the whole table is
+        built without looping over the entries."""
+        n = len(weights)
         weights = weights * n / weights.sum()
 
-        inx = -ones(n, dtype=int)
-        _short = where(weights < 1)[0].tolist()
-        _long = where(weights > 1)[0].tolist()
-        while _short and _long:
-            j = _short.pop()
-            k = _long[-1]
+        prob = ones(n)
+        inx = arange(n)
+
+        _short = where(weights < 1)[0]
+        _long = where(weights > 1)[0]
+        n_short, n_long = len(_short), len(_long)
+        if n_short == 0 or n_long == 0:
+            return prob, inx
+
+        prob[_short] = weights[_short]
+
+        # Cumulative deficit of the short entries, and cumulative excess of
+        # the long ones
+        deficit = concatenate(([0.], cumsum(1. - weights[_short])))
+        excess = cumsum(weights[_long] - 1.)
+
+        # Number of short entries filled when each long entry becomes short
+        # (n_short+1 if it never does)
+        n_filled = searchsorted(deficit, excess, side='right')
 
-            inx[j] = k
-            weights[k] -= (1 - weights[j])
-            if weights[k] < 1:
-                _short.append( k )
-                _long.pop()
+        # Long entry filling each short entry. Because of round-off errors,
+        # the last short entries may be left without a long one, but their
+        # deficit is then ~0
+        k = searchsorted(n_filled, arange(n_short), side='right')
+        ok = k < n_long
+        inx[_short[ok]] = _long[k[ok]]
+        prob[_short[~ok]] = 1.
 
-        self.prob = weights
-        self.inx = inx
+        # Long entries becoming short are filled by the next long entry
+        k = arange(n_long-1)
+        ok = n_filled[:-1] <= n_short
+        k = k[ok]
+        prob[_long[k]] = excess[k] - deficit[n_filled[k]] + 1.
+        inx[_long[k]] = _long[k+1]
 
-    def random(self, count=None):
+        return prob, inx
+
+    def random(self, count=None, size=None):
         """Returns a given number of random integers or keys, with probabilities
         being proportional to the weights supplied in the constructor.
 
         When `count` is ``None``, returns a single integer or key, otherwise
         returns a NumPy array with a length given in `count`.
+
+        With `size` (a tuple), draws ``prod(size)`` independent sets of
+        `count` integers or keys, returned as an array of shape
+        ``size + (count,)``. If the constructor received a 2-D array of
+        weights, `size` defaults to the number of distributions, and each set
+        is drawn from the corresponding distribution.
         """
-        if count is None:
-            u = random()
-            j = randint(self.n)
+        multi = self.prob.ndim == 2
+        if count is None and size is None and not multi:
+            u = self._random()
+            j = self._randint()
             k = j if u <= self.prob[j] else self.inx[j]
             return self.keys[k] if self.keys is not None else k
 
-        u = random(count)
-        j = randint(self.n, size=count)
-        k = where(u <= self.prob[j], j, self.inx[j])
+        shape = () if count is None else (count,)
+        if size is not None:
+            shape = tuple(size) + shape
+        elif multi:
+            shape = (self.prob.shape[0],) + shape
+
+        u = self._random(shape)
+        j = self._randint(shape)
+        if multi:
+            if shape[0] != self.prob.shape[0]:
+                raise ValueError("The first dimension of `size` must be equal to the number of distributions")
+            rows = arange(shape[0]).reshape((-1,) + (1,)*(len(shape)-1))
+            k = where(u <= self.prob[rows, j], j, self.inx[rows, j])
+        else:
+            k = where(u <= self.prob[j], j, self.inx[j])
         return self.keys[k] if self.keys is not None else k
 
+    def _random(self, size=None):
+        if self.rng is not None:
+            return self.rng.random(size)
+        return random(size)
+
+    def _randint(self, size=None):
+        if self.rng is not None:
+            return self.rng.integers(self.n, size=size)
+        return randint(self.n, size=size)
+
 
 if __name__ == "__main__":
     # little examples, self-contained --
@@ -92,7 +177,7 @@ if __name__ == "__main__":
     s = str(nrand)
     print(s)
     if N==5 and Nrand==1000 and randomseed==1:
-        assert s == "[97, 207, 316, 380]"
+        assert s == "[97, 207, 320, 376]"
 
     print(Nrand, "Walker random sampling, strings with weights .1 .2 .3 .4:")
     abcd = dict(A=1, D=4, C=3, B=2)
@@ -103,4 +188,4 @@ if __name__ == "__main__":
     s = str(sorted(six.iteritems(nrand)))
     print(s)
     if N==5 and Nrand==1000 and randomseed==1:
-        assert s == "[('A', 85), ('B', 199), ('C', 343), ('D', 373)]"
+        assert s == "[('A', 85), ('B', 190), ('C', 293), ('D', 432)]"
@@ -82,9 +82,16 @@ setup(
     # your project is installed. For an analysis of "install_requires" vs pip's
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=['matplotlib', 'scipy', 'numpy', 'getdist', 'pathos', 
+    install_requires=['matplotlib', 'scipy', 'numpy', 'getdist', 'dill', 
                       'astropy', 'bokeh', 'natsort', 'six'],
 
+    # Optional dependencies, needed to write the output catalogues as Parquet
+    # or HDF5 files, e.g. `pip install pyp_beagle[parquet]`
+    extras_require={
+        'parquet': ['pyarrow'],
+        'hdf5': ['h5py'],
+    },
+
     include_package_data=True, 
 
     # Although 'package_data' is the preferred approach, in some case you may
@@ -0,0 +1,62 @@
+"""
+Fixtures of the benchmarks.
+"""
+from __future__ import absolute_import
+import os
+import pytest
+
+from pyp_beagle.beagle_utils import BeagleDirectories
+from pyp_beagle.beagle_filters import PhotometricFilters
+from pyp_beagle.beagle_photometry import PhotometricCatalogue
+from pyp_beagle.beagle_cache import open_results
+
+from synthetic import make_beagle_files, make_filters, make_observed_catalogue, \
+    N_OBJECTS, N_SAMPLES, N_BANDS, N_WL
+
+@pytest.fixture(scope='session')
+def results_dir(tmp_path_factory):
+
+    directory = str(tmp_path_factory.mktemp('results'))
+
+    make_beagle_files(directory, n_objects=N_OBJECTS, n_samples=N_SAMPLES,
+            n_bands=N_BANDS, n_wl=N_WL)
+
+    BeagleDirectories.results_dir = directory
+
+    return directory
+
+@pytest.fixture(scope='session')
+def file_list(results_dir):
+
+    return sorted([f for f in os.listdir(results_dir) if f.endswith('_BEAGLE.fits.gz')])
+
+@pytest.fixture(scope='session')
+def results(results_dir, file_list):
+
+    hdulist = open_results(os.path.join(results_dir, file_list[0]), use_cache=False)
+    yield hdulist
+    hdulist.close()
+
+@pytest.fixture(scope='session')
+def filters_file(tmp_path_factory):
+
+    return make_filters(str(tmp_path_factory.mktemp('filters')), n_bands=N_BANDS)
+
+@pytest.fixture(scope='session')
+def filters(filters_file):
+
+    my_filters = PhotometricFilters()
+    my_filters.load(filters_file)
+
+    return my_filters
+
+@pytest.fixture(scope='session')
+def observed_catalogue(tmp_path_factory):
+
+    file_name = str(tmp_path_factory.mktemp('catalogue').joinpath('catalogue.fits'))
+    make_observed_catalogue(file_name, n_objects=N_OBJECTS, n_bands=N_BANDS)
+
+    catalogue = PhotometricCatalogue()
+    catalogue.load(file_name)
+
+    return catalogue
@@ -0,0 +1,188 @@
+"""
+Generation of synthetic Beagle output files, photometric filters and observed
+catalogues, used by the benchmarks.
+
+The size of the synthetic data can be set through the environment variables
+PYPBEAGLE_BENCH_N_OBJECTS, PYPBEAGLE_BENCH_N_SAMPLES, PYPBEAGLE_BENCH_N_BANDS,
+PYPBEAGLE_BENCH_N_WL and PYPBEAGLE_BENCH_N_IDS.
+"""
+from __future__ import absolute_import
+import os
+import numpy as np
+from astropy.io import fits
+
+# 1 jy = 10^-23 erg s^-1 cm^-2 hz^-1
+jy = 1.E-23
+
+nanoJy = 1.E-09
+
+def _size(name, default):
+
+    return int(os.environ.get('PYPBEAGLE_BENCH_' + name, default))
+
+N_OBJECTS = _size('N_OBJECTS', 20)
+N_SAMPLES = _size('N_SAMPLES', 2000)
+N_BANDS = _size('N_BANDS', 10)
+N_WL = _size('N_WL', 2000)
+N_IDS = _size('N_IDS', 1000)
+
+def band_label(j):
+
+    return 'B' + str(j)
+
+def make_beagle_files(results_dir, n_objects=10, n_samples=1000, n_bands=10,
+        n_wl=1000, seed=0):
+    """
+    Write a set of synthetic Beagle output files.
+
+    Parameters
+    ----------
+    results_dir : str
+        Directory where the `<ID>_BEAGLE.fits.gz` files are written.
+
+    n_objects : int, optional
+        Number of objects (i.e. of output files).
+
+    n_samples : int, optional
+        Number of posterior samples in each file.
+
+    n_bands : int, optional
+        Number of photometric bands.
+
+    n_wl : int, optional
+        Number of wavelength points of the marginal SED.
+
+    seed : int, optional
+        Seed of the random number generator.
+
+    Returns
+    -------
+    file_list : list
+        Names of the Beagle output files.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if not os.path.exists(results_dir):
+        os.makedirs(results_dir)
+
+    wl = np.linspace(1000., 20000., n_wl)
+
+    file_list = list()
+    for i in range(n_objects):
+
+        ID = str(i+1)
+
+        probability = rng.random(n_samples)
+        probability /= np.sum(probability)
+
+        columns = [
+                fits.Column(name='probability', format='D', array=probability),
+                fits.Column(name='ln_likelihood', format='D', array=np.log(probability)),
+                fits.Column(name='mass', format='D', array=rng.normal(9., 0.3, n_samples)),
+                fits.Column(name='tauV_eff', format='E', array=rng.random(n_samples)),
+                fits.Column(name='metallicity', format='E', array=rng.normal(-0.5, 0.2, n_samples)),
+                fits.Column(name='tau', format='E', array=rng.normal(9., 0.5, n_samples)),
+                fits.Column(name='max_stellar_age', format='E', array=rng.normal(9., 0.2, n_samples))
+                ]
+        posterior = fits.BinTableHDU.from_columns(columns, name='POSTERIOR PDF')
+
+        # Model fluxes, in erg s^-1 cm^-2 hz^-1
+        columns = [fits.Column(name='_' + band_label(j) + '_', format='E',
+            array=np.abs(rng.normal(100.*(j+1), 10., n_samples))*nanoJy*jy) for j in range(n_bands)]
+        photometry = fits.BinTableHDU.from_columns(columns, name='MARGINAL PHOTOMETRY')
+
+        columns = [
+                fits.Column(name='redshift', format='E', array=np.full(n_samples, 2.)),
+                fits.Column(name='M_star', format='E', array=10.**rng.normal(9., 0.3, n_samples))
+                ]
+        properties = fits.BinTableHDU.from_columns(columns, name='GALAXY PROPERTIES')
+
+        sed_wl = fits.BinTableHDU.from_columns([fits.Column(name='wl',
+            format=str(n_wl)+'E', array=wl[None,:])], name='MARGINAL SED WL')
+
+        sed = fits.ImageHDU(np.abs(rng.normal(1.E-18, 1.E-19, (n_samples, n_wl))).astype(np.float32),
+                name='MARGINAL SED')
+
+        file_name = ID + '_BEAGLE.fits.gz'
+        hdulist = fits.HDUList([fits.PrimaryHDU(), posterior, photometry, properties, sed_wl, sed])
+        hdulist.writeto(os.path.join(results_dir, file_name), overwrite=True)
+
+        file_list.append(file_name)
+
+    return file_list
+
+def make_filters(directory, n_bands=10, n_wl=500):
+    """
+    Write a filter configuration file, and the corresponding transmission
+    curves, as used by `PhotometricFilters.load`.
+
+    Parameters
+    ----------
+    directory : str
+        Directory where the files are written.
+
+    n_bands : int, optional
+        Number of photometric bands.
+
+    n_wl : int, optional
+        Number of wavelength points of each transmission curve.
+
+    Returns
+    -------
+    str
+        Name of the filter configuration file.
+    """
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    lines = ["units:nanoJy"]
+    for j in range(n_bands):
+
+        wl_c = 3000. + 1000.*j
+        wl = np.linspace(wl_c-500., wl_c+500., n_wl)
+        t_wl = np.exp(-0.5*((wl-wl_c)/200.)**2)
+
+        trans_name = os.path.join(directory, band_label(j) + '.dat')
+        np.savetxt(trans_name, np.column_stack((wl, t_wl)), header="wl t_wl", comments='')
+
+        lines.append("name:" + band_label(j) + " fileName:" + trans_name +
+                " flux:colName:F_" + band_label(j) + " fluxerr:colName:E_" + band_label(j) +
+                " label:" + band_label(j))
+
+    name = os.path.join(directory, "filters.dat")
+    with open(name, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    return name
+
+def make_observed_catalogue(file_name, n_objects=10, n_bands=10, seed=0):
+    """
+    Write an observed photometric catalogue, with fluxes in nanoJy.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the output FITS file.
+
+    n_objects : int, optional
+        Number of objects.
+
+    n_bands : int, optional
+        Number of photometric bands.
+
+    seed : int, optional
+        Seed of the random number generator.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    columns = [fits.Column(name='ID', format='K', array=np.arange(1, n_objects+1))]
+    for j in range(n_bands):
+        columns.append(fits.Column(name='F_' + band_label(j), format='E',
+            array=rng.normal(100.*(j+1), 10., n_objects)))
+        columns.append(fits.Column(name='E_' + band_label(j), format='E',
+            array=np.full(n_objects, 10.)))
+
+    fits.BinTableHDU.from_columns(columns).writeto(file_name, overwrite=True)
@@ -0,0 +1,116 @@
+"""
+Benchmarks of the post-processing hot paths.
+
+See the README.md file in this folder for how to run the benchmarks, and how to
+compare them with the recorded baselines.
+"""
+from __future__ import absolute_import
+import os
+import shutil
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from pyp_beagle.beagle_utils import BeagleDirectories, prepare_violin_plot, prepare_violin_plots, \
+    match_ID, weighted_quantiles
+from pyp_beagle.beagle_summary_catalogue import get1DInterval, get1DIntervals, \
+    BeagleSummaryCatalogue
+from pyp_beagle.beagle_filters import PhotometricFilters
+from pyp_beagle.beagle_posterior_predictive_checks import PosteriorPredictiveChecks
+
+from synthetic import N_IDS
+
+CREDIBLE_INTERVALS = [68., 95.]
+
+def _clean_pypbeagle_data(results_dir):
+
+    shutil.rmtree(os.path.join(results_dir, BeagleDirectories.pypbeagle_data), ignore_errors=True)
+
+
+@pytest.mark.benchmark(group="posterior statistics")
+def test_get1DInterval(benchmark, results):
+
+    mass = np.asarray(results['posterior pdf']['mass'])
+    probability = np.asarray(results['posterior pdf']['probability'])
+
+    benchmark(get1DInterval, mass, probability, CREDIBLE_INTERVALS)
+
+@pytest.mark.benchmark(group="posterior statistics")
+def test_get1DIntervals(benchmark, results):
+
+    posterior = results['posterior pdf']
+    names = [name for name in posterior.dtype.names if name not in ('probability', 'ln_likelihood')]
+    param_values = np.column_stack([posterior[name] for name in names])
+    probability = np.asarray(posterior['probability'])
+
+    benchmark(get1DIntervals, param_values, probability, CREDIBLE_INTERVALS)
+
+@pytest.mark.benchmark(group="posterior statistics")
+def test_prepare_violin_plot(benchmark, results):
+
+    mass = np.asarray(results['posterior pdf']['mass'], dtype=np.float64)
+    probability = np.asarray(results['posterior pdf']['probability'])
+
+    benchmark(prepare_violin_plot, mass, weights=probability)
+
+@pytest.mark.benchmark(group="posterior statistics")
+def test_prepare_violin_plots(benchmark, results):
+
+    # Violins of all bands, as computed in `Photometry.plot_marginal`
+    photometry = results['marginal photometry']
+    fluxes = np.vstack([photometry[name] for name in photometry.dtype.names]).astype(np.float64)
+    probability = np.asarray(results['posterior pdf']['probability'])
+
+    benchmark(prepare_violin_plots, fluxes, weights=probability)
+
+@pytest.mark.benchmark(group="posterior statistics")
+def test_spectrum_marginal_statistics(benchmark, results):
+
+    # Median and 95 % credible region of the marginal SED at each wavelength,
+    # as computed in `Spectrum.plot_marginal`
+    model_fluxes = np.asarray(results['marginal sed'])
+    probability = np.asarray(results['posterior pdf']['probability'], dtype=np.float64)
+
+    benchmark(weighted_quantiles, model_fluxes, probability, [0.5, 0.025, 0.975])
+
+@pytest.mark.benchmark(group="catalogues")
+def test_summary_catalogue_compute(benchmark, results_dir, file_list):
+
+    summary_catalogue = BeagleSummaryCatalogue(credible_intervals=CREDIBLE_INTERVALS)
+
+    benchmark.pedantic(summary_catalogue.compute, args=(file_list,), kwargs={'overwrite': True},
+            setup=lambda: _clean_pypbeagle_data(results_dir), rounds=5)
+
+@pytest.mark.benchmark(group="catalogues")
+def test_match_ID_int(benchmark):
+
+    rng = np.random.default_rng(0)
+    ID_list_1 = rng.permutation(N_IDS)
+    ID_list_2 = rng.permutation(N_IDS)[:N_IDS//2]
+
+    benchmark(match_ID, ID_list_1, ID_list_2)
+
+@pytest.mark.benchmark(group="catalogues")
+def test_match_ID_str(benchmark):
+
+    rng = np.random.default_rng(0)
+    ID_list_1 = np.array(['obj_' + str(i) for i in rng.permutation(N_IDS)])
+    ID_list_2 = np.array(['obj_' + str(i) for i in rng.permutation(N_IDS)[:N_IDS//2]])
+
+    benchmark(match_ID, ID_list_1, ID_list_2)
+
+@pytest.mark.benchmark(group="photometry")
+def test_filters_load(benchmark, filters_file):
+
+    benchmark(PhotometricFilters().load, filters_file)
+
+@pytest.mark.benchmark(group="photometry")
+def test_posterior_predictive_checks_compute(benchmark, results_dir, filters, observed_catalogue):
+
+    # The replicated data are removed before each round, so that they are
+    # computed (and not read from disk) each time
+    ppc = PosteriorPredictiveChecks()
+
+    benchmark.pedantic(ppc.compute, args=(observed_catalogue, filters),
+            setup=lambda: _clean_pypbeagle_data(results_dir), rounds=5)
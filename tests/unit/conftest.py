@@ -0,0 +1,55 @@
+"""
+Fixtures of the unit tests.
+"""
+from __future__ import absolute_import
+import os
+import sys
+import pytest
+
+from pyp_beagle.beagle_utils import BeagleDirectories
+from pyp_beagle.beagle_cache import BeagleCache
+from pyp_beagle.beagle_mirror import BeagleMirror
+from pyp_beagle.beagle_filters import PhotometricFilters
+from pyp_beagle.beagle_photometry import PhotometricCatalogue
+
+# The synthetic Beagle output files are shared with the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+
+from synthetic import make_beagle_files, make_filters, make_observed_catalogue
+
+N_OBJECTS = 3
+
+N_BANDS = 4
+
+@pytest.fixture
+def results_dir(tmp_path):
+
+    directory = str(tmp_path.joinpath('results'))
+    make_beagle_files(directory, n_objects=N_OBJECTS, n_samples=500, n_bands=N_BANDS, n_wl=200)
+
+    # The global configuration is restored after each test
+    configuration = (BeagleDirectories.results_dir, BeagleCache.enabled, BeagleMirror.enabled)
+    BeagleDirectories.results_dir = directory
+
+    yield directory
+
+    BeagleDirectories.results_dir, BeagleCache.enabled, BeagleMirror.enabled = configuration
+
+@pytest.fixture
+def filters(tmp_path):
+
+    my_filters = PhotometricFilters()
+    my_filters.load(make_filters(str(tmp_path.joinpath('filters')), n_bands=N_BANDS))
+
+    return my_filters
+
+@pytest.fixture
+def observed_catalogue(tmp_path):
+
+    file_name = str(tmp_path.joinpath('catalogue.fits'))
+    make_observed_catalogue(file_name, n_objects=N_OBJECTS, n_bands=N_BANDS)
+
+    catalogue = PhotometricCatalogue()
+    catalogue.load(file_name)
+
+    return catalogue
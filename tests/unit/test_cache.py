@@ -0,0 +1,71 @@
+from __future__ import absolute_import
+import os
+import shutil
+import numpy as np
+from astropy.io import fits
+
+from pyp_beagle.beagle_utils import get_files_list
+from pyp_beagle.beagle_cache import BeagleCache, open_results
+
+from synthetic import make_beagle_files
+
+def _assert_same_data(results, hdulist):
+
+    for extName in ('POSTERIOR PDF', 'MARGINAL PHOTOMETRY', 'GALAXY PROPERTIES', 'MARGINAL SED WL'):
+        data = hdulist[extName].data
+        assert results.get_columns(extName) == list(data.columns.names)
+        for name in data.columns.names:
+            np.testing.assert_array_equal(results[extName][name], data[name])
+
+    np.testing.assert_array_equal(results['marginal sed'], hdulist['MARGINAL SED'].data)
+
+    table = results.read('posterior pdf', columns=['mass', 'probability'])
+    assert table.dtype.names == ('mass', 'probability')
+    np.testing.assert_array_equal(table['mass'], hdulist['POSTERIOR PDF'].data['mass'])
+
+def test_cached_read(results_dir):
+
+    file_list, _ = get_files_list()
+    file_name = os.path.join(results_dir, file_list[0])
+
+    # The cache entry is built on first use
+    assert BeagleCache.load_manifest(file_name) is None
+    with open_results(file_name, use_cache=True) as results, fits.open(file_name) as hdulist:
+        _assert_same_data(results, hdulist)
+
+    assert BeagleCache.load_manifest(file_name) is not None
+
+    # And later used, without opening the FITS file
+    with open_results(file_name, use_cache=True) as results, fits.open(file_name) as hdulist:
+        _assert_same_data(results, hdulist)
+        assert results.result_file.hdulist is None
+        assert 'MARGINAL SED' in results
+
+def test_invalidation(results_dir, tmp_path):
+
+    file_list, _ = get_files_list()
+    file_name = os.path.join(results_dir, file_list[0])
+    BeagleCache.build(file_name)
+    assert BeagleCache.load_manifest(file_name) is not None
+
+    # A different modification time invalidates the cache entry
+    stat = os.stat(file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert BeagleCache.load_manifest(file_name) is None
+
+    BeagleCache.build(file_name)
+    assert BeagleCache.load_manifest(file_name) is not None
+
+    # And so does a different size, with the same modification time
+    other_dir = str(tmp_path.joinpath('other'))
+    make_beagle_files(other_dir, n_objects=1, n_samples=300, n_bands=4, n_wl=200, seed=1)
+    stat = os.stat(file_name)
+    shutil.copy(os.path.join(other_dir, '1_BEAGLE.fits.gz'), file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.stat(file_name).st_size != stat.st_size
+    assert BeagleCache.load_manifest(file_name) is None
+
+    # The cache entry is then rebuilt from the new file
+    with open_results(file_name, use_cache=True) as results, fits.open(file_name) as hdulist:
+        assert len(results['posterior pdf']) == 300
+        _assert_same_data(results, hdulist)
@@ -0,0 +1,64 @@
+from __future__ import absolute_import
+from collections import OrderedDict
+import numpy as np
+import pytest
+
+from pyp_beagle.beagle_calibration_correction import CalibrationCorrection
+
+def _calibration_correction(correction_type, degree):
+
+    calibration_correction = CalibrationCorrection()
+    calibration_correction.type = correction_type
+    calibration_correction.degree = degree
+
+    # The second coefficient is fixed, the others are fitted
+    calibration_correction.coeff_params = OrderedDict()
+    for d in range(degree+1):
+        label = 'continuum_coeff-' + str(d+1)
+        if d == 1:
+            calibration_correction.coeff_params[label] = {'fitted': False, 'value': 0.3}
+        else:
+            calibration_correction.coeff_params[label] = {'fitted': True}
+
+    return calibration_correction
+
+def _posterior(calibration_correction, n_samples, rng):
+
+    labels = [label for label, value in calibration_correction.coeff_params.items() if value['fitted']]
+    posterior = np.zeros(n_samples, dtype=[(label, np.float32) for label in labels])
+    for label in labels:
+        posterior[label] = rng.normal(0., 0.5, n_samples)
+
+    return posterior
+
+@pytest.mark.parametrize("correction_type", ["polynomial", "legendre"])
+def test_return_correction_matrix(correction_type):
+
+    rng = np.random.default_rng(0)
+
+    n_samples, degree = 300, 3
+    calibration_correction = _calibration_correction(correction_type, degree)
+    posterior = _posterior(calibration_correction, n_samples, rng)
+
+    model_wl = np.linspace(3000., 10000., 500)
+    w0 = 0.5*(model_wl[0]+model_wl[-1])
+    x = (model_wl-w0)/1E4
+
+    coeff_matrix = calibration_correction.return_coeff_matrix(posterior, n_samples)
+    correction = calibration_correction.return_correction_matrix(x, coeff_matrix)
+
+    # Per-sample loop used in `Spectrum.plot_marginal` before
+    # `return_correction_matrix`
+    expected = np.zeros((n_samples, len(model_wl)))
+    for i in range(n_samples):
+        tmp_coeff = []
+        for d in range(degree+1):
+            label = 'continuum_coeff-'+str(d+1)
+            if calibration_correction.coeff_params[label]['fitted']:
+                tmp_coeff.append(posterior[label][i])
+            else:
+                tmp_coeff.append(calibration_correction.coeff_params[label]['value'])
+
+        expected[i,:] = calibration_correction.return_correction(x, tmp_coeff)
+
+    np.testing.assert_allclose(correction, expected, rtol=0., atol=1.E-12)
@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+from collections import OrderedDict
+import numpy as np
+import pytest
+
+from pyp_beagle.beagle_catalogue_io import write_catalogue, open_catalogue, read_extension
+
+N_ROWS = 5
+
+def _tables():
+
+    posterior = np.zeros(N_ROWS, dtype=[('ID', 'U8'), ('mass', float), ('mass_68.00', float, (2,))])
+    posterior['ID'] = ['obj_' + str(i) for i in range(N_ROWS)]
+    posterior['mass'] = np.linspace(8., 11., N_ROWS)
+    posterior['mass_68.00'] = posterior['mass'][:, None] + np.array([-0.1, 0.1])
+
+    photometry = np.zeros(N_ROWS, dtype=[('ID', 'U8'), ('_HST_F160W__median', np.float32), ('n_bands', np.int32)])
+    photometry['ID'] = posterior['ID']
+    photometry['_HST_F160W__median'] = np.arange(N_ROWS, dtype=np.float32) * 1.e-30
+    photometry['n_bands'] = np.arange(N_ROWS)
+
+    return OrderedDict([('POSTERIOR PDF', posterior), ('MARGINAL PHOTOMETRY', photometry)])
+
+@pytest.fixture(params=['fits', 'parquet', 'hdf5'])
+def catalogue(request, tmp_path):
+
+    suffix = {'fits': '.fits', 'parquet': '.parquet', 'hdf5': '.hdf5'}[request.param]
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    elif request.param == 'hdf5':
+        pytest.importorskip('h5py')
+
+    file_name = str(tmp_path.joinpath('catalogue' + suffix))
+    write_catalogue(file_name, _tables(), units={'POSTERIOR PDF': {'mass': 'log(M_sun)'}})
+
+    return file_name
+
+def test_round_trip(catalogue):
+
+    tables = _tables()
+    with open_catalogue(catalogue) as hdulist:
+        for hdu_name, table in tables.items():
+            assert hdu_name in hdulist
+            data = read_extension(hdulist[hdu_name])
+            assert data.dtype.names == table.dtype.names
+            for name in table.dtype.names:
+                np.testing.assert_array_equal(data[name], table[name])
+                np.testing.assert_array_equal(hdulist[hdu_name].data[name], table[name])
+
+        data = read_extension(hdulist['POSTERIOR PDF'], columns=['mass'])
+        assert data.dtype.names == ('mass',)
+
+def test_units(catalogue):
+
+    with open_catalogue(catalogue) as hdulist:
+        columns = hdulist['POSTERIOR PDF'].columns
+        units = dict(zip(columns.names, columns.units))
+        assert units['mass'] == 'log(M_sun)'
+        assert not units['ID']
+
+@pytest.mark.parametrize('rows', [np.array([0, 2]), np.array([4, 1, 1]), slice(1, 4),
+    np.arange(N_ROWS) % 2 == 0])
+def test_row_selection(catalogue, rows):
+
+    table = _tables()['MARGINAL PHOTOMETRY']
+    with open_catalogue(catalogue) as hdulist:
+        data = hdulist['MARGINAL PHOTOMETRY'].data[rows]
+        assert len(data) == len(table[rows])
+        for name in table.dtype.names:
+            np.testing.assert_array_equal(data[name], table[rows][name])
+
+        row = hdulist['POSTERIOR PDF'].data[3]
+        assert row['mass'] == _tables()['POSTERIOR PDF']['mass'][3]
+        np.testing.assert_array_equal(row['mass_68.00'], _tables()['POSTERIOR PDF']['mass_68.00'][3])
@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+import os
+import shutil
+import numpy as np
+from astropy.io import fits
+import pytest
+
+from pyp_beagle.beagle_utils import get_files_list
+from pyp_beagle.beagle_consolidated import BeagleConsolidatedStore
+
+from synthetic import make_beagle_files
+
+@pytest.fixture(params=['npy', 'hdf5'])
+def store_format(request):
+
+    if request.param == 'hdf5':
+        pytest.importorskip('h5py')
+
+    return request.param
+
+def test_build(results_dir, store_format, tmp_path):
+
+    # An object with a different number of posterior samples
+    other_dir = str(tmp_path.joinpath('other'))
+    make_beagle_files(other_dir, n_objects=1, n_samples=300, n_bands=4, n_wl=200, seed=1)
+    shutil.copy(os.path.join(other_dir, '1_BEAGLE.fits.gz'), os.path.join(results_dir, '4_BEAGLE.fits.gz'))
+
+    file_list, IDs = get_files_list()
+    hdu_col = [{'name': 'GALAXY PROPERTIES', 'columns': ['M_star']}]
+    store = BeagleConsolidatedStore.build(file_list, IDs=IDs, hdu_col=hdu_col, store_format=store_format)
+
+    assert store.exists()
+    assert store.is_up_to_date(file_list)
+    assert list(store.IDs) == IDs
+    assert store.get_extensions() == ['POSTERIOR PDF', 'GALAXY PROPERTIES']
+    assert store.get_columns('galaxy properties') == ['M_star']
+
+    probability = store.split(store.read('POSTERIOR PDF', 'probability'))
+    M_star = store.split(store.read('GALAXY PROPERTIES', 'M_star'))
+    assert len(probability) == len(file_list)
+
+    for i, (file, ID) in enumerate(zip(file_list, IDs)):
+        with fits.open(os.path.join(results_dir, file)) as hdulist:
+            posterior = hdulist['POSTERIOR PDF'].data
+            np.testing.assert_array_equal(probability[i], posterior['probability'])
+            np.testing.assert_array_equal(M_star[i], hdulist['GALAXY PROPERTIES'].data['M_star'])
+
+            table = store.read_object(ID, 'POSTERIOR PDF')
+            assert list(table.dtype.names) == list(posterior.columns.names)
+            for name in table.dtype.names:
+                np.testing.assert_array_equal(table[name], posterior[name])
+
+            table = store.read_object(ID, 'POSTERIOR PDF', columns=['mass'])
+            assert table.dtype.names == ('mass',)
+            np.testing.assert_array_equal(table['mass'], posterior['mass'])
+
+    with pytest.raises(KeyError):
+        store.read_object('unknown', 'POSTERIOR PDF')
+
+    with pytest.raises(KeyError):
+        store.read('POSTERIOR PDF', 'unknown')
+
+    store.close()
+
+    # A store built from other files, or from files that have been modified
+    # since, is out-of-date
+    assert not store.is_up_to_date(file_list[:-1])
+
+    name = os.path.join(results_dir, file_list[0])
+    stat = os.stat(name)
+    os.utime(name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not BeagleConsolidatedStore().is_up_to_date(file_list)
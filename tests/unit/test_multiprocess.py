@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+import sys
+import functools
+import operator
+import matplotlib
+import matplotlib.pyplot
+import pytest
+
+from pyp_beagle.beagle_utils import BeagleDirectories
+from pyp_beagle.beagle_multiprocess import BeaglePool
+
+
+def _worker_configuration(i):
+
+    return (i, matplotlib.rcParams['font.size'], matplotlib.rcParams['text.usetex'],
+            matplotlib.get_backend().lower(), BeagleDirectories.fontsize)
+
+
+def test_map_ordered():
+
+    pool = BeaglePool(functools.partial(operator.mul, 3), n_proc=2, chunk_size=2)
+    assert list(pool.map(range(10))) == [3*i for i in range(10)]
+
+
+def test_map_interleaved_pools():
+
+    # Each pool applies its own function, even when their results are
+    # consumed at the same time
+    first = BeaglePool(functools.partial(operator.add, 100), n_proc=2, chunk_size=1).map(range(5))
+    second = BeaglePool(functools.partial(operator.mul, -1), n_proc=2, chunk_size=1).map(range(5))
+
+    results = [(next(first), next(second)) for _ in range(5)]
+
+    assert results == [(100+i, -i) for i in range(5)]
+
+
+@pytest.mark.parametrize('max_tasks_per_child', [None, 1])
+def test_worker_configuration(max_tasks_per_child):
+
+    # With `max_tasks_per_child`, worker processes are spawned instead of
+    # forked, and must receive the configuration of the parent process
+    if max_tasks_per_child is not None and sys.version_info < (3, 11):
+        pytest.skip("`max_tasks_per_child` requires Python >= 3.11")
+
+    fontsize = BeagleDirectories.fontsize
+    backend = matplotlib.get_backend()
+    try:
+        BeagleDirectories.fontsize = 17
+        matplotlib.pyplot.switch_backend('Agg')
+        with matplotlib.rc_context({'font.size': 17, 'text.usetex': True}):
+            pool = BeaglePool(_worker_configuration, n_proc=2, chunk_size=1,
+                    max_tasks_per_child=max_tasks_per_child)
+            results = list(pool.map(range(4)))
+    finally:
+        BeagleDirectories.fontsize = fontsize
+        matplotlib.pyplot.switch_backend(backend)
+
+    assert results == [(i, 17., True, 'agg', 17) for i in range(4)]
@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+import os
+import re
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import pytest
+
+from pyp_beagle.beagle_utils import BeagleDirectories
+from pyp_beagle import beagle_plot_output
+from pyp_beagle.beagle_plot_output import BeaglePlotOutput
+
+N_BANDS = 6
+
+@pytest.fixture
+def plot_output(tmp_path):
+
+    backend = matplotlib.get_backend()
+    plt.switch_backend('Agg')
+
+    # The global configuration is restored, and the reused figures closed,
+    # after each test
+    configuration = (BeagleDirectories.results_dir, BeaglePlotOutput.plot_format,
+            BeaglePlotOutput.multipage, BeaglePlotOutput.reuse_figures)
+    BeagleDirectories.results_dir = str(tmp_path)
+
+    yield BeaglePlotOutput
+
+    BeaglePlotOutput.close()
+    for template in beagle_plot_output._templates.values():
+        plt.close(template.fig)
+    beagle_plot_output._templates.clear()
+
+    BeagleDirectories.results_dir, BeaglePlotOutput.plot_format, \
+            BeaglePlotOutput.multipage, BeaglePlotOutput.reuse_figures = configuration
+    plt.switch_backend(backend)
+
+def _draw(ID, n_measured, seed):
+    """
+    Draw an object with `n_measured` bands with measurements, as done in
+    `Photometry.plot_marginal`, and return its template, the artists of each
+    band and the rendered image.
+    """
+
+    rng = np.random.default_rng(seed)
+    x = np.arange(N_BANDS, dtype=float)
+    y = rng.uniform(1., 10., N_BANDS)
+    yerr = rng.uniform(0.2, 1., N_BANDS)
+
+    template = BeaglePlotOutput.get_template('test', figsize=(4, 3))
+    ax = template.axs
+
+    violins = [np.column_stack((x[i] + 0.3*np.sin(np.linspace(0., np.pi, 10)), y[i] + np.linspace(-1., 1., 10)))
+            for i in range(N_BANDS)]
+    template.poly_collection(ax, 'violins', violins, facecolor='tomato', edgecolor='black')
+    template.line_collection(ax, 'violin_medians', [[[x[i]-0.2, y[i]], [x[i]+0.2, y[i]]] for i in range(N_BANDS)],
+            color='black')
+    template.fill_betweenx(ax, 'band', [0., 12.], x[0]-0.5, x[0]+0.5, color='grey', alpha=0.3)
+
+    ok = slice(0, n_measured)
+    template.errorbar(ax, 'observations', x[ok], y[ok], yerr[ok], ls=' ', marker='D', capsize=3)
+
+    artists = list()
+    for i in range(n_measured):
+        artists.append((template.text(ax, ('filter_label', i), x[i], 11., 'band ' + str(i), ha='center'),
+            template.plot(ax, ('filter_line', i), [x[i], x[i]], [y[i], 10.5], ls=':', color='darkgrey')))
+
+    template.text(ax, 'ID', 0., 11.5, 'ID ' + str(ID))
+
+    ax.set_xlim(-1., N_BANDS)
+    ax.set_ylim(0., 12.)
+
+    template.finish()
+
+    template.fig.canvas.draw()
+    image = np.array(template.fig.canvas.buffer_rgba())
+
+    return template, artists, image
+
+def test_reused_figures(plot_output):
+
+    # Objects are drawn with all bands measured, then with only some of them
+    objects = ((1, N_BANDS, 0), (2, 3, 1))
+
+    plot_output.reuse_figures = False
+    images = list()
+    for obj in objects:
+        template, _, image = _draw(*obj)
+        images.append(image)
+        plot_output.release(template)
+
+    plot_output.reuse_figures = True
+    first_template, first_artists, first_image = _draw(*objects[0])
+    template, artists, image = _draw(*objects[1])
+
+    assert template is first_template
+    np.testing.assert_array_equal(first_image, images[0])
+    np.testing.assert_array_equal(image, images[1])
+
+    # The artists of the bands not measured for the second object are hidden
+    for i, band_artists in enumerate(first_artists):
+        for artist in band_artists:
+            assert artist.get_visible() == (i < objects[1][1])
+
+def test_multipage(plot_output):
+
+    plot_output.multipage = True
+    plot_output.reuse_figures = True
+
+    n_objects = 4
+    for ID in range(1, n_objects+1):
+        template, _, _ = _draw(ID, N_BANDS - ID % 3, ID)
+        plot_output.save(template.fig, str(ID) + '_BEAGLE_test.pdf', ID=ID)
+        plot_output.release(template)
+
+    plot_output.close()
+
+    directory = os.path.join(BeagleDirectories.results_dir, BeagleDirectories.pypbeagle_plot)
+    assert sorted(os.listdir(directory)) == ['BEAGLE_test.pdf']
+
+    with open(os.path.join(directory, 'BEAGLE_test.pdf'), 'rb') as f:
+        pages = re.findall(rb'/Type\s*/Page\b(?!s)', f.read())
+
+    assert len(pages) == n_objects
@@ -0,0 +1,52 @@
+from __future__ import absolute_import
+import os
+import numpy as np
+
+from pyp_beagle import beagle_posterior_predictive_checks
+from pyp_beagle.beagle_posterior_predictive_checks import PosteriorPredictiveChecks
+from pyp_beagle.beagle_cache import open_results
+from pyp_beagle.beagle_utils import BeagleDirectories
+
+# 1 jy = 10^-23 erg s^-1 cm^-2 hz^-1
+jy = 1.E-23
+
+def _compute_batch(observed_catalogue, filters):
+
+    obs_flux, obs_flux_err = observed_catalogue.extract_fluxes_all(filters)
+    IDs = np.asarray(observed_catalogue.data['ID'])
+    seeds = np.random.SeedSequence(1234).spawn(len(IDs))
+
+    return PosteriorPredictiveChecks().compute_batch(observed_catalogue, filters, IDs,
+            obs_flux, obs_flux_err, seeds, n_replicated=100)
+
+def test_aver_chi_square(results_dir, filters, observed_catalogue):
+
+    os.makedirs(os.path.join(results_dir, BeagleDirectories.pypbeagle_data))
+    found, n_data, aver_chi_square, p_value = _compute_batch(observed_catalogue, filters)
+    assert np.all(found)
+
+    # Chi-square of each posterior sample, weighted by its probability
+    obs_flux, obs_flux_err = observed_catalogue.extract_fluxes_all(filters)
+    names = ['_' + label + '_' for label in filters.data['label']]
+    for i, ID in enumerate(observed_catalogue.data['ID']):
+        with open_results(os.path.join(results_dir, str(ID) + '_BEAGLE.fits.gz')) as results:
+            probability = np.asarray(results['posterior pdf']['probability'])
+            model_flux = np.array([results['marginal photometry'][name] for name in names],
+                    dtype=np.float32) / jy
+        chi = np.sum((obs_flux[i,:,None]-model_flux)**2/obs_flux_err[i,:,None]**2, axis=0)
+        np.testing.assert_allclose(aver_chi_square[i], np.sum(probability*chi)/np.sum(probability),
+                rtol=1.E-12)
+
+def test_compute_batch_cached(results_dir, filters, observed_catalogue, monkeypatch):
+
+    os.makedirs(os.path.join(results_dir, BeagleDirectories.pypbeagle_data))
+    expected = _compute_batch(observed_catalogue, filters)
+
+    # The second time, the Beagle output files are not read
+    def open_results_(*args, **kwargs):
+        raise AssertionError("The Beagle output file has been read")
+
+    monkeypatch.setattr(beagle_posterior_predictive_checks, 'open_results', open_results_)
+
+    for a, b in zip(_compute_batch(observed_catalogue, filters), expected):
+        np.testing.assert_array_equal(a, b)
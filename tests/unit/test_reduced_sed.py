@@ -0,0 +1,88 @@
+from __future__ import absolute_import
+import os
+import numpy as np
+from astropy.io import fits
+
+from pyp_beagle.beagle_utils import get_files_list
+from pyp_beagle.beagle_cache import open_results
+from pyp_beagle.beagle_mirror import BeagleMirror
+from pyp_beagle.beagle_reduced_sed import BeagleReducedSED, credible_quantiles, reduce_marginal_SED
+
+def test_load_with_mirror(results_dir):
+
+    BeagleMirror.enabled = True
+
+    file_list, IDs = get_files_list()
+    assert len(BeagleMirror.build(file_list)) == len(file_list)
+
+    # Files listed once the mirror is available, as done on the command line
+    file_list, IDs = get_files_list()
+    BeagleReducedSED.build(file_list, IDs, credible_intervals=[68.])
+
+    for ID in IDs:
+        # Name of the Beagle output file as built by `Spectrum.plot_marginal`
+        file_name = os.path.join(results_dir, ID + '_BEAGLE.fits.gz')
+        reduced = BeagleReducedSED.load(BeagleReducedSED.get_file_name(ID), file_name,
+                quantiles=credible_quantiles([68.]))
+        assert reduced is not None
+
+        # Same reduction as from the original file
+        with open_results(file_name, use_cache=False) as results:
+            BeagleMirror.enabled = False
+            expected = reduce_marginal_SED(results, credible_intervals=[68.])
+            BeagleMirror.enabled = True
+
+        np.testing.assert_array_equal(reduced['quantiles'], expected['quantiles'])
+
+def test_load_out_of_date(results_dir):
+
+    file_list, IDs = get_files_list()
+    BeagleReducedSED.build(file_list[:1], IDs[:1])
+
+    file_name = os.path.join(results_dir, file_list[0])
+    reduced_name = BeagleReducedSED.get_file_name(IDs[0])
+    assert BeagleReducedSED.load(reduced_name, file_name) is not None
+
+    # Quantiles which have not been computed
+    assert BeagleReducedSED.load(reduced_name, file_name, quantiles=credible_quantiles([99.])) is None
+
+    stat = os.stat(file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert BeagleReducedSED.load(reduced_name, file_name) is None
+
+def test_MAP_and_draws(results_dir):
+
+    file_list, IDs = get_files_list()
+    BeagleReducedSED.build(file_list, IDs, n_draws=50)
+
+    for file, ID in zip(file_list, IDs):
+        file_name = os.path.join(results_dir, file)
+        reduced = BeagleReducedSED.load(BeagleReducedSED.get_file_name(ID), file_name)
+
+        with fits.open(file_name) as hdulist:
+            probability = hdulist['posterior pdf'].data['probability']
+            model_fluxes = hdulist['marginal sed'].data
+
+        np.testing.assert_array_equal(reduced['MAP_flux'],
+                model_fluxes[np.argmax(probability),:].astype(np.float32))
+
+        rows = reduced['draw_rows']
+        assert len(rows) == 50
+        assert np.all(np.diff(rows) >= 0)
+        assert rows.min() >= 0 and rows.max() < len(probability)
+        np.testing.assert_array_equal(reduced['draw_flux'], model_fluxes[rows,:].astype(np.float32))
+
+        # The draws of each object only depend on the seed and on its ID
+        with open_results(file_name, use_cache=False) as results:
+            np.testing.assert_array_equal(reduce_marginal_SED(results, n_draws=50, ID=ID)['draw_rows'], rows)
+            assert not np.array_equal(reduce_marginal_SED(results, n_draws=50, ID=ID, seed=1)['draw_rows'], rows)
+
+    # The draws of different objects are independent
+    assert not np.array_equal(
+            BeagleReducedSED.load(BeagleReducedSED.get_file_name(IDs[0]), os.path.join(results_dir, file_list[0]))['draw_rows'],
+            BeagleReducedSED.load(BeagleReducedSED.get_file_name(IDs[1]), os.path.join(results_dir, file_list[1]))['draw_rows'])
+
+    # A different number of draws is recomputed
+    BeagleReducedSED.build(file_list[:1], IDs[:1], n_draws=20)
+    reduced = BeagleReducedSED.load(BeagleReducedSED.get_file_name(IDs[0]), os.path.join(results_dir, file_list[0]))
+    assert len(reduced['draw_rows']) == 20
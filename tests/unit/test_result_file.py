@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+import os
+import numpy as np
+from astropy.io import fits
+
+from pyp_beagle.beagle_utils import get_files_list
+from pyp_beagle.beagle_result_file import BeagleResultFile
+
+def test_read_columns(results_dir):
+
+    file_list, _ = get_files_list()
+    file_name = os.path.join(results_dir, file_list[0])
+
+    with BeagleResultFile(file_name) as f, fits.open(file_name) as hdulist:
+        posterior = hdulist['POSTERIOR PDF'].data
+
+        assert f.get_extensions() == [hdu.name for hdu in hdulist[1:]]
+        assert f.get_columns('posterior pdf') == list(posterior.columns.names)
+        assert f.get_columns('marginal sed') is None
+
+        table = f.read('posterior pdf', columns=['mass', 'probability'])
+        assert table.dtype.names == ('mass', 'probability')
+        for name in table.dtype.names:
+            np.testing.assert_array_equal(table[name], posterior[name])
+
+        table = f.read('posterior pdf')
+        assert table.dtype.names == tuple(posterior.columns.names)
+
+        np.testing.assert_array_equal(f.read('marginal sed'), hdulist['MARGINAL SED'].data)
+        np.testing.assert_array_equal(f['galaxy properties']['M_star'], hdulist['GALAXY PROPERTIES'].data['M_star'])
+
+def test_close(results_dir):
+
+    file_list, _ = get_files_list()
+    file_name = os.path.join(results_dir, file_list[0])
+
+    # The file is only opened when first needed
+    f = BeagleResultFile(file_name)
+    assert f.hdulist is None
+
+    hdulist = f.open()
+    assert f.open() is hdulist
+    assert not hdulist.fileinfo(0)['file'].closed
+
+    f.close()
+    assert f.hdulist is None
+    assert hdulist.fileinfo(0)['file'].closed
+
+    with BeagleResultFile(file_name) as f:
+        f.read('posterior pdf', columns=['mass'])
+        hdulist = f.hdulist
+
+    assert f.hdulist is None
+    assert hdulist.fileinfo(0)['file'].closed
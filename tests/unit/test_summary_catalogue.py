@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+import os
+import numpy as np
+import pytest
+
+from pyp_beagle.beagle_utils import get_files_list, getPathForData
+from pyp_beagle.beagle_catalogue_io import open_catalogue, read_extension
+from pyp_beagle.beagle_summary_catalogue import get1DInterval, get1DIntervals, \
+        BeagleSummaryCatalogue, SOURCE_FILES_EXTENSION
+
+from conftest import N_BANDS
+from synthetic import make_beagle_files
+
+def test_get1DIntervals():
+
+    rng = np.random.default_rng(0)
+
+    n_samples, n_columns = 1000, 6
+    param_values = rng.normal(size=(n_samples, n_columns))
+
+    # Repeated values, and samples with zero probability
+    param_values[:, 0] = np.round(param_values[:, 0], 1)
+    probability = rng.random(n_samples)
+    probability[rng.random(n_samples) < 0.2] = 0.
+    probability /= np.sum(probability)
+
+    levels = [68., 95.]
+    mean, median, interval = get1DIntervals(param_values, probability, levels)
+
+    for j in range(n_columns):
+        _mean, _median, _interval = get1DInterval(param_values[:, j], probability, levels)
+        np.testing.assert_allclose(mean[j], _mean, rtol=1.E-12)
+        np.testing.assert_array_equal(median[j], _median)
+        np.testing.assert_array_equal(interval[j], np.array(_interval))
+
+CREDIBLE_INTERVALS = [68., 95.]
+
+def _read_catalogue(file_name):
+
+    with open_catalogue(getPathForData(file_name)) as hdulist:
+        return dict((hdu_name, read_extension(hdulist[hdu_name]))
+                for hdu_name in ('POSTERIOR PDF', SOURCE_FILES_EXTENSION))
+
+@pytest.fixture(params=['fits', 'parquet', 'hdf5'])
+def catalogue_suffix(request):
+
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    elif request.param == 'hdf5':
+        pytest.importorskip('h5py')
+
+    return {'fits': '.fits', 'parquet': '.parquet', 'hdf5': '.hdf5'}[request.param]
+
+def test_update(results_dir, catalogue_suffix, monkeypatch):
+
+    make_beagle_files(results_dir, n_objects=5, n_samples=500, n_bands=N_BANDS, n_wl=200)
+    file_list, IDs = get_files_list()
+    assert len(file_list) == 5
+
+    file_name = 'BEAGLE_summary_catalogue' + catalogue_suffix
+    BeagleSummaryCatalogue(file_name=file_name, credible_intervals=CREDIBLE_INTERVALS).compute(file_list[:3], overwrite=True)
+
+    # Objects whose summary statistics are computed
+    computed = list()
+    compute_single = BeagleSummaryCatalogue.compute_single
+    def _compute_single(self, file, *args, **kwargs):
+        computed.append(file)
+        return compute_single(self, file, *args, **kwargs)
+    monkeypatch.setattr(BeagleSummaryCatalogue, 'compute_single', _compute_single)
+
+    # The updated catalogue is the same as one built from scratch
+    BeagleSummaryCatalogue(file_name=file_name, credible_intervals=CREDIBLE_INTERVALS).compute(file_list, update=True)
+    assert sorted(computed) == sorted(file_list[3:])
+
+    full_name = 'full_summary_catalogue' + catalogue_suffix
+    BeagleSummaryCatalogue(file_name=full_name, credible_intervals=CREDIBLE_INTERVALS).compute(file_list, overwrite=True)
+
+    updated, full = _read_catalogue(file_name), _read_catalogue(full_name)
+    for hdu_name in full:
+        assert updated[hdu_name].dtype == full[hdu_name].dtype
+        for col_name in full[hdu_name].dtype.names:
+            np.testing.assert_array_equal(updated[hdu_name][col_name], full[hdu_name][col_name])
+
+    # Only the row of a Beagle output file which has changed is recomputed
+    changed = os.path.join(results_dir, file_list[1])
+    stat = os.stat(changed)
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    del computed[:]
+    BeagleSummaryCatalogue(file_name=file_name, credible_intervals=CREDIBLE_INTERVALS).compute(file_list, update=True)
+    assert computed == [file_list[1]]
+
+    updated = _read_catalogue(file_name)
+    sources = updated[SOURCE_FILES_EXTENSION]
+    row = list(sources['ID']).index(IDs[1])
+    assert sources['mtime'][row] == os.stat(changed).st_mtime
+    for col_name in full['POSTERIOR PDF'].dtype.names:
+        np.testing.assert_array_equal(updated['POSTERIOR PDF'][col_name], full['POSTERIOR PDF'][col_name])
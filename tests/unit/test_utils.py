@@ -0,0 +1,235 @@
+from __future__ import absolute_import
+import re
+from bisect import bisect_left
+import numpy as np
+from scipy.interpolate import interp1d
+
+from pyp_beagle.beagle_utils import weighted_quantiles, match_ID, \
+        effective_sample_size, systematic_resample
+from pyp_beagle.beagle_pdf import PDF
+
+def _weighted_quantiles_loop(data, weights, quantiles):
+
+    # Per-column interpolation of the cumulative probability, as done in
+    # `Spectrum.plot_marginal` before `weighted_quantiles`
+    sort_indices = np.argsort(data, axis=0)
+    values = np.zeros((len(quantiles), data.shape[1]))
+    for i in range(data.shape[1]):
+        sort_ = sort_indices[:,i]
+        cumul_pdf = np.cumsum(weights[sort_])
+        cumul_pdf /= cumul_pdf[len(cumul_pdf)-1]
+        values[:,i] = interp1d(cumul_pdf, data[sort_,i])(quantiles)
+
+    return values
+
+def test_weighted_quantiles():
+
+    rng = np.random.default_rng(0)
+
+    n_samples, n_columns = 2000, 50
+    data = rng.lognormal(size=(n_samples, n_columns))
+
+    # Repeated values, and samples with zero probability
+    data[:, :10] = np.round(data[:, :10], 1)
+    weights = rng.random(n_samples)
+    weights[rng.random(n_samples) < 0.2] = 0.
+    weights /= np.sum(weights)
+
+    quantiles = [0.5, 0.025, 0.975, 0.16, 0.84]
+    expected = _weighted_quantiles_loop(data, weights, quantiles)
+
+    # Also processing the columns in several chunks
+    for chunk_size in (1024, 7):
+        np.testing.assert_array_equal(weighted_quantiles(data, weights, quantiles,
+            chunk_size=chunk_size), expected)
+
+def test_weighted_quantiles_1d():
+
+    data = np.array([3., 1., 2., 4.])
+    weights = np.full(4, 0.25)
+
+    # The cumulative probability of the i-th sorted value is (i+1)/4
+    np.testing.assert_allclose(weighted_quantiles(data, weights, [0.25, 0.5, 0.625]), [[1.], [2.], [2.5]])
+
+    # Quantiles below the cumulative probability of the smallest value
+    with np.testing.assert_raises(ValueError):
+        weighted_quantiles(data, weights, [0.1])
+
+def _match_ID_loop(ID_list_1, ID_list_2, ignore_string=None):
+
+    # Nested loop over the IDs, as done in `match_ID` before IDs were
+    # matched through a dictionary
+    n1, n2 = len(ID_list_1), len(ID_list_2)
+    if n1 >= n2:
+        ID_long, ID_short = np.array(ID_list_1), np.array(ID_list_2)
+    else:
+        ID_long, ID_short = np.array(ID_list_2), np.array(ID_list_1)
+    n_long, n_short = len(ID_long), len(ID_short)
+
+    is_int = issubclass(ID_long.dtype.type, np.integer) and issubclass(ID_short.dtype.type, np.integer)
+    if is_int:
+        sort_long, sort_short = np.argsort(ID_long), np.argsort(ID_short)
+    else:
+        ID_long, ID_short = np.array(ID_long, dtype=str), np.array(ID_short, dtype=str)
+
+    match_indx_long = np.full(n_long, -1, dtype=int)
+    match_indx_short = np.full(n_short, -1, dtype=int)
+    mask_long = np.zeros(n_long, dtype=bool)
+
+    for i in range(n_short):
+        if is_int:
+            i1 = bisect_left(ID_long[sort_long], ID_short[sort_short[i]])
+            if i1 < n_long and ID_long[sort_long[i1]] == ID_short[sort_short[i]]:
+                match_indx_long[i1] = sort_long[i1]
+                match_indx_short[i] = sort_short[i]
+        else:
+            for j in range(n_long):
+                if mask_long[j]:
+                    continue
+                if ignore_string is None:
+                    ID_l, ID_s = ID_long[j], ID_short[i]
+                elif isinstance(ignore_string, str):
+                    ID_l, ID_s = ID_long[j].replace(ignore_string, ''), ID_short[i].replace(ignore_string, '')
+                else:
+                    ID_l, ID_s = ignore_string.sub('', ID_long[j]), ignore_string.sub('', ID_short[i])
+                if ID_l == ID_s:
+                    match_indx_long[i] = j
+                    match_indx_short[i] = i
+                    mask_long[j] = True
+
+    if n1 >= n2:
+        return match_indx_long[match_indx_long >= 0], match_indx_short[match_indx_short >= 0]
+
+    return match_indx_short[match_indx_short >= 0], match_indx_long[match_indx_long >= 0]
+
+def _assert_match(ID_list_1, ID_list_2, **kwargs):
+
+    indices_1, indices_2 = match_ID(ID_list_1, ID_list_2, **kwargs)
+    expected_1, expected_2 = _match_ID_loop(ID_list_1, ID_list_2, **kwargs)
+
+    np.testing.assert_array_equal(indices_1, expected_1)
+    np.testing.assert_array_equal(indices_2, expected_2)
+
+    return indices_1, indices_2
+
+def test_match_ID_int():
+
+    rng = np.random.default_rng(0)
+
+    # IDs of the second list are a shuffled subset of the first, plus some
+    # missing ones
+    ID_list_1 = rng.permutation(200) + 1
+    ID_list_2 = np.concatenate((rng.choice(ID_list_1, 50, replace=False), [1000, 1001]))
+
+    indices_1, indices_2 = _assert_match(ID_list_1, ID_list_2)
+    assert len(indices_1) == 50
+    np.testing.assert_array_equal(ID_list_1[indices_1], ID_list_2[indices_2])
+
+    # Shorter first list
+    _assert_match(ID_list_2, ID_list_1)
+
+def test_match_ID_str():
+
+    rng = np.random.default_rng(1)
+
+    ID_list_1 = np.array(['obj_' + str(i) for i in rng.permutation(200)])
+    ID_list_2 = np.concatenate((rng.choice(ID_list_1, 50, replace=False), ['obj_1000', 'missing']))
+
+    indices_1, indices_2 = _assert_match(ID_list_1, ID_list_2)
+    assert len(indices_1) == 50
+    np.testing.assert_array_equal(ID_list_1[indices_1], ID_list_2[indices_2])
+
+    _assert_match(ID_list_2, ID_list_1)
+
+    # Mixed string and integer IDs
+    _assert_match(np.arange(20), np.array([str(i) for i in range(5, 30)]))
+
+def test_match_ID_duplicates():
+
+    ID_list_1 = np.array(['a', 'b', 'a', 'c', 'b', 'd'])
+    ID_list_2 = np.array(['b', 'a', 'b', 'e'])
+
+    _assert_match(ID_list_1, ID_list_2)
+    _assert_match(ID_list_2, ID_list_1)
+
+def test_match_ID_ignore_string():
+
+    ID_list_1 = np.array(['1_BEAGLE', '2_BEAGLE', '3_BEAGLE', '4_BEAGLE'])
+    ID_list_2 = np.array(['3', '1', '5'])
+
+    indices_1, indices_2 = _assert_match(ID_list_1, ID_list_2, ignore_string='_BEAGLE')
+    np.testing.assert_array_equal(indices_1, [2, 0])
+    np.testing.assert_array_equal(indices_2, [0, 1])
+
+    _assert_match(ID_list_1, ID_list_2, ignore_string=re.compile('_[A-Z]+$'))
+
+def _posterior_samples(n_samples=200000, seed=0):
+
+    # Nested sampling-like samples: broad prior draws, weighted by a narrow
+    # likelihood
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-10., 10., size=(n_samples, 2))
+    probability = np.exp(-0.5*((x[:,0]-1.)/0.5)**2 - 0.5*((x[:,1]+x[:,0])/0.8)**2)
+
+    return x, probability / probability.sum()
+
+def test_effective_sample_size():
+
+    assert np.isclose(effective_sample_size(np.full(100, 0.3)), 100.)
+    assert np.isclose(effective_sample_size([1., 0., 0., 0.]), 1.)
+    assert np.isclose(effective_sample_size([1., 1., 0., 0.]), 2.)
+
+def test_systematic_resample():
+
+    x, probability = _posterior_samples()
+    n_samples = 5000
+
+    rows, counts = systematic_resample(probability, n_samples, rng=np.random.default_rng(1))
+
+    assert counts.sum() == n_samples
+    assert np.all(np.diff(rows) > 0)
+
+    # Each sample is drawn floor(n*w) or ceil(n*w) times (with a tolerance
+    # on n*w for the rounding of the cumulative sum)
+    expected = n_samples * probability
+    all_counts = np.zeros(len(probability), dtype=int)
+    all_counts[rows] = counts
+    assert np.all(all_counts >= np.floor(expected - 1.e-9))
+    assert np.all(all_counts <= np.ceil(expected + 1.e-9))
+
+    # The weighted mean and the 16/50/84 quantiles of each parameter agree
+    # with those of the full set within a few times the Monte Carlo error
+    # expected from n draws, sigma/sqrt(n) (about 0.014 sigma here)
+    for j in range(x.shape[1]):
+        full_mean = np.average(x[:,j], weights=probability)
+        sigma = np.sqrt(np.average((x[:,j]-full_mean)**2, weights=probability))
+        tolerance = 4. * sigma / np.sqrt(n_samples)
+
+        thin_mean = np.average(x[rows,j], weights=counts)
+        assert abs(thin_mean - full_mean) <= tolerance
+
+        full_quantiles = weighted_quantiles(x[:,j], probability, [0.16, 0.5, 0.84])
+        thin_quantiles = weighted_quantiles(x[rows,j], counts.astype(float), [0.16, 0.5, 0.84])
+        np.testing.assert_allclose(thin_quantiles, full_quantiles, rtol=0., atol=tolerance)
+
+def test_thin_samples(tmp_path):
+
+    params_file = tmp_path.joinpath('params.json')
+    params_file.write_text('{}')
+
+    _, probability = _posterior_samples(n_samples=20000)
+
+    pdf = PDF(str(params_file), triangle_max_samples=1000)
+
+    # The same seed and ID give the same draws, different IDs do not
+    rows, weights = pdf.thin_samples('1', probability)
+    assert weights.sum() == 1000
+    _rows, _weights = pdf.thin_samples('1', probability)
+    np.testing.assert_array_equal(_rows, rows)
+    np.testing.assert_array_equal(_weights, weights)
+    assert not np.array_equal(pdf.thin_samples('2', probability)[0], rows)
+
+    # All samples are used for objects with fewer samples
+    rows, weights = PDF(str(params_file), triangle_max_samples=20000).thin_samples('1', probability)
+    assert rows == slice(None)
+    assert weights is probability
@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+import numpy as np
+import pytest
+
+from pyp_beagle.dependencies.walker_random_sampling import WalkerRandomSampling
+
+def _reconstruct(prob, inx):
+
+    # Each entry is drawn with probability 1/n, and then kept with
+    # probability `prob`, or replaced by its alias `inx` otherwise
+    n = len(prob)
+    return (prob + np.bincount(inx, weights=1.-prob, minlength=n)) / n
+
+def _weights():
+
+    rng = np.random.default_rng(0)
+
+    weights = [rng.random(1000), np.ones(10), np.array([1., 0., 0., 0.]),
+            np.array([1.E6, 1., 1., 1., 1.])]
+
+    # Many zero weights
+    w = rng.random(500)
+    w[rng.random(500) < 0.7] = 0.
+    weights.append(w)
+
+    return weights
+
+@pytest.mark.parametrize("weights", _weights())
+def test_build_tables(weights):
+
+    prob, inx = WalkerRandomSampling._build_tables(weights)
+
+    assert np.all((prob >= 0.) & (prob <= 1.+1.E-12))
+    np.testing.assert_allclose(_reconstruct(prob, inx), weights/np.sum(weights), rtol=0., atol=1.E-12)
+
+def test_build_tables_2d():
+
+    weights = np.random.default_rng(1).random((4, 300))
+    wrand = WalkerRandomSampling(weights)
+
+    for i in range(weights.shape[0]):
+        prob, inx = WalkerRandomSampling._build_tables(weights[i,:])
+        np.testing.assert_array_equal(wrand.prob[i,:], prob)
+        np.testing.assert_array_equal(wrand.inx[i,:], inx)
+
+def test_random():
+
+    weights = np.arange(1., 11.)
+    keys = np.arange(10)*2
+
+    draws = WalkerRandomSampling(weights, keys=keys, rng=1234).random(200000)
+    np.testing.assert_array_equal(draws, WalkerRandomSampling(weights, keys=keys, rng=1234).random(200000))
+
+    # The frequency of each key agrees with its probability within 5 sigma
+    p = weights/np.sum(weights)
+    frequency = np.bincount(draws//2, minlength=10) / len(draws)
+    assert np.all(np.abs(frequency-p) < 5.*np.sqrt(p*(1.-p)/len(draws)))
+
+def test_random_2d():
+
+    weights = np.zeros((3, 5))
+    weights[[0, 1, 2], [4, 0, 2]] = 1.
+
+    draws = WalkerRandomSampling(weights, rng=0).random(100)
+    assert draws.shape == (3, 100)
+    np.testing.assert_array_equal(draws, np.broadcast_to(np.array([4, 0, 2])[:, None], (3, 100)))
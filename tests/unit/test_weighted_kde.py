@@ -0,0 +1,107 @@
+from __future__ import absolute_import
+import tracemalloc
+import numpy as np
+import pytest
+from scipy import stats
+
+from pyp_beagle.dependencies.WeightedKDE import gaussian_kde, binned_gaussian_kde, \
+        batched_binned_gaussian_kde
+from pyp_beagle.beagle_utils import prepare_violin_plot, prepare_violin_plots
+
+@pytest.mark.parametrize("tolerance", [None, 1.E-3])
+def test_evaluate_max_memory(tolerance):
+
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=20000)
+    weights = rng.random(20000)
+    points = np.linspace(-4., 4., 2000)
+
+    max_memory = 16 * 1024**2
+    kde = gaussian_kde(data, weights=weights, max_memory=max_memory, tolerance=tolerance)
+
+    # The KD-tree is built before measuring the memory used by `evaluate`
+    kde.evaluate(points[:10])
+
+    tracemalloc.start()
+    try:
+        values = kde.evaluate(points)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert peak <= max_memory
+
+    expected = stats.gaussian_kde(data, weights=weights)(points)
+    rtol = 1.E-12 if tolerance is None else 10.*tolerance
+    np.testing.assert_allclose(values, expected, rtol=rtol)
+
+def _weighted_samples(n_outliers=0, seed=0):
+
+    rng = np.random.default_rng(seed)
+    data = rng.normal(5., 2., 20000)
+    weights = rng.random(20000) * np.exp(-0.5*((data-6.)/1.5)**2)
+
+    # Outliers at 50 and 25 standard deviations from the bulk of the samples
+    outliers = np.tile([105., -45.], n_outliers)[:n_outliers]
+    data = np.concatenate((data, outliers))
+    weights = np.concatenate((weights, np.full(n_outliers, np.mean(weights))))
+
+    return data, weights
+
+def test_binned_gaussian_kde():
+
+    data, weights = _weighted_samples()
+    points = np.linspace(-5., 15., 500)
+
+    expected = gaussian_kde(data, weights=weights)(points)
+    values = binned_gaussian_kde(data, weights=weights)(points)
+    np.testing.assert_allclose(values, expected, rtol=0., atol=1.E-3*np.max(expected))
+
+    # The datasets of the batched KDE share the same weights
+    datasets = np.vstack((data, 3.*data - 1.))
+    values = batched_binned_gaussian_kde(datasets, weights=weights)(np.vstack((points, 3.*points - 1.)))
+    np.testing.assert_allclose(values[0], expected, rtol=0., atol=1.E-3*np.max(expected))
+    np.testing.assert_allclose(values[1], expected/3., rtol=0., atol=1.E-3*np.max(expected)/3.)
+
+@pytest.mark.parametrize("n_outliers, rtol_norm, atol_x, rtol_y", [
+    (0, 5.E-4, 1.E-3, 1.E-3),
+    (2, 1.E-3, 2.E-2, 1.E-2)])
+def test_prepare_violin_plot_binned(n_outliers, rtol_norm, atol_x, rtol_y):
+
+    data, weights = _weighted_samples(n_outliers=n_outliers)
+    sigma = np.sqrt(np.cov(data, aweights=weights))
+
+    _, pdf_norm, median, x_violin, y_violin = prepare_violin_plot(data, weights=weights, binned=True)
+    _, _pdf_norm, _median, _x_violin, _y_violin = prepare_violin_plot(data, weights=weights, binned=False)
+
+    # The normalization, the median and the limits of the violin (in units of
+    # the standard deviation of the samples) agree with those of the exact KDE
+    np.testing.assert_allclose(pdf_norm, _pdf_norm, rtol=rtol_norm)
+    assert abs(median - _median) <= atol_x * sigma
+    assert abs(x_violin[0] - _x_violin[0]) <= atol_x * sigma
+    assert abs(x_violin[-1] - _x_violin[-1]) <= atol_x * sigma
+
+    # And so does the outline of the violin, relative to its maximum (the
+    # outlines are compared on the same points, since the grid points within
+    # the limits of the violins may differ)
+    x = np.linspace(max(x_violin[0], _x_violin[0]), min(x_violin[-1], _x_violin[-1]), 200)
+    y, _y = np.interp(x, x_violin, y_violin), np.interp(x, _x_violin, _y_violin)
+    assert np.max(np.abs(y - _y)) <= rtol_y * np.max(_y)
+
+def test_prepare_violin_plots():
+
+    data, weights = _weighted_samples(n_outliers=2)
+
+    # Bands with different scales, with and without outliers, and with a
+    # skewed distribution
+    datasets = np.vstack((data, 1.E-3*data + 10., np.clip(data, -5., 15.), np.exp(0.3*np.clip(data, -5., 15.))))
+
+    median_pdf, median, x_violin, y_violin = prepare_violin_plots(datasets, weights=weights)
+
+    for i, d in enumerate(datasets):
+        pdf, pdf_norm, _median, _x_violin, _y_violin = prepare_violin_plot(d, weights=weights)
+
+        np.testing.assert_allclose(median[i], _median, rtol=1.E-10)
+        np.testing.assert_allclose(median_pdf[i], pdf(_median)[0]/pdf_norm, rtol=1.E-8)
+        np.testing.assert_allclose(x_violin[i], _x_violin, rtol=1.E-10)
+        np.testing.assert_allclose(y_violin[i], _y_violin, rtol=1.E-8)